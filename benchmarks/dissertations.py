@@ -0,0 +1,129 @@
+"""
+dissertations.py
+
+Benchmark of the slotted Dissertation against the former one
+
+The former Dissertation kept its attributes in a __dict__ and parsed its
+publication date and URL on every access. It is reproduced here as
+LegacyDissertation. Both are built from the same records, so the memory
+reported is the objects' own, plus the date and URL parsed by the slotted
+class. Run from the repository's root, with DISSERTATIONS_SERVER set:
+
+    python -m benchmarks.dissertations
+"""
+
+# Imports
+import gc
+import re
+from time import perf_counter
+import tracemalloc
+from uuid import uuid4
+from classes.dissertations import (DISSERTATIONS_FILE_SERVER_BASE,
+                                   UUID_PATTERN,
+                                   Dissertation,
+                                   find_pdf_url,
+                                   parse_publication_date)
+
+
+# Constants
+RECORD_COUNTS = [10000, 100000]
+
+
+# Classes
+class LegacyDissertation:
+    """
+    The former Dissertation, without its unchanged properties.
+    """
+    def __init__(self,
+                 db_identifier: str,
+                 title: list,
+                 creators: list,
+                 publishers: list,
+                 contributors: list,
+                 publication_date: list,
+                 identifiers: list,
+                 is_deleted: bool = False):
+        self.id_dissertation = db_identifier
+        self.__title = title
+        self.__authors = creators
+        self.__publishers = publishers
+        self.__contributors = contributors
+        self.__dates = publication_date
+        self.__url = identifiers
+        self.is_deleted = is_deleted
+
+    @property
+    def id_dissertation(self) -> str:
+        return self.__id_dissertation
+
+    @id_dissertation.setter
+    def id_dissertation(self, db_identifier):
+        matching_id = re.search(UUID_PATTERN, db_identifier)
+        if matching_id:
+            self.__id_dissertation = matching_id.group(0)
+
+    @property
+    def date(self):
+        return parse_publication_date(self.__dates)
+
+    @property
+    def url(self) -> str:
+        return find_pdf_url(self.__url)
+
+
+# Functions
+def synthetic_records(count: int) -> list:
+    """
+    This function builds the constructor arguments of count dissertations.
+    """
+    return [
+        (f"oai:papyrus.bib.umontreal.ca:1866/{uuid4()}",
+         [f"Titre de la thèse {n}"],
+         ['Auteur, Prénom'],
+         ['Université de Montréal'],
+         ['Directeur, Prénom'],
+         [f"{1990 + n % 30}-06-01", f"{1990 + n % 30}"],
+         [f"http://hdl.handle.net/1866/{n}",
+          f"{DISSERTATIONS_FILE_SERVER_BASE}/{n}/these.pdf"])
+        for n in range(count)
+    ]
+
+
+def measure(cls, records: list) -> tuple[float, float, float]:
+    """
+    This function builds a dissertation per record, then reads every date
+    and URL once, as DissertationList.extend() does.
+
+    :return:    (Construction time, Memory in MB, Reading time)
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = perf_counter()
+    dissertations = [cls(*record) for record in records]
+    construction_time = perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0] / 1024 ** 2
+    tracemalloc.stop()
+
+    start = perf_counter()
+    for dissertation in dissertations:
+        dissertation.date
+        dissertation.url
+    reading_time = perf_counter() - start
+
+    return construction_time, memory, reading_time
+
+
+def main():
+    print(f"{'records':>8} {'class':>8} {'build':>9} {'memory':>10} "
+          f"{'read':>9}")
+    for count in RECORD_COUNTS:
+        records = synthetic_records(count)
+        for name, cls in [('legacy', LegacyDissertation),
+                          ('slotted', Dissertation)]:
+            construction_time, memory, reading_time = measure(cls, records)
+            print(f"{count:>8} {name:>8} {construction_time:>8.2f}s "
+                  f"{memory:>8.1f}MB {reading_time:>8.2f}s")
+
+
+if __name__ == '__main__':
+    main()
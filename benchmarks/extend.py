@@ -0,0 +1,91 @@
+"""
+extend.py
+
+Benchmark of DissertationList.extend() against the former one-row append()
+
+The former append() concatenated a one-row DataFrame to the whole list and
+scanned its index for duplicates, so building a list was quadratic. It is
+reproduced here as legacy_append(), which takes over a quarter of an hour
+at 100k records: --legacy-max skips it for larger lists. Run from the
+repository's root, with DISSERTATIONS_SERVER set:
+
+    python -m benchmarks.extend [--legacy-max RECORDS]
+"""
+
+# Imports
+import argparse
+from time import perf_counter
+from uuid import uuid4
+import pandas as pd
+from classes.dissertations import (DISSERTATIONS_FILE_SERVER_BASE,
+                                   Dissertation,
+                                   DissertationList)
+
+
+# Constants
+RECORD_COUNTS = [10000, 50000, 100000]
+
+
+# Functions
+def synthetic_dissertations(count: int) -> list:
+    """
+    This function builds count dissertations with unique identifiers.
+    """
+    return [
+        Dissertation(str(uuid4()),
+                     [f"Titre de la thèse {n}"],
+                     ['Auteur, Prénom'],
+                     ['Université de Montréal'],
+                     [],
+                     [f"{1990 + n % 30}-06-01"],
+                     [f"http://hdl.handle.net/1866/{n}",
+                      f"{DISSERTATIONS_FILE_SERVER_BASE}/{n}/these.pdf"])
+        for n in range(count)
+    ]
+
+
+def legacy_append(data: pd.DataFrame, dissertation: Dissertation) -> pd.DataFrame:
+    """
+    This function is the former DissertationList.append().
+    """
+    if dissertation.id_dissertation in data.index.array:
+        return data
+
+    metadata = {
+        'title': [dissertation.title],
+        'publication_date': [dissertation.date],
+        'url': [dissertation.url],
+        'deleted': [dissertation.is_deleted]
+    }
+    df = pd.DataFrame(metadata, index=[dissertation.id_dissertation])
+    return pd.concat([data, df])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--legacy-max', type=int, default=max(RECORD_COUNTS),
+                        help="Largest list built with legacy_append()")
+    arguments = parser.parse_args()
+
+    print(f"{'records':>8} {'append':>10} {'extend':>10}")
+    for count in RECORD_COUNTS:
+        dissertations = synthetic_dissertations(count)
+
+        legacy_time = 'skipped'
+        if count <= arguments.legacy_max:
+            data = pd.DataFrame(columns=['title', 'publication_date', 'url', 'deleted'])
+            start = perf_counter()
+            for dissertation in dissertations:
+                data = legacy_append(data, dissertation)
+            legacy_time = f"{perf_counter() - start:.2f}s"
+
+        dissertation_list = DissertationList()
+        start = perf_counter()
+        dissertation_list.extend(dissertations)
+        extend_time = perf_counter() - start
+
+        print(f"{count:>8} {legacy_time:>10} {extend_time:>9.2f}s")
+
+
+if __name__ == '__main__':
+    main()
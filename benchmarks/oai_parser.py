@@ -0,0 +1,136 @@
+"""
+oai_parser.py
+
+Benchmark of parse_list_records() against Sickle's models
+
+Harvester.pages() used to read each ListRecords page through Sickle: its
+iterator parses the page to find errors and the resumptionToken, then the
+page is parsed again and every record converted by sickle.models.Record
+before record_to_dict() keeps the fields needed. sickle_page() reproduces
+those steps. Pass a saved ListRecords page, or a page of synthetic records
+is built. Run from the repository's root, with DISSERTATIONS_SERVER set:
+
+    python -m benchmarks.oai_parser [--page FILE] [--records RECORDS]
+"""
+
+# Imports
+import argparse
+from pathlib import Path
+from time import perf_counter
+from types import SimpleNamespace
+from sickle.models import Record
+from sickle.response import OAIResponse
+from classes.dissertations import record_to_dict
+from classes.oai_parser import OAI_NAMESPACE, parse_list_records
+
+
+# Constants
+DEFAULT_RECORDS = 10000
+REPEATS = 5
+
+
+# Functions
+def synthetic_page(count: int) -> bytes:
+    """
+    This function builds a ListRecords page of count Dublin Core records,
+    one in ten of them deleted.
+    """
+    records = []
+    for n in range(count):
+        header = f'<identifier>oai:papyrus.bib.umontreal.ca:1866/{n}' \
+                 f'</identifier><datestamp>2020-01-01T00:00:00Z</datestamp>' \
+                 f'<setSpec>col_1866_2621</setSpec>'
+        if n % 10 == 0:
+            records.append(f'<record><header status="deleted">{header}'
+                           f'</header></record>')
+            continue
+        records.append(
+            f'<record><header>{header}</header><metadata>'
+            f'<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/" '
+            f'xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:title>Titre de la thèse {n}</dc:title>'
+            f'<dc:title>Title of thesis {n}</dc:title>'
+            f'<dc:creator>Auteur, Prénom</dc:creator>'
+            f'<dc:contributor>Directeur, Prénom</dc:contributor>'
+            f'<dc:contributor>Codirecteur, Prénom</dc:contributor>'
+            f'<dc:subject>Génie civil</dc:subject>'
+            f'<dc:description>{"Un long résumé. " * 50}</dc:description>'
+            f'<dc:date>2020-01-01</dc:date><dc:date>2020</dc:date>'
+            f'<dc:type>Thèse ou mémoire / Thesis or Dissertation</dc:type>'
+            f'<dc:identifier>http://hdl.handle.net/1866/{n}</dc:identifier>'
+            f'<dc:identifier>https://papyrus.bib.umontreal.ca/xmlui/'
+            f'bitstream/1866/{n}/these.pdf</dc:identifier>'
+            f'<dc:language>fr</dc:language>'
+            f'<dc:publisher>Université de Montréal</dc:publisher>'
+            f'</oai_dc:dc></metadata></record>'
+        )
+
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<OAI-PMH xmlns="{OAI_NAMESPACE[1:-1]}">'
+        f'<responseDate>2020-02-01T00:00:00Z</responseDate>'
+        f'<request verb="ListRecords">http://localhost/oai</request>'
+        f'<ListRecords>{"".join(records)}'
+        f'<resumptionToken>next</resumptionToken></ListRecords></OAI-PMH>'
+    ).encode()
+
+
+def sickle_page(content: bytes) -> tuple[list, str | None]:
+    """
+    This function reads a ListRecords page as Harvester.pages() did with
+    Sickle's iterator and models.
+    """
+    response = OAIResponse(SimpleNamespace(content=content), {})
+    # The iterator's own parse, for errors and the resumptionToken
+    token = response.xml.find(f".//{OAI_NAMESPACE}resumptionToken")
+    records = [
+        (record_to_dict(record), record.header.datestamp)
+        for record in (
+            Record(element) for element in
+            response.xml.iterfind(f".//{OAI_NAMESPACE}record")
+        )
+    ]
+
+    return records, token.text if token is not None else None
+
+
+def best_time(function, content: bytes) -> tuple[float, tuple]:
+    """
+    This function returns the best of REPEATS runs and the last result.
+    """
+    times = []
+    for _ in range(REPEATS):
+        start = perf_counter()
+        result = function(content)
+        times.append(perf_counter() - start)
+
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--page', type=Path,
+                        help="A saved ListRecords response")
+    parser.add_argument('--records', type=int, default=DEFAULT_RECORDS,
+                        help="Records in the synthetic page")
+    arguments = parser.parse_args()
+
+    if arguments.page:
+        content = arguments.page.read_bytes()
+    else:
+        content = synthetic_page(arguments.records)
+
+    sickle_time, sickle_result = best_time(sickle_page, content)
+    parser_time, parser_result = best_time(parse_list_records, content)
+
+    if sickle_result != parser_result:
+        print("Results differ.")
+    records = len(parser_result[0])
+    print(f"{len(content) / 1024 ** 2:.1f}MB page, {records} records")
+    print(f"{'parser':>8} {'time':>9} {'records/s':>11}")
+    for name, seconds in [('sickle', sickle_time), ('lxml', parser_time)]:
+        print(f"{name:>8} {seconds:>8.3f}s {records / seconds:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+profiles.py
+
+Benchmark of the layout analysis profiles on a corpus of .pdf files
+
+Every file of the corpus is extracted with each profile, from the cheapest
+('raw') to pdfminer's default analysis ('full'). For each profile, the time
+taken is reported along with the page_quality() of the text: the share of
+bad glyphs, the share of whitespace (far less than a sixth means words were
+glued together) and the pages find_bad_pages() would send to OCR. The
+profile choose_profile() picks for each file is counted too. Run from the
+repository's root, with DISSERTATIONS_SERVER set:
+
+    python -m benchmarks.profiles [--corpus DIRECTORY] [--max-pages PAGES]
+"""
+
+# Imports
+import argparse
+from collections import Counter
+from pathlib import Path
+from time import perf_counter
+from classes.extraction import EXTRACTION_PROFILES, extract_document
+from classes.pdf_files import (PDF_BASE_DIR,
+                               choose_profile,
+                               find_bad_pages,
+                               page_quality)
+
+
+# Constants
+DEFAULT_MAX_PAGES = 50
+EXTRACTION_TIMEOUT = 600
+
+
+# Functions
+def measure(pdf_content: bytes, profile: str, max_pages: int) -> tuple[float, list]:
+    """
+    This function extracts a file with a profile.
+
+    :return:    (Time, Quality of each page)
+    """
+    start = perf_counter()
+    document = extract_document(pdf_content,
+                                max_pages,
+                                EXTRACTION_TIMEOUT,
+                                profile,
+                                images=False)
+    elapsed = perf_counter() - start
+
+    return elapsed, [page_quality(text, page_number)
+                     for page_number, text in enumerate(document.page_text)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', type=Path, default=PDF_BASE_DIR,
+                        help="A directory of .pdf files, searched recursively")
+    parser.add_argument('--max-pages', type=int, default=DEFAULT_MAX_PAGES,
+                        help="Pages extracted from each file. 0 for all")
+    arguments = parser.parse_args()
+
+    files = sorted(arguments.corpus.rglob('*.pdf'))
+    if not files:
+        print(f"No .pdf files in {arguments.corpus}.")
+        return
+
+    times = Counter()
+    qualities = {profile: [] for profile in EXTRACTION_PROFILES}
+    chosen = Counter()
+    for pdf_file in files:
+        pdf_content = pdf_file.read_bytes()
+        chosen[choose_profile(pdf_content)] += 1
+        for profile in EXTRACTION_PROFILES:
+            elapsed, quality = measure(pdf_content, profile, arguments.max_pages)
+            times[profile] += elapsed
+            qualities[profile].extend(quality)
+
+    print(f"{len(files)} files, {len(qualities['full'])} pages")
+    print(f"{'profile':>8} {'time':>9} {'pages/s':>8} {'bad glyphs':>11} "
+          f"{'whitespace':>11} {'bad pages':>10} {'chosen':>7}")
+    for profile in EXTRACTION_PROFILES:
+        pages = qualities[profile]
+        characters = sum(quality['characters'] for quality in pages) or 1
+        bad_glyphs = sum(quality['characters'] * quality['bad_glyph_ratio']
+                         for quality in pages) / characters
+        whitespace = sum(quality['characters'] * quality['whitespace_ratio']
+                         for quality in pages) / characters
+        print(f"{profile:>8} {times[profile]:>8.2f}s "
+              f"{len(pages) / times[profile]:>8.1f} {bad_glyphs:>11.4f} "
+              f"{whitespace:>11.4f} {len(find_bad_pages(pages)):>10} "
+              f"{chosen[profile]:>7}")
+
+
+if __name__ == '__main__':
+    main()
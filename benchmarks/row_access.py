@@ -0,0 +1,85 @@
+"""
+row_access.py
+
+Benchmark of DissertationList's row-by-row and batch access
+
+Each run reads every row's URL and language, as analyze_pdf_files() does to
+build its documents, and writes two result columns back. iterrows() builds
+a Series per row and data.at writes one cell at a time, while records() and
+update_columns() read named tuples and write each column once. Run from the
+repository's root, with DISSERTATIONS_SERVER set:
+
+    python -m benchmarks.row_access
+"""
+
+# Imports
+from time import perf_counter
+from benchmarks.extend import synthetic_dissertations
+from classes.dissertations import DissertationList
+
+
+# Constants
+ROW_COUNTS = [10000, 50000]
+
+
+# Functions
+def dissertation_list(count: int) -> DissertationList:
+    """
+    This function builds a DissertationList of count rows with the columns
+    the analysis reads and writes.
+    """
+    dissertations = DissertationList()
+    dissertations.extend(synthetic_dissertations(count))
+    dissertations.add_column('language', 'fr')
+    dissertations.add_column('pages')
+    dissertations.add_column('txt_file_name')
+
+    return dissertations
+
+
+def row_by_row(dissertations: DissertationList):
+    """
+    This function reads rows with iterrows() and writes cells with data.at.
+    """
+    data = dissertations.data
+    for key, row in dissertations:
+        pages = len(row['url']) + len(row['language'])
+        data.at[key, 'pages'] = pages
+        data.at[key, 'txt_file_name'] = f"{key}.txt"
+
+
+def batch(dissertations: DissertationList):
+    """
+    This function reads rows with records() and writes columns with
+    update_columns().
+    """
+    index = []
+    pages = []
+    for row in dissertations.records(['url', 'language']):
+        index.append(row.Index)
+        pages.append(len(row.url) + len(row.language))
+    dissertations.update_columns(index, {
+        'pages': pages,
+        'txt_file_name': [f"{key}.txt" for key in index]
+    })
+
+
+def main():
+    print(f"{'rows':>8} {'iterrows':>10} {'records':>10}")
+    for count in ROW_COUNTS:
+        times = []
+        results = []
+        for function in [row_by_row, batch]:
+            dissertations = dissertation_list(count)
+            start = perf_counter()
+            function(dissertations)
+            times.append(perf_counter() - start)
+            results.append(dissertations.data['pages'].astype(int).tolist())
+
+        if results[0] != results[1]:
+            print("Results differ.")
+        print(f"{count:>8} {times[0]:>9.2f}s {times[1]:>9.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+token_count.py
+
+Benchmark of get_token_count()'s full pipeline and tokenizer-only modes
+
+Needs the packaged fr_core_news_sm model. Run from the repository's root:
+
+    python -m benchmarks.token_count
+"""
+
+# Imports
+from time import perf_counter
+from classes.nlp_models import get_model, FULL_PIPELINE, TOKENIZER_ONLY
+from classes.pdf_files import get_token_count
+
+
+# Constants
+PARAGRAPH = (
+    "Cette thèse porte sur l'analyse des structures en béton armé, "
+    "c.-à-d. les poutres, les dalles et les colonnes (voir fig. 3.2). "
+    "Les résultats obtenus entre 1992 et 1994 montrent qu'un gain de "
+    "12,5 % est possible.\n"
+)
+TEXT_SIZES = [10000, 100000, 1000000]
+
+
+# Functions
+def main():
+    # Models are loaded before timing, as they are in a long run
+    get_model('fr', FULL_PIPELINE)
+    get_model('fr', TOKENIZER_ONLY)
+
+    print(f"{'characters':>12} {'full':>10} {'tokenizer':>10} {'tokens':>10}")
+    for size in TEXT_SIZES:
+        text = (PARAGRAPH * (size // len(PARAGRAPH) + 1))[:size]
+
+        start = perf_counter()
+        full_count = get_token_count(text, 'fr')
+        full_time = perf_counter() - start
+
+        start = perf_counter()
+        tokenizer_count = get_token_count(text, 'fr', tokenizer_only=True)
+        tokenizer_time = perf_counter() - start
+
+        if full_count != tokenizer_count:
+            print(f"Counts differ: {full_count} != {tokenizer_count}")
+        print(f"{size:>12} {full_time:>9.2f}s {tokenizer_time:>9.2f}s "
+              f"{tokenizer_count:>10}")
+
+
+if __name__ == '__main__':
+    main()
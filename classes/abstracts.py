@@ -0,0 +1,194 @@
+"""
+abstracts.py
+
+Module for locating and extracting dissertations' abstracts
+
+Abstracts sit in a thesis' first pages, so there is no need to lay out the
+whole document to find them. Only the first pages are parsed, one at a time,
+and parsing stops as soon as the section following the abstract begins.
+"""
+
+# Imports
+import re
+from io import BytesIO
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from decouple import config
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer
+from classes.extraction import count_pages, open_content
+from classes.pdf_files import (BASE_DIR,
+                               PDFFile,
+                               SUPPORTED_LANGUAGES,
+                               get_token_count,
+                               sanitize_text)
+
+
+# Constants
+ABSTRACT_BASE_DIR = BASE_DIR / 'abstracts'
+ABSTRACT_MAX_PAGES = config('ABSTRACT_MAX_PAGES', default=15, cast=int)
+# Number of pages an abstract may run over before extraction gives up on
+# finding its end.
+ABSTRACT_MAX_SPAN = config('ABSTRACT_MAX_SPAN', default=4, cast=int)
+# Headings stand alone on their line, in French, English or Spanish.
+ABSTRACT_HEADING_REGEX = re.compile(
+    r'^[ \t]*(r[ée]sum[ée]|abstract|summary|resumen)[ \t]*:?[ \t]*$',
+    re.IGNORECASE | re.MULTILINE
+)
+SECTION_HEADING_REGEX = re.compile(
+    r'^[ \t]*(table des mati[èe]res|sommaire|avant-propos|remerciements|'
+    r'd[ée]dicace|liste des (tableaux|figures|sigles|abr[ée]viations)|'
+    r'introduction|table of contents|contents|foreword|acknowledge?ments|'
+    r'dedication|list of (tables|figures|abbreviations)|[íi]ndice( general)?|'
+    r'pr[óo]logo|agradecimientos|dedicatoria|'
+    r'lista de (tablas|figuras|abreviaturas)|introducci[óo]n)\b.{0,40}$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+# Classes
+class Abstract:
+    """
+    Abstract class
+
+    This class holds a dissertation's abstract section, with the zero-indexed
+    span of pages it was found on. When the abstract is given in many
+    languages, consecutive abstracts are kept together in the same section.
+    """
+    def __init__(self, text: str, first_page: int, last_page: int):
+        """
+        Class constructor
+
+        :param text:        The abstract section's text, heading included.
+        :type text:         str
+        :param first_page:  The page the abstract starts on.
+        :type first_page:   int
+        :param last_page:   The page the abstract ends on.
+        :type last_page:    int
+        """
+        if first_page > last_page:
+            raise ValueError("first_page can't be after last_page.")
+
+        self.text = text
+        self.first_page = first_page
+        self.last_page = last_page
+
+    @property
+    def page_span(self) -> str:
+        """
+        Returns the abstract's pages, one-indexed, as in '3-4'.
+        """
+        if self.first_page == self.last_page:
+            return f"{self.first_page + 1}"
+        return f"{self.first_page + 1}-{self.last_page + 1}"
+
+    def __repr__(self) -> str:
+        return f"<Abstract pages {self.page_span}>"
+
+
+# Functions
+def find_abstract(pdf_content: bytes | BytesIO | SpooledTemporaryFile,
+                  max_pages: int = ABSTRACT_MAX_PAGES,
+                  max_span: int = ABSTRACT_MAX_SPAN) -> Abstract | None:
+    """
+    This function lays out a .pdf file's first pages, one at a time, until
+    it finds an abstract heading, then keeps going only until the next
+    section's heading.
+
+    :param pdf_content:     The .pdf file's content.
+    :type pdf_content:      bytes | BytesIO | SpooledTemporaryFile
+    :param max_pages:       The number of pages searched for the heading.
+    :type max_pages:        int
+    :param max_span:        The number of pages an abstract may run over.
+    :type max_span:         int
+    :return:                The abstract, or None if no heading was found.
+    """
+    pages = extract_pages(open_content(pdf_content),
+                          page_numbers=range(max_pages),
+                          maxpages=max_pages)
+    section = []
+    first_page = None
+    last_page = None
+    for page_number, page in enumerate(pages):
+        text = ''.join(
+            element.get_text() for element in page
+            if isinstance(element, LTTextContainer)
+        )
+
+        start = 0
+        search_from = 0
+        if first_page is None:
+            heading = ABSTRACT_HEADING_REGEX.search(text)
+            if heading is None:
+                continue
+            first_page = page_number
+            start = heading.start()
+            search_from = heading.end()
+
+        # The section ends at the first heading following the abstract's
+        end = SECTION_HEADING_REGEX.search(text, search_from)
+        if end is not None:
+            kept = text[start:end.start()]
+            section.append(kept)
+            # A heading at the top of a page ends the abstract on the page
+            # before
+            if kept.strip() or page_number == first_page:
+                last_page = page_number
+            break
+        section.append(text[start:])
+        last_page = page_number
+        if page_number - first_page + 1 >= max_span:
+            break
+
+    if first_page is None:
+        return None
+
+    return Abstract(''.join(section).strip(), first_page, last_page)
+
+
+def analyze_abstract(pdf_content: bytes | BytesIO | SpooledTemporaryFile | Path,
+                     language: str) -> tuple[int, Abstract | None, float, int]:
+    """
+    This function is the abstract-only counterpart of analyze_content(): it
+    counts a .pdf file's pages from its page tree and only lays out the
+    pages needed to extract the abstract. Its arguments and return value can
+    be pickled so it can run in a worker process.
+
+    :param pdf_content:     The .pdf file's content, or the path to it.
+    :type pdf_content:      bytes | BytesIO | SpooledTemporaryFile | Path
+    :param language:        The document's language, abbreviated.
+    :type language:         str
+    :return:                (Page count, Abstract or None, OCR quality,
+                            Token count)
+    """
+    if isinstance(pdf_content, Path):
+        with open(pdf_content, 'rb') as pdf_file:
+            return analyze_abstract(pdf_file, language)
+
+    pages = count_pages(pdf_content)
+    abstract = find_abstract(pdf_content)
+    if abstract is None:
+        return pages, None, 0.0, 0
+
+    abstract.text, ocr_quality = sanitize_text(abstract.text)
+    if language not in SUPPORTED_LANGUAGES:
+        language = 'fr'
+    tokens = get_token_count(abstract.text, language, tokenizer_only=True)
+
+    return pages, abstract, ocr_quality, tokens
+
+
+def save_abstract(pdf_file: PDFFile):
+    """
+    This function saves a .pdf file's abstract in its text file, under
+    ABSTRACT_BASE_DIR.
+
+    :param pdf_file:        The analyzed .pdf file.
+    :type pdf_file:         PDFFile
+    """
+    if pdf_file.abstract is None:
+        return
+
+    pdf_file.txt_file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(pdf_file.txt_file_path, 'w', encoding='utf8') as f:
+        f.write(pdf_file.abstract.text)
@@ -30,6 +30,30 @@ MANDATORY_METADATA_KEYS = [
 ]
 NULL_UUID = '00000000-0000-0000-0000-000000000000'
 UUID_PATTERN = r'[0-9a-f]{8}-([0-9a-f]{4}-){3}[0-9a-f]{12}$'
+DATE_PATTERN = r'\d{4}-\d{2}-\d{2}$'
+YEAR_PATTERN = r'\d{4}$'
+UUID_REGEX = re.compile(UUID_PATTERN)
+DATE_REGEX = re.compile(DATE_PATTERN, re.ASCII)
+YEAR_REGEX = re.compile(YEAR_PATTERN, re.ASCII)
+# For the idiots that can't catalog a valid date...
+INVALID_DATE = date(2038, 1, 20)
+# dtypes of the DissertationList's columns. Columns that aren't declared
+# keep the dtype pandas infers.
+DISSERTATION_SCHEMA = {
+    'title': 'string',
+    'publication_date': 'datetime64[ns]',
+    'url': 'string',
+    'deleted': 'bool',
+    'language': 'category',
+    'language_score': 'float32',
+    'pages': 'Int32',
+    'token_count': 'Int32',
+    'ocr_quality': 'float32',
+    'txt_file_name': 'string',
+    'url_status': 'category',
+    'abstract_pages': 'string',
+    'extraction_error': 'string'
+}
 
 
 # Functions
@@ -65,14 +89,129 @@ def record_to_dict(oai_record: Record) -> dict:
         if hasattr(oai_record.header, key):
             record['header'][key] = getattr(oai_record.header, key)
 
+    # Deleted records come without any metadata
+    metadata = getattr(oai_record, 'metadata', {})
     for key in MANDATORY_METADATA_KEYS:
-        if key in oai_record.metadata:
-            record['metadata'][key] = oai_record.metadata[key]
+        if key in metadata:
+            record['metadata'][key] = metadata[key]
 
     return record
 
 
+def parse_publication_date(dates: list) -> date:
+    """
+    This function returns a single valid date from a dc.date field's content.
+    A full ISO date is preferred over a year alone, which is placed in June.
+
+    :param dates:       The dc.date field's content.
+    :type dates:        list
+    :return:            The publication date, or INVALID_DATE.
+    """
+    first_year = None
+    for one_date in dates:
+        if DATE_REGEX.match(one_date):
+            return date.fromisoformat(one_date)
+        if first_year is None and YEAR_REGEX.match(one_date):
+            first_year = one_date
+
+    if first_year is not None:
+        return date.fromisoformat(f"{first_year}-06-01")
+
+    return INVALID_DATE
+
+
+def find_pdf_url(identifiers: list) -> str:
+    """
+    This function returns the first URL of a dc.identifier field's content
+    that points to the dissertations' file server.
+
+    :param identifiers:     The dc.identifier field's content.
+    :type identifiers:      list
+    :return:                The URL, or DISSERTATION_NO_URL_MSG.
+    """
+    for url in identifiers:
+        if url.startswith(DISSERTATIONS_FILE_SERVER_BASE):
+            return url
+    return DISSERTATION_NO_URL_MSG
+
+
+def apply_schema(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function casts a DataFrame's columns to the dtypes declared in
+    DISSERTATION_SCHEMA. Columns already in the right dtype are left as is.
+
+    :param data:        A DissertationList's DataFrame.
+    :type data:         pd.DataFrame
+    :return:            The DataFrame with its columns cast.
+    """
+    dtypes = {
+        label: dtype for label, dtype in DISSERTATION_SCHEMA.items()
+        if label in data.columns and data[label].dtype != dtype
+    }
+    if not dtypes:
+        return data
+    return data.astype(dtypes)
+
+
 # Classes
+class RecordFilter:
+    """
+    RecordFilter class
+
+    Predicate deciding whether a record, as a record_to_dict() dictionary,
+    should be kept. It is meant to be applied right after record_to_dict(),
+    so discarded records never become Dissertation objects or DataFrame rows.
+    """
+    def __init__(self,
+                 start_date: date | None = None,
+                 end_date: date | None = None,
+                 keep_deleted: bool = False,
+                 require_url: bool = False):
+        """
+        Class constructor
+
+        :param start_date:      Discards dissertations published before.
+        :type start_date:       date | None
+        :param end_date:        Discards dissertations published after.
+        :type end_date:         date | None
+        :param keep_deleted:    Keeps the records deleted in the repository.
+        :type keep_deleted:     bool
+        :param require_url:     Discards dissertations without a URL on the
+                                dissertations' file server.
+        :type require_url:      bool
+        """
+        if start_date and end_date and start_date > end_date:
+            raise ValueError("start_date can't be after end_date.")
+
+        self.start_date = start_date
+        self.end_date = end_date
+        self.keep_deleted = keep_deleted
+        self.require_url = require_url
+
+    def __call__(self, record: dict) -> bool:
+        """
+        Returns True if the record should be kept.
+        """
+        if record['header']['deleted'] and not self.keep_deleted:
+            return False
+
+        if self.start_date or self.end_date:
+            publication_date = parse_publication_date(record['metadata']['date'])
+            if self.start_date and publication_date < self.start_date:
+                return False
+            if self.end_date and publication_date > self.end_date:
+                return False
+
+        if self.require_url and \
+                find_pdf_url(record['metadata']['identifier']) == DISSERTATION_NO_URL_MSG:
+            return False
+
+        return True
+
+    def __repr__(self) -> str:
+        return f"<RecordFilter {self.start_date} - {self.end_date}>"
+
+
 class RecordObjectException(Exception):
     """
     The user passes an argument to a method that is not a
@@ -100,8 +239,21 @@ class Dissertation:
     metadata is enclosed in lists even if there is only one list item.
 
     Class properties are used throughout the class to return every metadata
-    in the right format.
+    in the right format. The publication date, URL and UUID are parsed once,
+    when the object is created, and the class uses __slots__ to keep large
+    lists of dissertations small in memory.
     """
+    __slots__ = (
+        '__id_dissertation',
+        '__title',
+        '__authors',
+        '__publishers',
+        '__contributors',
+        '__date',
+        '__url',
+        'is_deleted'
+    )
+
     def __init__(self,
                  db_identifier: str,
                  title: list,
@@ -139,8 +291,8 @@ class Dissertation:
         self.__authors = creators
         self.__publishers = publishers
         self.__contributors = contributors
-        self.__dates = publication_date
-        self.__url = identifiers
+        self.__date = parse_publication_date(publication_date)
+        self.__url = find_pdf_url(identifiers)
         self.is_deleted = is_deleted
 
     @classmethod
@@ -156,7 +308,21 @@ class Dissertation:
         if not isinstance(oai_record, Record):
             raise RecordObjectException('oai_record')
 
-        record = record_to_dict(oai_record)
+        return cls.create_from_dict(record_to_dict(oai_record))
+
+    @classmethod
+    def create_from_dict(cls, record: dict):
+        """
+        This method instantiates and returns a Dissertation object from a
+        dictionary shaped like the ones record_to_dict() returns, such as the
+        records kept in a local record store.
+
+        :param record:              A record's header and metadata.
+        :type record:               dict
+        :return:                    A Dissertation object.
+        """
+        if not isinstance(record, dict):
+            raise TypeError("record must be a valid dictionary.")
 
         return cls(
             record['header']['identifier'],
@@ -187,7 +353,7 @@ class Dissertation:
         if db_identifier and not isinstance(db_identifier, str):
             raise TypeError("identifier must be a valid string.")
 
-        matching_id = re.search(UUID_PATTERN, db_identifier)
+        matching_id = UUID_REGEX.search(db_identifier)
         if matching_id:
             self.__id_dissertation = matching_id.group(0)
 
@@ -246,37 +412,14 @@ class Dissertation:
         """
         Returns a single valid ISO format date.
         """
-        date_pattern = r'\d{4}-\d{2}-\d{2}$'
-        year_pattern = r'\d{4}$'
-        iso_dates = [
-            full_date for full_date in self.__dates if re.match(date_pattern,
-                                                                full_date,
-                                                                re.ASCII)
-        ]
-        years_only = [
-            one_year for one_year in self.__dates if re.match(year_pattern,
-                                                              one_year,
-                                                              re.ASCII)
-        ]
-        if iso_dates:
-            return date.fromisoformat(iso_dates[0])
-        if years_only:
-            return date.fromisoformat(f"{years_only[0]}-06-01")
-
-        # For the idiots that can't catalog a valid date...
-        return date.fromisoformat('2038-01-20')
+        return self.__date
 
     @property
     def url(self) -> str:
         """
         Returns a single URL pointing to the dissertation's .pdf file.
         """
-        urls = [
-            url for url in self.__url if url.startswith(DISSERTATIONS_FILE_SERVER_BASE)
-        ]
-        if urls:
-            return urls[0]
-        return DISSERTATION_NO_URL_MSG
+        return self.__url
 
     def __str__(self):
         return f"{self.authors}. {self.title} ({self.date.year})"
@@ -300,6 +443,8 @@ class DissertationList:
         The instantiation only provides the user with an empty DataFrame. Only
         the structure is predetermined. The data is then added using the class'
         append method.
+
+        Columns are kept in the dtypes declared in DISSERTATION_SCHEMA.
         """
         empty_dict = {
             'title': [],
@@ -307,7 +452,53 @@ class DissertationList:
             'url': [],
             'deleted': []
         }
-        self.__data = pd.DataFrame(empty_dict)
+        self.__data = apply_schema(pd.DataFrame(empty_dict))
+
+    @classmethod
+    def create_from_records(cls, records, predicate=None):
+        """
+        This method builds a DissertationList from record_to_dict()
+        dictionaries. Records the predicate rejects are skipped before any
+        Dissertation object is created.
+
+        :param records:         An iterable of record_to_dict() dictionaries.
+        :type records:          Iterable[dict]
+        :param predicate:       Returns True for the records to keep, such as
+                                a RecordFilter. None keeps every record.
+        :type predicate:        Callable[[dict], bool] | None
+        :return:                A DissertationList object.
+        """
+        dissertations = cls()
+        dissertations.extend(
+            Dissertation.create_from_dict(record) for record in records
+            if predicate is None or predicate(record)
+        )
+        return dissertations
+
+    @classmethod
+    def create_from_dataframe(cls, data: pd.DataFrame):
+        """
+        This method builds a DissertationList around an existing DataFrame,
+        such as one loaded back from saved results. The DataFrame must hold
+        at least the columns of an empty DissertationList.
+
+        :param data:            The dissertations' data, indexed by UUID.
+        :type data:             pd.DataFrame
+        :return:                A DissertationList object.
+        """
+        if not isinstance(data, pd.DataFrame):
+            raise TypeError("data must be a valid DataFrame.")
+
+        dissertations = cls()
+        missing = [
+            label for label in dissertations.data.columns
+            if label not in data.columns
+        ]
+        if missing:
+            raise KeyError(f"DataFrame is missing columns: {missing}.")
+
+        dissertations.__data = apply_schema(data)
+        return dissertations
 
     @property
     def data(self) -> pd.DataFrame:
@@ -335,7 +526,7 @@ class DissertationList:
                 "DataFrame object must match the existing data attribute."
             )
 
-        self.__data = other_data
+        self.__data = apply_schema(other_data)
 
     def add_column(self, label: str, default_value=np.nan):
         """
@@ -350,7 +541,94 @@ class DissertationList:
         if label in self.__data.columns:
             raise ValueError(f"Column {label} already exists.")
 
-        self.__data[label] = default_value
+        column = pd.Series(default_value, index=self.__data.index)
+        if label in DISSERTATION_SCHEMA:
+            column = column.astype(DISSERTATION_SCHEMA[label])
+        self.__data[label] = column
+
+    def filter_dates(self, start_date: date | None = None,
+                     end_date: date | None = None):
+        """
+        Keeps only the dissertations published between two dates, both
+        included. The comparison runs on the whole datetime64 column at once.
+        :param start_date:      Drops dissertations published before.
+        :type start_date:       date | None
+        :param end_date:        Drops dissertations published after.
+        :type end_date:         date | None
+        """
+        dates = self.__data['publication_date']
+        mask = pd.Series(True, index=self.__data.index)
+        if start_date is not None:
+            mask &= dates >= pd.Timestamp(start_date)
+        if end_date is not None:
+            mask &= dates <= pd.Timestamp(end_date)
+        self.__data = self.__data[mask]
+
+    def memory_usage(self) -> int:
+        """
+        Returns the DataFrame's size in memory, in bytes, strings included.
+        """
+        return int(self.__data.memory_usage(deep=True).sum())
+
+    def records(self, columns: list | None = None):
+        """
+        Returns a generator of named tuples, one per row, with the row's
+        index in their Index field. Unlike iterrows(), no Series is built
+        for each row.
+        :param columns:         The columns to read. None reads them all.
+        :type columns:          list | None
+        """
+        data = self.__data if columns is None else self.__data[columns]
+        return data.itertuples(name='DissertationRow')
+
+    def chunks(self, size: int, columns: list | None = None):
+        """
+        Returns a generator of consecutive slices of the DataFrame, so rows
+        can be processed in batches.
+        :param size:            The number of rows in each slice.
+        :type size:             int
+        :param columns:         The columns to read. None reads them all.
+        :type columns:          list | None
+        """
+        if size < 1:
+            raise ValueError("size must be a positive integer.")
+
+        data = self.__data if columns is None else self.__data[columns]
+        for start in range(0, len(data), size):
+            yield data.iloc[start:start + size]
+
+    def update_columns(self, index, columns: dict):
+        """
+        Writes many rows of many columns at once. Rows that are not in index
+        keep their values.
+        :param index:           The labels of the rows to update.
+        :type index:            Iterable
+        :param columns:         Mapping of column labels to the new values,
+                                in the same order as index.
+        :type columns:          dict
+        """
+        index = pd.Index(index)
+        if not index.isin(self.__data.index).all():
+            raise KeyError("index contains rows that are not in the list.")
+
+        for label, values in columns.items():
+            if label not in self.__data.columns:
+                raise KeyError(f"Column {label} doesn't exist.")
+            if len(values) != len(index):
+                raise ValueError(f"Column {label} doesn't match index length.")
+
+        mask = self.__data.index.isin(index)
+        for label, values in columns.items():
+            new_values = pd.Series(values, index=index, dtype=object)
+            column = new_values.reindex(self.__data.index).where(
+                mask,
+                self.__data[label].astype(object)
+            )
+            if label in DISSERTATION_SCHEMA:
+                column = column.astype(DISSERTATION_SCHEMA[label])
+            else:
+                column = column.infer_objects()
+            self.__data[label] = column
 
     def append(self, dissertation: Dissertation):
         """
@@ -361,20 +639,51 @@ class DissertationList:
         if not isinstance(dissertation, Dissertation):
             raise TypeError("Object provided must be a valid Dissertation.")
 
-        if dissertation.id_dissertation in self.__data.index.array:
-            warnings.warn(
-                f"Duplicate found: {repr(dissertation)} not added to list."
-            )
-        else:
-            metadata = {
-                'title': [dissertation.title],
-                'publication_date': [dissertation.date],
-                'url': [dissertation.url],
-                'deleted': [dissertation.is_deleted]
-            }
-
-            df = pd.DataFrame(metadata, index=[dissertation.id_dissertation])
-            self.__data = pd.concat([self.__data, df])
+        self.extend([dissertation])
+
+    def extend(self, dissertations):
+        """
+        Adds many Dissertation objects to the class' data property at once.
+
+        The metadata is gathered into columnar lists and duplicates are caught
+        with a set of known identifiers, so the DataFrame is only rebuilt once
+        no matter how many dissertations are added.
+        :param dissertations:   An iterable of Dissertation objects.
+        :type dissertations:    Iterable[Dissertation]
+        """
+        known_ids = set(self.__data.index)
+        index = []
+        metadata = {
+            'title': [],
+            'publication_date': [],
+            'url': [],
+            'deleted': []
+        }
+
+        for dissertation in dissertations:
+            if not isinstance(dissertation, Dissertation):
+                raise TypeError("Object provided must be a valid Dissertation.")
+
+            if dissertation.id_dissertation in known_ids:
+                warnings.warn(
+                    f"Duplicate found: {repr(dissertation)} not added to list."
+                )
+                continue
+
+            known_ids.add(dissertation.id_dissertation)
+            index.append(dissertation.id_dissertation)
+            metadata['title'].append(dissertation.title)
+            metadata['publication_date'].append(dissertation.date)
+            metadata['url'].append(dissertation.url)
+            metadata['deleted'].append(dissertation.is_deleted)
+
+        if index:
+            df = apply_schema(pd.DataFrame(metadata, index=index))
+            if self.__data.empty:
+                self.__data = df.reindex(columns=self.__data.columns)
+            else:
+                self.__data = pd.concat([self.__data, df])
+            self.__data = apply_schema(self.__data)
 
     def __str__(self) -> str:
         """
@@ -0,0 +1,678 @@
+"""
+extraction.py
+
+Module for extracting .pdf files' content across many processes
+
+pdfminer's layout analysis is pure Python and CPU-bound, so a single large
+thesis can keep a core busy for minutes. This module splits large documents
+into page ranges that worker processes extract in parallel, and provides the
+pool those workers run in, which kills workers stuck on pathological files.
+"""
+
+# Imports
+from collections import deque
+from concurrent.futures import Future
+from io import BytesIO
+import logging
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from multiprocessing.connection import wait as connection_wait
+import os
+from threading import Lock, Thread
+from time import monotonic
+from typing import BinaryIO
+from decouple import config
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LAParams, LTChar, LTTextContainer, LTFigure, LTImage
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+
+
+# Constants
+EXTRACTION_TIMEOUT = config('EXTRACTION_TIMEOUT', default=300, cast=float)
+EXTRACTION_MAX_PAGES = config('EXTRACTION_MAX_PAGES', default=1000, cast=int)
+EXTRACTION_PAGES_PER_TASK = config('EXTRACTION_PAGES_PER_TASK',
+                                   default=50,
+                                   cast=int)
+# Time given to a worker past its timeout before it is killed, since workers
+# only check their deadline between two pages.
+EXTRACTION_GRACE_PERIOD = 10
+# Layout analysis profiles, from the cheapest to the most thorough. 'raw'
+# skips layout analysis and reads characters in content stream order,
+# 'no_flow' groups characters into lines and boxes but orders the boxes by
+# position only, and 'full' is pdfminer's default analysis.
+EXTRACTION_PROFILES = ['raw', 'no_flow', 'full']
+# A profile, or 'auto' to probe each document for the cheapest one.
+EXTRACTION_PROFILE = config('EXTRACTION_PROFILE', default='auto')
+# Fraction of a character's width between two characters read as a space,
+# in the 'raw' profile. Same as LAParams' default word_margin.
+RAW_WORD_MARGIN = 0.1
+
+
+# Classes
+class ExtractedDocument:
+    """
+    ExtractedDocument class
+
+    This class holds the content extracted from a .pdf file: the text of each
+    page, the metadata of the images found in it and a few statistics about
+    each page. Images and statistics are described with dictionaries rather
+    than pdfminer objects so they can be sent back from worker processes.
+    """
+    def __init__(self,
+                 page_text: list | None = None,
+                 page_images: list | None = None,
+                 page_stats: list | None = None,
+                 page_count: int = 0,
+                 truncated: bool = False,
+                 timed_out: bool = False,
+                 error: str | None = None):
+        """
+        Class constructor
+
+        :param page_text:       The text of each extracted page.
+        :type page_text:        list
+        :param page_images:     The metadata of each image found.
+        :type page_images:      list
+        :param page_stats:      The statistics of each extracted page.
+        :type page_stats:       list
+        :param page_count:      The document's number of pages.
+        :type page_count:       int
+        :param truncated:       Pages past the page cap were not extracted.
+        :type truncated:        bool
+        :param timed_out:       The extraction was stopped by its timeout.
+        :type timed_out:        bool
+        :param error:           Why the extraction failed, if it did.
+        :type error:            str | None
+        """
+        self.page_text = page_text if page_text is not None else []
+        self.page_images = page_images if page_images is not None else []
+        self.page_stats = page_stats if page_stats is not None else []
+        self.page_count = page_count
+        self.truncated = truncated
+        self.timed_out = timed_out
+        self.error = error
+
+    @property
+    def complete(self) -> bool:
+        """
+        Returns True if every page of the document was extracted.
+        """
+        return not (self.truncated or self.timed_out or self.error)
+
+    def __repr__(self) -> str:
+        return f"<ExtractedDocument {len(self.page_text)} pages>"
+
+
+class WorkerDiedException(RuntimeError):
+    """
+    This Exception is raised for a task whose worker process died while
+    running it (out of memory, segfault...).
+    """
+
+    def __init__(self, exit_code: int | None):
+        """
+        Exception constructor
+
+        :param exit_code:   The worker's exit code.
+        :type exit_code:    int | None
+        """
+        self.message = f"The worker process died with exit code {exit_code}."
+        super(WorkerDiedException, self).__init__(self.message)
+
+
+class WorkerPool:
+    """
+    WorkerPool class
+
+    This class runs functions in a fixed number of worker processes and
+    returns a concurrent.futures.Future for each call. Every worker has its
+    own pipe and runs one task at a time, and a thread of the parent process
+    hands queued tasks to idle workers and collects their results.
+
+    Unlike ProcessPoolExecutor, the pool keeps a handle on each worker. A task
+    still running after timeout seconds is stopped by terminating its worker
+    alone, and a worker that dies only fails the task it was running. In both
+    cases the worker is replaced and the other tasks carry on.
+    """
+    def __init__(self,
+                 max_workers: int | None = None,
+                 timeout: float | None = None,
+                 initializer=None,
+                 initargs: tuple = ()):
+        """
+        Class constructor
+
+        :param max_workers:     The number of worker processes. Defaults to
+                                the number of cores.
+        :type max_workers:      int | None
+        :param timeout:         Seconds allowed to a task once a worker
+                                started it. None for no limit.
+        :type timeout:          float | None
+        :param initializer:     Called with initargs in each new worker.
+        :type initializer:      Callable | None
+        :param initargs:        The initializer's arguments.
+        :type initargs:         tuple
+        """
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("max_workers must be a positive integer.")
+
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout must be positive.")
+
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.__initializer = initializer
+        self.__initargs = initargs
+        self.__lock = Lock()
+        self.__closed = False
+        self.__queue = deque()
+        self.__idle = [self.__start_worker() for _ in range(self.max_workers)]
+        self.__busy = {}
+        self.__wakeup_reader, self.__wakeup_writer = Pipe(duplex=False)
+        self.__manager = Thread(target=self.__manage, daemon=True)
+        self.__manager.start()
+
+    def submit(self, function, *args) -> Future:
+        """
+        Queues a call to a function in a worker process. The function, its
+        arguments and its result must be picklable.
+
+        :param function:    A module-level function.
+        :type function:     Callable
+        :return:            The call's future.
+        """
+        future = Future()
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError("Can't submit tasks to a closed pool.")
+            self.__queue.append((future, function, args))
+            self.__dispatch()
+            # The manager has a new deadline to watch
+            self.__wakeup_writer.send(None)
+
+        return future
+
+    def close(self):
+        """
+        Terminates the worker processes. Queued tasks are cancelled and
+        running ones fail.
+        """
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+            queued = [future for future, _, _ in self.__queue]
+            running = [future for future, _ in self.__busy.values()]
+            workers = self.__idle + list(self.__busy)
+            self.__queue.clear()
+            self.__idle = []
+            self.__busy = {}
+
+        self.__wakeup_writer.send(None)
+        self.__manager.join()
+        for future in queued:
+            future.cancel()
+        for future in running:
+            future.set_exception(RuntimeError("The pool was closed."))
+        for worker in workers:
+            self.__stop_worker(worker)
+        self.__wakeup_reader.close()
+        self.__wakeup_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __start_worker(self) -> tuple:
+        """
+        Starts a worker process and returns it with its end of the pipe.
+        """
+        connection, worker_connection = Pipe()
+        process = Process(target=run_worker,
+                          args=(worker_connection,
+                                self.__initializer,
+                                self.__initargs),
+                          daemon=True)
+        process.start()
+        worker_connection.close()
+        return process, connection
+
+    @staticmethod
+    def __stop_worker(worker: tuple):
+        """
+        Terminates a worker process and closes its pipe.
+        """
+        process, connection = worker
+        process.terminate()
+        process.join()
+        connection.close()
+
+    def __dispatch(self):
+        """
+        Sends queued tasks to idle workers. The lock must be held.
+        """
+        while self.__queue and self.__idle:
+            future, function, args = self.__queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            worker = self.__idle.pop()
+            try:
+                worker[1].send((function, args))
+            except Exception as e:
+                # The task couldn't be pickled: the worker never got it
+                self.__idle.append(worker)
+                future.set_exception(e)
+                continue
+            deadline = monotonic() + self.timeout if self.timeout else None
+            self.__busy[worker] = (future, deadline)
+
+    def __manage(self):
+        """
+        Waits for results, dead workers and deadlines, and hands the next
+        queued tasks to the workers freed.
+        """
+        while True:
+            with self.__lock:
+                if self.__closed:
+                    return
+                busy = dict(self.__busy)
+
+            deadlines = [deadline for _, deadline in busy.values()
+                         if deadline is not None]
+            timeout = None
+            if deadlines:
+                timeout = max(min(deadlines) - monotonic(), 0)
+            ready = connection_wait(
+                [self.__wakeup_reader] +
+                [connection for _, connection in busy] +
+                [process.sentinel for process, _ in busy],
+                timeout
+            )
+            while self.__wakeup_reader.poll():
+                self.__wakeup_reader.recv()
+
+            outcomes = []
+            with self.__lock:
+                if self.__closed:
+                    return
+                for worker, (future, deadline) in busy.items():
+                    process, connection = worker
+                    if connection in ready:
+                        try:
+                            outcomes.append((future, *connection.recv()))
+                            self.__idle.append(worker)
+                            del self.__busy[worker]
+                            continue
+                        except (EOFError, OSError):
+                            # Died while sending its result
+                            process.join()
+                    elif process.sentinel not in ready and \
+                            (deadline is None or monotonic() < deadline):
+                        continue
+
+                    if process.is_alive():
+                        msg = f"Task killed after {self.timeout}s."
+                        logging.warning(msg)
+                        error = TimeoutError(msg)
+                    else:
+                        error = WorkerDiedException(process.exitcode)
+                        logging.warning(error.message)
+                    del self.__busy[worker]
+                    self.__stop_worker(worker)
+                    self.__idle.append(self.__start_worker())
+                    outcomes.append((future, False, error))
+                self.__dispatch()
+
+            for future, success, value in outcomes:
+                if success:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def __repr__(self) -> str:
+        return f"<WorkerPool {self.max_workers} workers>"
+
+
+# Functions
+def count_pages(pdf_content: bytes | BinaryIO) -> int:
+    """
+    This function counts a .pdf file's pages by walking its page tree,
+    without any layout analysis.
+
+    :param pdf_content:     The .pdf file's content, or a binary file
+                            object holding it.
+    :type pdf_content:      bytes | BinaryIO
+    :return:                The file's page count.
+    """
+    pdf_file = open_content(pdf_content)
+    counter = 0
+    for _ in PDFPage.get_pages(pdf_file):
+        counter += 1
+    pdf_file.seek(0)
+
+    return counter
+
+
+def extract_document(pdf_content: bytes | BinaryIO,
+                     max_pages: int = 0,
+                     timeout: float | None = None,
+                     profile: str = 'full',
+                     images: bool = True) -> ExtractedDocument:
+    """
+    This function extracts a whole .pdf file in a single layout analysis
+    pass, in the current process. The page count comes from the page tree,
+    so it is exact even when max_pages stops the extraction early.
+
+    :param pdf_content:     The .pdf file's content, or a binary file
+                            object holding it.
+    :type pdf_content:      bytes | BinaryIO
+    :param max_pages:       Pages past this cap are not extracted.
+    :type max_pages:        int
+    :param timeout:         Seconds allowed for the extraction.
+    :type timeout:          float | None
+    :param profile:         The layout analysis profile.
+    :type profile:          str
+    :param images:          Also gathers the images' metadata.
+    :type images:           bool
+    :return:                The extracted document.
+    """
+    try:
+        page_count = count_pages(pdf_content)
+    except Exception as e:
+        msg = f"Could not count pages because of {e}."
+        logging.warning(msg)
+        page_count = 0
+
+    result = extract_page_range(pdf_content,
+                                None,
+                                max_pages,
+                                timeout,
+                                profile,
+                                images)
+    return merge_parts({'page_count': page_count, 'parts': {0: result}})
+
+
+def merge_parts(result: dict) -> ExtractedDocument:
+    """
+    This function merges the parts of a document, as extracted by
+    extract_page_range(), back in page order.
+
+    :param result:          {'page_count', 'parts': {part number: part}}
+    :type result:           dict
+    :return:                The extracted document.
+    """
+    document = ExtractedDocument(page_count=result['page_count'])
+    errors = []
+    for part in sorted(result['parts']):
+        content = result['parts'][part]
+        document.page_text.extend(content.get('page_text', []))
+        document.page_images.extend(content.get('page_images', []))
+        document.page_stats.extend(content.get('page_stats', []))
+        document.timed_out |= content.get('timed_out', False)
+        if content.get('error'):
+            errors.append(content['error'])
+
+    if errors:
+        document.error = '; '.join(errors)
+    if not document.page_count:
+        document.page_count = len(document.page_text)
+    if document.page_count > len(document.page_text) and \
+            not (document.timed_out or document.error):
+        document.truncated = True
+
+    return document
+
+
+def split_pages(pdf_content: bytes | BinaryIO,
+                max_pages: int = 0,
+                pages_per_task: int = EXTRACTION_PAGES_PER_TASK) -> tuple[int, list]:
+    """
+    This function counts a .pdf file's pages and splits the ones to extract
+    into ranges of pages_per_task pages, which can be extracted in parallel
+    and merged back in page order with merge_parts().
+
+    :param pdf_content:     The .pdf file's content, or a binary file
+                            object holding it.
+    :type pdf_content:      bytes | BinaryIO
+    :param max_pages:       Pages past this cap are not extracted.
+                            0 means no cap.
+    :type max_pages:        int
+    :param pages_per_task:  The size of the page ranges. 0 disables
+                            splitting.
+    :type pages_per_task:   int
+    :return:                (Page count, list of page ranges). A single
+                            None range stands for the whole document.
+    """
+    try:
+        page_count = count_pages(pdf_content)
+    except Exception as e:
+        msg = f"Could not count pages because of {e}."
+        logging.warning(msg)
+        return 0, [None]
+
+    last_page = page_count
+    if max_pages:
+        last_page = min(page_count, max_pages)
+
+    if not pages_per_task or last_page <= pages_per_task:
+        return page_count, [None]
+
+    return page_count, [
+        range(first, min(first + pages_per_task, last_page))
+        for first in range(0, last_page, pages_per_task)
+    ]
+
+
+def run_worker(connection: Connection, initializer=None, initargs: tuple = ()):
+    """
+    This function is a WorkerPool worker's main loop: it runs the
+    (function, arguments) tasks it receives one at a time and sends back
+    (True, result) or (False, exception), until its pipe is closed.
+
+    :param connection:      The worker's end of its pipe.
+    :type connection:       multiprocessing.connection.Connection
+    :param initializer:     Called with initargs before the first task.
+    :type initializer:      Callable | None
+    :param initargs:        The initializer's arguments.
+    :type initargs:         tuple
+    """
+    if initializer is not None:
+        initializer(*initargs)
+
+    while True:
+        try:
+            function, args = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            outcome = (True, function(*args))
+        except Exception as e:
+            outcome = (False, e)
+        try:
+            connection.send(outcome)
+        except Exception as e:
+            # The result couldn't be pickled
+            connection.send((False, RuntimeError(str(e))))
+
+
+def open_content(pdf_content: bytes | BinaryIO) -> BinaryIO:
+    """
+    This function returns a binary file object holding a .pdf file's
+    content, rewound to its start.
+
+    :param pdf_content:     The .pdf file's content, or a binary file
+                            object holding it.
+    :type pdf_content:      bytes | BinaryIO
+    :return:                The binary file object.
+    """
+    if isinstance(pdf_content, bytes):
+        return BytesIO(pdf_content)
+
+    pdf_content.seek(0)
+    return pdf_content
+
+
+def extract_page_range(pdf_content: bytes | BinaryIO,
+                       page_range: range | None = None,
+                       max_pages: int = 0,
+                       timeout: float | None = None,
+                       profile: str = 'full',
+                       images: bool = True) -> dict:
+    """
+    This function extracts the text, image metadata and statistics of a
+    range of pages in a single layout analysis pass. It runs in the worker
+    processes, so it only returns objects that can be pickled.
+
+    Extraction stops at the first page past max_pages, or once timeout
+    seconds have gone by. Without images, figures are not searched for
+    images and page_images stays empty.
+
+    :param pdf_content:     The .pdf file's content, or a binary file
+                            object holding it.
+    :type pdf_content:      bytes | BinaryIO
+    :param page_range:      Zero-indexed pages to extract. None for all.
+    :type page_range:       range | None
+    :param max_pages:       Pages past this cap are not extracted.
+    :type max_pages:        int
+    :param timeout:         Seconds allowed for the extraction.
+    :type timeout:          float | None
+    :param profile:         The layout analysis profile.
+    :type profile:          str
+    :param images:          Also gathers the images' metadata.
+    :type images:           bool
+    :return:                {'page_text', 'page_images', 'page_stats',
+                            'timed_out', 'error'}
+    """
+    deadline = monotonic() + timeout if timeout else None
+    first_page = page_range[0] if page_range else 0
+    result = {
+        'page_text': [],
+        'page_images': [],
+        'page_stats': [],
+        'timed_out': False,
+        'error': None
+    }
+
+    try:
+        pages = layout_pages(open_content(pdf_content),
+                             page_range,
+                             max_pages,
+                             profile_laparams(profile))
+        for page_number, page in enumerate(pages, start=first_page):
+            if profile == 'raw':
+                text = [raw_text(page)]
+            else:
+                text = [element.get_text() for element in page
+                        if isinstance(element, LTTextContainer)]
+            page_images = []
+            if images:
+                page_images = [
+                    {
+                        'page': page_number,
+                        'name': figure.name,
+                        'bbox': figure.bbox,
+                        'size': figure.srcsize
+                    }
+                    for element in page if isinstance(element, LTFigure)
+                    for figure in element if isinstance(figure, LTImage)
+                ]
+                result['page_images'].extend(page_images)
+            page_text = ''.join(text)
+            result['page_text'].append(page_text)
+            result['page_stats'].append({
+                'page': page_number,
+                'text_boxes': len(text),
+                'characters': len(page_text),
+                'images': len(page_images)
+            })
+            if deadline is not None and monotonic() > deadline:
+                result['timed_out'] = True
+                break
+    except Exception as e:
+        msg = f"pdfminer could not extract content because of {e}"
+        logging.warning(msg)
+        result['error'] = str(e)
+
+    return result
+
+
+def layout_pages(pdf_file: BinaryIO,
+                 page_numbers: range | None = None,
+                 max_pages: int = 0,
+                 laparams: LAParams | None = None):
+    """
+    This function lays out a .pdf file's pages one at a time. Unlike
+    pdfminer's extract_pages(), it accepts laparams=None, which skips the
+    layout analysis and leaves the characters ungrouped.
+
+    :param pdf_file:        A binary file object holding the .pdf file.
+    :type pdf_file:         BinaryIO
+    :param page_numbers:    Zero-indexed pages to lay out. None for all.
+    :type page_numbers:     range | None
+    :param max_pages:       Pages past this cap are not laid out.
+    :type max_pages:        int
+    :param laparams:        The layout analysis parameters.
+    :type laparams:         LAParams | None
+    :return:                A generator of LTPage.
+    """
+    resource_manager = PDFResourceManager(caching=True)
+    device = PDFPageAggregator(resource_manager, laparams=laparams)
+    interpreter = PDFPageInterpreter(resource_manager, device)
+    for page in PDFPage.get_pages(pdf_file, page_numbers, maxpages=max_pages):
+        interpreter.process_page(page)
+        yield device.get_result()
+
+
+def profile_laparams(profile: str) -> LAParams | None:
+    """
+    This function returns the layout analysis parameters of a profile.
+
+    :param profile:         One of EXTRACTION_PROFILES.
+    :type profile:          str
+    :return:                The profile's LAParams, None for 'raw'.
+    """
+    if profile not in EXTRACTION_PROFILES:
+        raise ValueError(f"profile must be one of {EXTRACTION_PROFILES}.")
+
+    if profile == 'raw':
+        return None
+    if profile == 'no_flow':
+        # Skips the hierarchical grouping of text boxes, pdfminer's most
+        # expensive step on text-heavy pages.
+        return LAParams(boxes_flow=None)
+    return LAParams()
+
+
+def raw_text(page) -> str:
+    """
+    This function rebuilds a page's text from its ungrouped characters, as
+    laid out without layout analysis. A new line starts whenever the
+    baseline moves, and a space is added wherever two characters of a line
+    are further apart than RAW_WORD_MARGIN.
+
+    :param page:            A page laid out with laparams=None.
+    :type page:             pdfminer.layout.LTPage
+    :return:                The page's text.
+    """
+    text = []
+    previous = None
+    for char in page:
+        if not isinstance(char, LTChar):
+            continue
+        if previous is not None:
+            if abs(char.y0 - previous.y0) > previous.height / 2:
+                text.append('\n')
+            elif char.x0 - previous.x1 > previous.width * RAW_WORD_MARGIN and \
+                    not char.get_text().isspace() and \
+                    not previous.get_text().isspace():
+                text.append(' ')
+        text.append(char.get_text())
+        previous = char
+    if text:
+        text.append('\n')
+
+    return ''.join(text)
@@ -0,0 +1,760 @@
+"""
+harvesting.py
+
+Module for harvesting dissertations' records from the OAI repository
+
+Records are kept in a local store so that each run only has to ask the
+repository for the records that were added, changed or deleted since the
+previous harvest. Sets, and date windows within a set, can be harvested
+concurrently since each OAI-PMH list is paged strictly sequentially.
+"""
+
+# Imports
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import json
+import logging
+from pathlib import Path
+import sqlite3
+from threading import Lock
+from decouple import config
+from requests.exceptions import RequestException
+from sickle import Sickle
+from sickle.iterator import OAIResponseIterator
+from sickle.models import Record
+from sickle.oaiexceptions import BadResumptionToken, NoRecordsMatch
+from classes.dissertations import (DissertationList,
+                                   RecordFilter,
+                                   record_to_dict)
+from classes.oai_parser import OAI_NAMESPACE, parse_list_records
+
+
+# Constants
+HARVEST_STORE = Path(__file__).resolve().parent.parent / 'oai_records.sqlite3'
+DAY_GRANULARITY = 'YYYY-MM-DD'
+HARVEST_RETRIES = config('HARVEST_RETRIES', default=3, cast=int)
+HARVEST_WINDOWS = config('HARVEST_WINDOWS', default=4, cast=int)
+HARVEST_THREADS = config('HARVEST_THREADS', default=4, cast=int)
+HARVEST_CONNECT_TIMEOUT = config('HARVEST_CONNECT_TIMEOUT', default=10, cast=float)
+HARVEST_READ_TIMEOUT = config('HARVEST_READ_TIMEOUT', default=120, cast=float)
+# Sickle retries these statuses itself, after the server's Retry-After delay
+HARVEST_RETRY_STATUSES = [429, 500, 502, 503, 504]
+HARVEST_RETRY_AFTER = config('HARVEST_RETRY_AFTER', default=30, cast=int)
+RECORD_FETCH_SIZE = 1000
+HARVEST_FAST_PARSER = config('HARVEST_FAST_PARSER', default=True, cast=bool)
+
+
+# Classes
+class HarvestException(RuntimeError):
+    """
+    This Exception is raised when some of a harvest's windows failed, or
+    some sets' windows couldn't be planned. The records of the other windows
+    are stored, and the failed windows are resumed from their checkpoints by
+    the next harvest.
+    """
+
+    def __init__(self, failures: dict, harvested: int):
+        """
+        Exception constructor
+
+        :param failures:    Maps each failed (set, from, until) window to
+                            the exception it raised. Sets whose windows
+                            couldn't be planned have None dates.
+        :type failures:     dict
+        :param harvested:   The number of records the other windows
+                            harvested.
+        :type harvested:    int
+        """
+        self.failures = failures
+        self.harvested = harvested
+        windows = ', '.join(
+            f"{oai_set} from {from_date} until {until_date}"
+            if from_date is not None else f"{oai_set} (windows not planned)"
+            for oai_set, from_date, until_date in failures
+        )
+        self.message = f"Could not harvest {len(failures)} windows: {windows}."
+        super(HarvestException, self).__init__(self.message)
+
+
+class RecordStore:
+    """
+    RecordStore class
+
+    This class persists harvested records in an SQLite database, keyed by
+    their OAI identifier, along with each set's harvest state. Records are
+    stored in the record_to_dict() format, so a DissertationList can be
+    rebuilt from the store without contacting the repository.
+    """
+    def __init__(self, path: Path = HARVEST_STORE):
+        """
+        Class constructor
+
+        :param path:    The path to the SQLite database.
+        :type path:     Path
+        """
+        if not isinstance(path, Path):
+            raise TypeError("path must be a valid Path.")
+
+        self.path = path
+        self.__lock = Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        with self.__db:
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "identifier TEXT PRIMARY KEY, "
+                "datestamp TEXT, "
+                "deleted INTEGER NOT NULL, "
+                "record TEXT NOT NULL)"
+            )
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT)"
+            )
+
+    def save(self,
+             records: list,
+             state: dict | None = None,
+             discarded: list | None = None):
+        """
+        Inserts new records and replaces the ones already in the store. State
+        values given along are saved in the same transaction, so a checkpoint
+        never gets ahead of the records it points after.
+
+        :param records:     (record_to_dict() dictionary, datestamp) tuples.
+        :type records:      list
+        :param state:       State values to set along with the records.
+        :type state:        dict | None
+        :param discarded:   Identifiers of records to remove from the store.
+        :type discarded:    list | None
+        """
+        rows = [
+            (record['header']['identifier'],
+             datestamp,
+             int(record['header']['deleted']),
+             json.dumps(record))
+            for record, datestamp in records
+        ]
+        with self.__lock, self.__db:
+            self.__db.executemany(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)",
+                rows
+            )
+            if discarded:
+                self.__db.executemany(
+                    "DELETE FROM records WHERE identifier = ?",
+                    ((identifier,) for identifier in discarded)
+                )
+            if state:
+                self.__db.executemany(
+                    "INSERT OR REPLACE INTO state VALUES (?, ?)",
+                    state.items()
+                )
+
+    def get_state(self, key: str) -> str | None:
+        """
+        Returns a harvest state value.
+
+        :param key:     The state's key.
+        :type key:      str
+        :return:        The state's value, or None if it was never set.
+        """
+        with self.__lock:
+            row = self.__db.execute("SELECT value FROM state WHERE key = ?",
+                                    (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str | None):
+        """
+        Sets a harvest state value, or removes it when the value is None.
+
+        :param key:     The state's key.
+        :type key:      str
+        :param value:   The state's value.
+        :type value:    str | None
+        """
+        with self.__lock, self.__db:
+            if value is None:
+                self.__db.execute("DELETE FROM state WHERE key = ?", (key,))
+            else:
+                self.__db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)",
+                                  (key, value))
+
+    def records(self, include_deleted: bool = True):
+        """
+        Returns a generator of the stored records, as record_to_dict()
+        dictionaries. Rows are read in batches, so memory doesn't grow with
+        the size of the store.
+
+        :param include_deleted:     Also returns the deleted records.
+        :type include_deleted:      bool
+        """
+        query = "SELECT identifier, record FROM records WHERE identifier > ?"
+        if not include_deleted:
+            query += " AND deleted = 0"
+        query += f" ORDER BY identifier LIMIT {RECORD_FETCH_SIZE}"
+
+        last_identifier = ''
+        while True:
+            with self.__lock:
+                rows = self.__db.execute(query, (last_identifier,)).fetchall()
+            if not rows:
+                return
+            for _, record in rows:
+                yield json.loads(record)
+            last_identifier = rows[-1][0]
+
+    def to_dissertation_list(self, predicate=None) -> DissertationList:
+        """
+        Builds a DissertationList from the stored records the predicate
+        keeps. Deleted records are skipped in the query itself when the
+        predicate is a RecordFilter that discards them.
+
+        :param predicate:   Returns True for the records to keep, such as a
+                            RecordFilter. None keeps every record.
+        :type predicate:    Callable[[dict], bool] | None
+        :return:            The list of the stored dissertations kept.
+        """
+        include_deleted = not isinstance(predicate, RecordFilter) or \
+            predicate.keep_deleted
+        return DissertationList.create_from_records(
+            self.records(include_deleted),
+            predicate
+        )
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        with self.__lock:
+            self.__db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"<RecordStore {self.path}>"
+
+
+class Harvester:
+    """
+    Harvester class
+
+    This class harvests a set's records from an OAI-PMH repository into a
+    RecordStore, one response page at a time.
+
+    Incremental harvests only ask for the records whose datestamp is on or
+    after the latest datestamp of the previous successful harvest. The
+    repository reports deleted records with their header only, and they are
+    stored as deleted.
+
+    After each page, the resumptionToken of the next page is checkpointed in
+    the store along with the page's records. A harvest that crashed or timed
+    out resumes from its last checkpoint instead of starting over, and
+    request failures are retried from the checkpoint up to retries times.
+    """
+    def __init__(self,
+                 repository_url: str,
+                 oai_set: str,
+                 store: RecordStore,
+                 metadata_prefix: str = 'oai_dc',
+                 retries: int = HARVEST_RETRIES,
+                 state_key: str | None = None,
+                 predicate=None,
+                 fast_parser: bool = HARVEST_FAST_PARSER,
+                 timeout: tuple = (HARVEST_CONNECT_TIMEOUT,
+                                   HARVEST_READ_TIMEOUT),
+                 retry_after: int = HARVEST_RETRY_AFTER):
+        """
+        Class constructor
+
+        :param repository_url:  The OAI-PMH endpoint.
+        :type repository_url:   str
+        :param oai_set:         The set being harvested.
+        :type oai_set:          str
+        :param store:           The store the records are saved in.
+        :type store:            RecordStore
+        :param metadata_prefix: The records' metadata format.
+        :type metadata_prefix:  str
+        :param retries:         Times a failed harvest is resumed from its
+                                last checkpoint before giving up.
+        :type retries:          int
+        :param state_key:       The key the checkpoint is saved under.
+                                Defaults to the set, and must be unique among
+                                harvesters running at the same time.
+        :type state_key:        str | None
+        :param predicate:       Returns True for the records to store, such
+                                as a RecordFilter. Other records are removed
+                                from the store. None stores every record.
+        :type predicate:        Callable[[dict], bool] | None
+        :param fast_parser:     Parses responses with oai_parser instead of
+                                Sickle's models.
+        :type fast_parser:      bool
+        :param timeout:         (connect, read) timeouts of each request, in
+                                seconds.
+        :type timeout:          tuple
+        :param retry_after:     Seconds to wait before retrying a throttled
+                                or failed request, unless the repository
+                                sends a Retry-After header.
+        :type retry_after:      int
+        """
+        if not isinstance(store, RecordStore):
+            raise TypeError("store must be a valid RecordStore.")
+
+        self.repository_url = repository_url
+        self.oai_set = oai_set
+        self.store = store
+        self.metadata_prefix = metadata_prefix
+        self.retries = retries
+        self.state_key = state_key or oai_set
+        self.predicate = predicate
+        self.fast_parser = fast_parser
+        self.latest_datestamp = None
+        self.sickle = Sickle(repository_url,
+                             iterator=OAIResponseIterator,
+                             max_retries=retries,
+                             retry_status_codes=HARVEST_RETRY_STATUSES,
+                             default_retry_after=retry_after,
+                             timeout=timeout)
+        self.__identify_response = None
+
+    @property
+    def last_datestamp(self) -> str | None:
+        """
+        Returns the latest datestamp of the last successful harvest.
+        """
+        return self.store.get_state(f"{self.oai_set}:last_datestamp")
+
+    @last_datestamp.setter
+    def last_datestamp(self, datestamp: str | None):
+        """
+        Sets the latest datestamp of the last successful harvest.
+        """
+        self.store.set_state(f"{self.oai_set}:last_datestamp", datestamp)
+
+    @property
+    def checkpoint(self) -> dict | None:
+        """
+        Returns the checkpoint of an unfinished harvest, if there is one.
+        """
+        checkpoint = self.store.get_state(f"{self.state_key}:checkpoint")
+        return json.loads(checkpoint) if checkpoint else None
+
+    @checkpoint.setter
+    def checkpoint(self, checkpoint: dict | None):
+        """
+        Sets or clears the checkpoint of the current harvest.
+        """
+        value = json.dumps(checkpoint) if checkpoint is not None else None
+        self.store.set_state(f"{self.state_key}:checkpoint", value)
+
+    def harvest(self,
+                from_date: str | None = None,
+                until_date: str | None = None,
+                incremental: bool = True) -> int:
+        """
+        Harvests the records into the store and returns how many were
+        harvested. An unfinished harvest is resumed from its checkpoint, in
+        which case the dates given are ignored.
+
+        :param from_date:       Only harvests records from this datestamp on.
+                                Defaults to the last harvest's datestamp when
+                                harvesting incrementally.
+        :type from_date:        str | None
+        :param until_date:      Only harvests records up to this datestamp.
+        :type until_date:       str | None
+        :param incremental:     Starts from the last harvest's datestamp.
+        :type incremental:      bool
+        :return:                The number of records harvested.
+        """
+        checkpoint = self.checkpoint
+        if checkpoint is not None:
+            msg = f"Resuming harvest of {self.state_key} after " \
+                  f"{checkpoint['pages']} pages."
+            logging.info(msg)
+        else:
+            if incremental and from_date is None:
+                from_date = self.last_datestamp
+
+            params = {
+                'metadataPrefix': self.metadata_prefix,
+                'set': self.oai_set
+            }
+            if from_date:
+                params['from'] = self.format_datestamp(from_date)
+            if until_date:
+                params['until'] = self.format_datestamp(until_date)
+
+            checkpoint = {
+                'params': params,
+                'token': None,
+                'pages': 0,
+                'harvested': 0,
+                'latest': self.last_datestamp
+            }
+
+        attempts = 0
+        while True:
+            try:
+                self.__harvest_pages(checkpoint)
+                break
+            except BadResumptionToken as e:
+                # Expired token: start over from the same dates. Records
+                # already stored are simply replaced.
+                msg = f"Resumption token rejected ({e}), restarting harvest."
+                logging.warning(msg)
+                checkpoint['token'] = None
+                checkpoint['pages'] = 0
+            except RequestException as e:
+                attempts += 1
+                if attempts > self.retries:
+                    raise
+                msg = f"Harvest interrupted by {e}, resuming from checkpoint."
+                logging.warning(msg)
+
+        # Only a full harvest moves the starting point of the next one
+        self.latest_datestamp = checkpoint['latest']
+        if 'until' not in checkpoint['params']:
+            self.last_datestamp = checkpoint['latest']
+        self.checkpoint = None
+
+        msg = f"Harvested {checkpoint['harvested']} records from " \
+              f"{self.state_key}."
+        logging.info(msg)
+        return checkpoint['harvested']
+
+    def __harvest_pages(self, checkpoint: dict):
+        """
+        Harvests the pages left after a checkpoint, saving the records of
+        each page along with the updated checkpoint.
+        """
+        if checkpoint['pages'] and not checkpoint['token']:
+            # The last page was saved: nothing left to harvest.
+            return
+
+        params = checkpoint['params']
+        if checkpoint['token']:
+            params = {'resumptionToken': checkpoint['token']}
+
+        for records, token in self.pages(params):
+            datestamps = [datestamp for _, datestamp in records if datestamp]
+            latest = checkpoint['latest']
+            if datestamps and (latest is None or max(datestamps) > latest):
+                checkpoint['latest'] = max(datestamps)
+            checkpoint['token'] = token
+            checkpoint['pages'] += 1
+            discarded = []
+            if self.predicate is not None:
+                kept = []
+                for record, datestamp in records:
+                    if self.predicate(record):
+                        kept.append((record, datestamp))
+                    else:
+                        discarded.append(record['header']['identifier'])
+                records = kept
+            checkpoint['harvested'] += len(records)
+            self.store.save(
+                records,
+                state={f"{self.state_key}:checkpoint": json.dumps(checkpoint)},
+                discarded=discarded
+            )
+
+    def pages(self, params: dict):
+        """
+        Requests ListRecords pages and yields their records along with the
+        resumptionToken pointing to the next page.
+
+        :param params:      The ListRecords arguments.
+        :type params:       dict
+        :return:            A generator of (records, resumptionToken) tuples,
+                            records being (record_to_dict() dictionary,
+                            datestamp) tuples.
+        """
+        if self.fast_parser:
+            yield from self.__parse_pages(params)
+            return
+
+        try:
+            responses = self.sickle.ListRecords(**params)
+        except NoRecordsMatch:
+            return
+
+        for response in responses:
+            records = [
+                (record_to_dict(record), record.header.datestamp)
+                for record in (
+                    Record(element) for element in
+                    response.xml.iterfind(f".//{OAI_NAMESPACE}record")
+                )
+            ]
+            token = responses.resumption_token
+            yield records, token.token if token else None
+
+    def __parse_pages(self, params: dict):
+        """
+        Requests ListRecords pages and parses each of them once with
+        parse_list_records(), without Sickle's iterator and models.
+        """
+        params = dict(params, verb='ListRecords')
+        while True:
+            response = self.sickle.harvest(**params)
+            try:
+                records, token = parse_list_records(
+                    response.http_response.content
+                )
+            except NoRecordsMatch:
+                return
+
+            yield records, token
+            if not token:
+                return
+            params = {'verb': 'ListRecords', 'resumptionToken': token}
+
+    def earliest_datestamp(self) -> str:
+        """
+        Returns the datestamp of the repository's oldest record.
+        """
+        return self.__identify().earliestDatestamp
+
+    def format_datestamp(self, datestamp: str) -> str:
+        """
+        Truncates a datestamp to the repository's granularity.
+
+        :param datestamp:   A datestamp, as found in the records' headers.
+        :type datestamp:    str
+        :return:            The datestamp the repository accepts.
+        """
+        granularity = getattr(self.__identify(), 'granularity', '')
+        if granularity == DAY_GRANULARITY:
+            return datestamp[:10]
+        return datestamp
+
+    def __identify(self):
+        """
+        Returns the repository's Identify response, requesting it once.
+        """
+        if self.__identify_response is None:
+            self.__identify_response = self.sickle.Identify()
+        return self.__identify_response
+
+    def __repr__(self) -> str:
+        return f"<Harvester {self.repository_url} {self.state_key}>"
+
+
+class ParallelHarvester:
+    """
+    ParallelHarvester class
+
+    This class harvests one or many sets concurrently into a RecordStore.
+    Each set's datestamp range, from its last harvest (or the repository's
+    earliest datestamp) to today, is split into windows that are harvested
+    by separate Harvester objects, each with its own checkpoint.
+
+    Records are keyed by their identifier in the store, so a record found in
+    several sets is kept once. A set's last datestamp only moves once every
+    one of its windows was harvested.
+    """
+    def __init__(self,
+                 repository_url: str,
+                 oai_sets: list,
+                 store: RecordStore,
+                 windows: int = HARVEST_WINDOWS,
+                 max_threads: int = HARVEST_THREADS,
+                 metadata_prefix: str = 'oai_dc',
+                 predicate=None,
+                 retries: int = HARVEST_RETRIES):
+        """
+        Class constructor
+
+        :param repository_url:  The OAI-PMH endpoint.
+        :type repository_url:   str
+        :param oai_sets:        The sets being harvested.
+        :type oai_sets:         list
+        :param store:           The store the records are saved in.
+        :type store:            RecordStore
+        :param windows:         The number of date windows each set's
+                                harvest is split into.
+        :type windows:          int
+        :param max_threads:     The number of windows harvested at once.
+        :type max_threads:      int
+        :param metadata_prefix: The records' metadata format.
+        :type metadata_prefix:  str
+        :param predicate:       Returns True for the records to store, such
+                                as a RecordFilter. None stores every record.
+        :type predicate:        Callable[[dict], bool] | None
+        :param retries:         Times a failed window is resumed from its
+                                last checkpoint before giving up.
+        :type retries:          int
+        """
+        if not isinstance(store, RecordStore):
+            raise TypeError("store must be a valid RecordStore.")
+
+        if windows < 1 or max_threads < 1:
+            raise ValueError("windows and max_threads must be positive integers.")
+
+        self.repository_url = repository_url
+        self.oai_sets = list(oai_sets)
+        self.store = store
+        self.windows = windows
+        self.max_threads = max_threads
+        self.metadata_prefix = metadata_prefix
+        self.predicate = predicate
+        self.retries = retries
+
+    def harvest(self) -> int:
+        """
+        Harvests every set's windows concurrently and returns how many records
+        were harvested.
+
+        Each set's windows are planned once and saved in the store, so an
+        interrupted harvest resumes the same windows, with their checkpoints,
+        on any later day. Windows already harvested are skipped. The plan is
+        cleared once all of its windows were harvested.
+
+        :return:    The number of records harvested.
+        :raises HarvestException: Some windows could not be planned or
+                                  harvested. The other windows' records are
+                                  stored.
+        """
+        jobs = []
+        latest = {}
+        failures = {}
+        for oai_set in self.oai_sets:
+            try:
+                plan = self.__window_plan(oai_set)
+            except Exception as e:
+                # Without a last harvest, planning asks the repository for
+                # its earliest datestamp
+                msg = f"Could not plan the harvest of {oai_set} because of {e}."
+                logging.warning(msg)
+                failures[(oai_set, None, None)] = e
+                continue
+            for from_date, until_date in plan:
+                state_key = f"{oai_set}:{from_date}:{until_date}"
+                done = self.store.get_state(f"{state_key}:done")
+                if done is None:
+                    jobs.append((oai_set, from_date, until_date))
+                elif done > latest.get(oai_set, ''):
+                    latest[oai_set] = done
+
+        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
+            futures = [executor.submit(self.__harvest_window, *job)
+                       for job in jobs]
+
+        harvested = 0
+        for job, future in zip(jobs, futures):
+            oai_set = job[0]
+            try:
+                count, datestamp = future.result()
+            except Exception as e:
+                msg = f"Could not harvest {oai_set} from {job[1]} until " \
+                      f"{job[2]} because of {e}."
+                logging.warning(msg)
+                failures[job] = e
+                continue
+            harvested += count
+            if datestamp and datestamp > latest.get(oai_set, ''):
+                latest[oai_set] = datestamp
+
+        failed = {oai_set for oai_set, _, _ in failures}
+        for oai_set in self.oai_sets:
+            if oai_set in failed:
+                continue
+            if latest.get(oai_set):
+                self.store.set_state(f"{oai_set}:last_datestamp",
+                                     latest[oai_set])
+            for from_date, until_date in self.__window_plan(oai_set):
+                self.store.set_state(
+                    f"{oai_set}:{from_date}:{until_date}:done", None
+                )
+            self.store.set_state(f"{oai_set}:windows", None)
+
+        if failures:
+            raise HarvestException(failures, harvested)
+
+        return harvested
+
+    def __window_plan(self, oai_set: str) -> list:
+        """
+        Returns a set's saved windows, or splits its datestamp range, from its
+        last harvest (or the repository's earliest datestamp) to today, into
+        new windows and saves them.
+        """
+        plan = self.store.get_state(f"{oai_set}:windows")
+        if plan is not None:
+            return [tuple(window) for window in json.loads(plan)]
+
+        harvester = Harvester(self.repository_url,
+                              oai_set,
+                              self.store,
+                              self.metadata_prefix)
+        start = harvester.last_datestamp or harvester.earliest_datestamp()
+        windows = split_dates(date.fromisoformat(start[:10]),
+                              date.today(),
+                              self.windows)
+        self.store.set_state(f"{oai_set}:windows", json.dumps(windows))
+        return windows
+
+    def __harvest_window(self,
+                         oai_set: str,
+                         from_date: str,
+                         until_date: str) -> tuple[int, str | None]:
+        """
+        Harvests a single window of a set with its own Harvester, so each
+        window keeps its own checkpoint. Sickle sends each request on its
+        own, without a shared session. A finished window is marked done with
+        its latest datestamp.
+        """
+        state_key = f"{oai_set}:{from_date}:{until_date}"
+        harvester = Harvester(self.repository_url,
+                              oai_set,
+                              self.store,
+                              self.metadata_prefix,
+                              retries=self.retries,
+                              state_key=state_key,
+                              predicate=self.predicate)
+        harvested = harvester.harvest(from_date, until_date, incremental=False)
+        self.store.set_state(f"{state_key}:done",
+                             harvester.latest_datestamp or '')
+        return harvested, harvester.latest_datestamp
+
+    def __repr__(self) -> str:
+        return f"<ParallelHarvester {self.repository_url} {self.oai_sets}>"
+
+
+# Functions
+def split_dates(from_date: date, until_date: date, count: int) -> list:
+    """
+    This function splits a date range into consecutive, non-overlapping
+    windows of about the same length. Both ends of a window are included, as
+    with OAI-PMH's from and until arguments.
+
+    :param from_date:   The range's first day.
+    :type from_date:    date
+    :param until_date:  The range's last day.
+    :type until_date:   date
+    :param count:       The number of windows wanted.
+    :type count:        int
+    :return:            A list of (from, until) 'YYYY-MM-DD' tuples.
+    """
+    if until_date < from_date:
+        until_date = from_date
+
+    days = (until_date - from_date).days + 1
+    count = max(1, min(count, days))
+    windows = []
+    start = from_date
+    for window in range(count):
+        length = days // count + (1 if window < days % count else 0)
+        end = start + timedelta(days=length - 1)
+        windows.append((start.isoformat(), end.isoformat()))
+        start = end + timedelta(days=1)
+
+    return windows
@@ -0,0 +1,193 @@
+"""
+journal.py
+
+Module for journaling the analysis of .pdf files
+
+Every analyzed document is recorded in an SQLite journal as soon as it is
+finished, along with its metrics and the path of its OCR file. An
+interrupted run can therefore be restarted without analyzing the finished
+documents again.
+"""
+
+# Imports
+from pathlib import Path
+import sqlite3
+from threading import Lock
+from time import time
+from classes.pdf_files import (ANALYSIS_VERSION,
+                               DOWNLOAD_MAX_SIZE,
+                               PDFFile,
+                               URL_OK,
+                               URL_TOO_LARGE)
+
+
+# Constants
+ANALYSIS_JOURNAL = Path(__file__).resolve().parent.parent / 'analysis_journal.sqlite3'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_SKIPPED = 'skipped'
+JOURNAL_METRICS = [
+    'pages',
+    'token_count',
+    'ocr_quality',
+    'txt_file_name',
+    'url_status',
+    'abstract_pages',
+    'extraction_error'
+]
+
+
+# Classes
+class AnalysisJournal:
+    """
+    AnalysisJournal class
+
+    This class keeps the outcome of each document's analysis, keyed by the
+    dissertation's UUID. A document only counts as completed if it was
+    analyzed successfully, from the same URL and with the current
+    ANALYSIS_VERSION. Failed, moved or outdated documents are analyzed again,
+    and so are documents whose extraction timed out, failed or was truncated.
+
+    Files rejected for their size are skipped, and aren't downloaded again
+    until DOWNLOAD_MAX_SIZE changes.
+    """
+    def __init__(self, path: Path = ANALYSIS_JOURNAL, version: str = ANALYSIS_VERSION):
+        """
+        Class constructor
+
+        :param path:        The path to the SQLite database.
+        :type path:         Path
+        :param version:     The version of the analysis being journaled.
+        :type version:      str
+        """
+        if not isinstance(path, Path):
+            raise TypeError("path must be a valid Path.")
+
+        self.path = path
+        self.version = version
+        self.__lock = Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        with self.__db:
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "key TEXT PRIMARY KEY, "
+                "url TEXT NOT NULL, "
+                "version TEXT NOT NULL, "
+                "status TEXT NOT NULL, "
+                "pages INTEGER, "
+                "token_count INTEGER, "
+                "ocr_quality REAL, "
+                "txt_file_name TEXT, "
+                "url_status TEXT, "
+                "finished REAL NOT NULL)"
+            )
+            # Journals created before a metric was added lack its column
+            columns = [
+                row[1] for row in
+                self.__db.execute("PRAGMA table_info(documents)").fetchall()
+            ]
+            for label in JOURNAL_METRICS:
+                if label not in columns:
+                    self.__db.execute(
+                        f"ALTER TABLE documents ADD COLUMN {label}"
+                    )
+
+    def completed(self, documents: dict) -> dict:
+        """
+        Returns the metrics of the documents that don't need to be analyzed
+        again.
+
+        :param documents:   Mapping of keys to the documents' current URL.
+        :type documents:    dict
+        :return:            Mapping of keys to metrics dictionaries.
+        """
+        too_large = URL_TOO_LARGE.format(DOWNLOAD_MAX_SIZE)
+        with self.__lock:
+            rows = self.__db.execute(
+                f"SELECT key, url, status, {', '.join(JOURNAL_METRICS)} "
+                "FROM documents WHERE status IN (?, ?) AND version = ?",
+                (STATUS_DONE, STATUS_SKIPPED, self.version)
+            ).fetchall()
+
+        completed = {}
+        for key, url, status, *metrics in rows:
+            metrics = dict(zip(JOURNAL_METRICS, metrics))
+            if documents.get(key) != url:
+                continue
+            if status == STATUS_SKIPPED and metrics['url_status'] != too_large:
+                continue
+            completed[key] = metrics
+
+        return completed
+
+    def record(self, key: str, pdf_file: PDFFile) -> dict:
+        """
+        Records a finished document and returns its metrics.
+
+        :param key:         The document's key.
+        :type key:          str
+        :param pdf_file:    The analyzed .pdf file.
+        :type pdf_file:     PDFFile
+        :return:            The document's metrics.
+        """
+        metrics = pdf_file_metrics(pdf_file)
+        # A .pdf file has at least one page: none means the analysis failed
+        status = STATUS_DONE if metrics['url_status'] == URL_OK and \
+            metrics['pages'] and \
+            metrics['extraction_error'] is None else STATUS_FAILED
+        if metrics['url_status'] == URL_TOO_LARGE.format(DOWNLOAD_MAX_SIZE):
+            status = STATUS_SKIPPED
+
+        with self.__lock, self.__db:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO documents "
+                f"(key, url, version, status, finished, "
+                f"{', '.join(JOURNAL_METRICS)}) "
+                f"VALUES ({', '.join('?' * (len(JOURNAL_METRICS) + 5))})",
+                (key, pdf_file.url, self.version, status, time(),
+                 *(metrics[label] for label in JOURNAL_METRICS))
+            )
+
+        return metrics
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        with self.__lock:
+            self.__db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"<AnalysisJournal {self.path} (version {self.version})>"
+
+
+# Functions
+def pdf_file_metrics(pdf_file: PDFFile) -> dict:
+    """
+    This function gathers the metrics of an analyzed .pdf file, as they are
+    added to the dissertation list.
+
+    :param pdf_file:    The analyzed .pdf file.
+    :type pdf_file:     PDFFile
+    :return:            The file's metrics, keyed like JOURNAL_METRICS.
+    """
+    return {
+        'pages': int(pdf_file.pages),
+        'token_count': int(pdf_file.tokens),
+        'ocr_quality': float(pdf_file.ocr_quality),
+        'txt_file_name': pdf_file.txt_file_path.name,
+        'url_status': pdf_file.url_status,
+        'abstract_pages': pdf_file.abstract.page_span
+        if pdf_file.abstract is not None else None,
+        'extraction_error': pdf_file.extraction_error
+    }
@@ -0,0 +1,238 @@
+"""
+nlp_models.py
+
+Module for sharing spaCy models across the application
+
+Loading a spaCy model from disk is far more expensive than running it on a
+dissertation title or a single document, so models are loaded once per
+process and kept in a registry.
+"""
+
+# Imports
+from threading import Lock
+from time import perf_counter
+from langdetect import DetectorFactory, detect_langs
+from langdetect.lang_detect_exception import LangDetectException
+import spacy
+from spacy.language import Language
+from spacy.tokens import Doc
+
+
+# Constants
+SPACY_MODELS = {
+    'fr': 'fr_core_news_sm',
+    'en': 'en_core_web_sm',
+    'es': 'es_core_news_sm'
+}
+FULL_PIPELINE = 'full'
+TOKENIZER_ONLY = 'tokenizer'
+LANGUAGE_DETECTOR = 'language_detector'
+MODEL_VARIANTS = [FULL_PIPELINE, TOKENIZER_ONLY, LANGUAGE_DETECTOR]
+# Every trainable or rule-based component shipped with the *_sm models.
+# Names that a given model doesn't have are simply ignored by spacy.load().
+PIPELINE_COMPONENTS = [
+    'tok2vec',
+    'morphologizer',
+    'tagger',
+    'parser',
+    'senter',
+    'attribute_ruler',
+    'lemmatizer',
+    'ner'
+]
+
+
+UNKNOWN_LANGUAGE = {'language': 'UNKNOWN', 'score': 0.0}
+
+
+# Classes
+class TitleLanguageDetector:
+    """
+    TitleLanguageDetector class
+
+    spaCy pipeline component that detects a document's language with
+    langdetect and stores it in doc._.language.
+
+    Unlike spacy_language_detection's LanguageDetector, which exposes the
+    language through a getter computed on every access and needs sentence
+    boundaries, the result is stored as a plain value. It is therefore
+    computed inside nlp.pipe() worker processes and sent back with the Doc.
+    """
+    def __init__(self, seed: int = 42):
+        """
+        Class constructor
+
+        :param seed:    The seed given to langdetect's detector factory.
+        :type seed:     int
+        """
+        # langdetect's detectors are seeded so detection is deterministic
+        DetectorFactory.seed = seed
+        if not Doc.has_extension('language'):
+            Doc.set_extension('language', default=None)
+
+    def __call__(self, doc: Doc) -> Doc:
+        """
+        Stores the detected language and its score in doc._.language.
+        """
+        try:
+            detected_language = detect_langs(doc.text)[0]
+            doc._.language = {
+                'language': str(detected_language.lang),
+                'score': float(detected_language.prob)
+            }
+        except LangDetectException:
+            doc._.language = dict(UNKNOWN_LANGUAGE)
+
+        return doc
+
+
+class ModelRegistry:
+    """
+    ModelRegistry class
+
+    This class lazily loads spaCy models keyed by language and variant and
+    keeps them for the lifetime of the process. The tokenizer-only variant
+    is the same model loaded without any of its pipeline components, so it
+    tokenizes exactly like the full pipeline. The language detector variant
+    is the tokenizer-only model followed by a TitleLanguageDetector.
+
+    Loads are thread-safe: concurrent requests for the same model wait for a
+    single load instead of loading it several times.
+    """
+    def __init__(self):
+        """
+        Class constructor
+        """
+        self.__models = {}
+        self.__locks = {}
+        self.__registry_lock = Lock()
+        self.__hits = {}
+        self.__load_times = {}
+
+    def get(self, language: str, variant: str = FULL_PIPELINE) -> Language:
+        """
+        Returns the model for a language and variant, loading it on first use.
+
+        :param language:    The language, abbreviated.
+        :type language:     str
+        :param variant:     FULL_PIPELINE, TOKENIZER_ONLY or LANGUAGE_DETECTOR.
+        :type variant:      str
+        :return:            The spaCy Language object.
+        """
+        if not isinstance(language, str) or not isinstance(variant, str):
+            raise TypeError("language and variant must be strings.")
+
+        if language not in SPACY_MODELS:
+            raise ValueError(f"No spaCy model registered for {language}.")
+
+        if variant not in MODEL_VARIANTS:
+            raise ValueError(f"Unknown model variant: {variant}.")
+
+        key = (language, variant)
+        model = self.__models.get(key)
+        if model is None:
+            with self.__get_lock(key):
+                model = self.__models.get(key)
+                if model is None:
+                    model = self.__load(key)
+                    return model
+
+        with self.__registry_lock:
+            self.__hits[key] = self.__hits.get(key, 0) + 1
+
+        return model
+
+    def clear(self):
+        """
+        Drops every loaded model and resets the counters.
+        """
+        with self.__registry_lock:
+            self.__models.clear()
+            self.__locks.clear()
+            self.__hits.clear()
+            self.__load_times.clear()
+
+    @property
+    def hits(self) -> dict:
+        """
+        Returns the number of times each loaded model was reused.
+        """
+        with self.__registry_lock:
+            return dict(self.__hits)
+
+    @property
+    def load_times(self) -> dict:
+        """
+        Returns the time, in seconds, each model took to load.
+        """
+        with self.__registry_lock:
+            return dict(self.__load_times)
+
+    def __get_lock(self, key: tuple) -> Lock:
+        """
+        Returns the lock guarding the load of a single model.
+        """
+        with self.__registry_lock:
+            if key not in self.__locks:
+                self.__locks[key] = Lock()
+            return self.__locks[key]
+
+    def __load(self, key: tuple) -> Language:
+        """
+        Loads a model from disk and records its load time.
+        """
+        language, variant = key
+        start = perf_counter()
+        if variant in (TOKENIZER_ONLY, LANGUAGE_DETECTOR):
+            model = spacy.load(SPACY_MODELS[language],
+                               exclude=PIPELINE_COMPONENTS)
+        else:
+            model = spacy.load(SPACY_MODELS[language])
+        if variant == LANGUAGE_DETECTOR:
+            model.add_pipe(LANGUAGE_DETECTOR, last=True)
+        elapsed = perf_counter() - start
+
+        with self.__registry_lock:
+            self.__models[key] = model
+            self.__hits.setdefault(key, 0)
+            self.__load_times[key] = elapsed
+
+        return model
+
+    def __len__(self) -> int:
+        """
+        Returns the number of models currently loaded.
+        """
+        return len(self.__models)
+
+    def __repr__(self) -> str:
+        return f"<ModelRegistry {sorted(self.__models)}>"
+
+
+# Module-level registry shared by the whole process
+MODEL_REGISTRY = ModelRegistry()
+
+
+# Functions
+def get_lang_detector(nlp: Language, name: str) -> TitleLanguageDetector:
+    """
+    spaCy factory for the language detector pipeline component.
+    """
+    return TitleLanguageDetector(seed=42)
+
+
+if not Language.has_factory(LANGUAGE_DETECTOR):
+    Language.factory(LANGUAGE_DETECTOR, func=get_lang_detector)
+
+
+def get_model(language: str, variant: str = FULL_PIPELINE) -> Language:
+    """
+    This function returns a model from the process-wide registry.
+
+    :param language:    The language, abbreviated.
+    :type language:     str
+    :param variant:     FULL_PIPELINE, TOKENIZER_ONLY or LANGUAGE_DETECTOR.
+    :type variant:      str
+    :return:            The spaCy Language object.
+    """
+    return MODEL_REGISTRY.get(language, variant)
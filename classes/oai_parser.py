@@ -0,0 +1,121 @@
+"""
+oai_parser.py
+
+Module for parsing OAI-PMH ListRecords responses without Sickle's models
+
+sickle.models.Record converts every element of a record into generic
+dictionaries of lists, and each response is parsed again every time its xml
+attribute is read. Only two header fields and six Dublin Core fields are
+needed here, so this module streams a response's content once with
+iterparse, builds the record_to_dict() dictionaries directly and clears each
+record's elements as soon as they are read.
+"""
+
+# Imports
+from io import BytesIO
+from lxml import etree
+from sickle import oaiexceptions
+from classes.dissertations import (MANDATORY_METADATA_KEYS,
+                                   NULL_UUID)
+
+
+# Constants
+OAI_NAMESPACE = '{http://www.openarchives.org/OAI/2.0/}'
+DC_NAMESPACE = '{http://purl.org/dc/elements/1.1/}'
+RECORD_TAG = f"{OAI_NAMESPACE}record"
+ERROR_TAG = f"{OAI_NAMESPACE}error"
+RESUMPTION_TOKEN_TAG = f"{OAI_NAMESPACE}resumptionToken"
+HEADER_TAG = f"{OAI_NAMESPACE}header"
+IDENTIFIER_TAG = f"{OAI_NAMESPACE}identifier"
+DATESTAMP_TAG = f"{OAI_NAMESPACE}datestamp"
+METADATA_TAG = f"{OAI_NAMESPACE}metadata"
+DC_TAGS = {f"{DC_NAMESPACE}{key}": key for key in MANDATORY_METADATA_KEYS}
+
+
+# Functions
+def parse_list_records(content: bytes) -> tuple[list, str | None]:
+    """
+    This function parses a ListRecords response's content into the same
+    records Harvester.pages() builds with Sickle, in a single pass.
+
+    OAI-PMH errors are raised as Sickle's exceptions, so callers can handle
+    both parsers the same way.
+
+    :param content:     The response's raw content.
+    :type content:      bytes
+    :return:            (List of (record_to_dict() dictionary, datestamp)
+                        tuples, resumptionToken of the next page or None)
+    """
+    records = []
+    token = None
+    events = etree.iterparse(BytesIO(content),
+                             events=('end',),
+                             tag=(RECORD_TAG, ERROR_TAG, RESUMPTION_TOKEN_TAG),
+                             recover=True,
+                             resolve_entities=False,
+                             remove_blank_text=True)
+
+    for _, element in events:
+        if element.tag == RECORD_TAG:
+            records.append(element_to_dict(element))
+        elif element.tag == RESUMPTION_TOKEN_TAG:
+            token = element.text or None
+        else:
+            raise_oai_error(element)
+
+        # Records already read are dropped along with their siblings, so
+        # memory doesn't grow with the size of the page.
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+    return records, token
+
+
+def element_to_dict(element) -> tuple[dict, str | None]:
+    """
+    This function converts a record element into a record_to_dict()
+    dictionary.
+
+    :param element:     An OAI-PMH record element.
+    :type element:      lxml.etree._Element
+    :return:            (record_to_dict() dictionary, datestamp)
+    """
+    record = {
+        'header': {
+            'identifier': NULL_UUID,
+            'deleted': False
+        },
+        'metadata': {key: [] for key in MANDATORY_METADATA_KEYS}
+    }
+
+    datestamp = None
+    header = element.find(HEADER_TAG)
+    if header is not None:
+        record['header']['deleted'] = header.get('status') == 'deleted'
+        record['header']['identifier'] = header.findtext(IDENTIFIER_TAG)
+        datestamp = header.findtext(DATESTAMP_TAG)
+
+    # Deleted records come without any metadata
+    metadata = element.find(METADATA_TAG)
+    if metadata is not None and not record['header']['deleted']:
+        for field in metadata.iter(*DC_TAGS):
+            record['metadata'][DC_TAGS[field.tag]].append(field.text)
+
+    return record, datestamp
+
+
+def raise_oai_error(element):
+    """
+    This function raises the Sickle exception matching an OAI-PMH error
+    element, as Sickle's iterators do.
+
+    :param element:     An OAI-PMH error element.
+    :type element:      lxml.etree._Element
+    """
+    code = element.get('code', 'UNKNOWN')
+    description = element.text or ''
+    exception = getattr(oaiexceptions,
+                        code[0].upper() + code[1:],
+                        oaiexceptions.OAIError)
+    raise exception(description)
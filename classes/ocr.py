@@ -0,0 +1,266 @@
+"""
+ocr.py
+
+Module for running Tesseract on the pages pdfminer can't read
+
+Scanned theses, or theses whose fonts have no Unicode mapping, come out of
+pdfminer empty or full of (cid:N) glyphs. Only those pages are rasterized and
+sent to Tesseract, one process per page, so the cost of OCR grows with the
+number of bad pages rather than with the number of documents. Consecutive bad
+pages are rasterized together, by a single poppler call on the file on disk.
+
+pytesseract and pdf2image are optional, along with the tesseract and poppler
+binaries they drive. Without them, pages keep the text pdfminer extracted.
+"""
+
+# Imports
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from math import ceil
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import BinaryIO
+from decouple import config
+from classes.extraction import open_content
+
+try:
+    from pdf2image import convert_from_path
+    import pytesseract
+except ImportError:
+    convert_from_path = None
+    pytesseract = None
+
+
+# Constants
+OCR_ENABLED = config('OCR_ENABLED', default=True, cast=bool)
+OCR_DPI = config('OCR_DPI', default=300, cast=int)
+# Seconds allowed to rasterize a page, then as many to OCR it
+OCR_PAGE_TIMEOUT = config('OCR_PAGE_TIMEOUT', default=120, cast=float)
+# Each thread drives its own tesseract process. 0 means one per core, shared
+# among the processes that OCR at the same time.
+OCR_THREADS = config('OCR_THREADS', default=0, cast=int)
+# Set in each worker process by share_cores()
+OCR_PROCESSES_VARIABLE = 'OCR_PROCESSES'
+TESSERACT_LANGUAGES = {
+    'fr': 'fra',
+    'en': 'eng',
+    'es': 'spa'
+}
+
+
+# Functions
+def ocr_available() -> bool:
+    """
+    This function returns True if OCR is enabled and its optional
+    dependencies are installed.
+    """
+    return OCR_ENABLED and pytesseract is not None
+
+
+def share_cores(processes: int):
+    """
+    This function is meant as a process pool's initializer. Every worker of
+    the pool may OCR a document at the same time, so each of them only gets
+    its share of the cores when OCR_THREADS is 0, instead of a thread per
+    core.
+
+    :param processes:       The number of worker processes in the pool.
+    :type processes:        int
+    """
+    os.environ[OCR_PROCESSES_VARIABLE] = str(processes)
+
+
+def default_threads() -> int:
+    """
+    This function returns the number of pages OCRed at once when OCR_THREADS
+    is 0: the current process' share of the cores, and at least one.
+    """
+    processes = int(os.environ.get(OCR_PROCESSES_VARIABLE, 1))
+    return max(1, (os.cpu_count() or 1) // max(processes, 1))
+
+
+def ocr_pages(pdf_content: bytes | BinaryIO | Path,
+              page_numbers: list,
+              language: str,
+              max_threads: int = OCR_THREADS,
+              timeout: float = OCR_PAGE_TIMEOUT) -> dict:
+    """
+    This function rasterizes some pages of a .pdf file and runs Tesseract on
+    them in parallel. Pages that can't be rasterized or OCRed in time are
+    left out of the results.
+
+    poppler reads the file from disk: a file that isn't already there is
+    written once to a temporary directory, where the page images go too.
+    Consecutive pages are rasterized by a single call, split so that every
+    thread gets some of them.
+
+    :param pdf_content:     The .pdf file's content, a binary file object
+                            holding it, or the path to it.
+    :type pdf_content:      bytes | BinaryIO | Path
+    :param page_numbers:    Zero-indexed pages to OCR.
+    :type page_numbers:     list
+    :param language:        The document's language, abbreviated.
+    :type language:         str
+    :param max_threads:     The number of pages OCRed at once (0 for the
+                            process' share of the cores).
+    :type max_threads:      int
+    :param timeout:         Seconds allowed for each step of a single page.
+    :type timeout:          float
+    :return:                Mapping of page numbers to their OCR.
+    """
+    if not ocr_available() or not page_numbers:
+        return {}
+
+    # Pages are already OCRed in parallel: Tesseract's own threads would only
+    # compete with each other.
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    tesseract_language = TESSERACT_LANGUAGES.get(language,
+                                                 TESSERACT_LANGUAGES['fr'])
+    max_threads = min(max_threads or default_threads(), len(page_numbers))
+    runs = page_runs(page_numbers, ceil(len(page_numbers) / max_threads))
+
+    with TemporaryDirectory() as directory:
+        pdf_path = file_path(pdf_content, Path(directory))
+        with ThreadPoolExecutor(max_workers=max_threads) as executor:
+            futures = [
+                executor.submit(ocr_run,
+                                pdf_path,
+                                run,
+                                tesseract_language,
+                                directory,
+                                timeout)
+                for run in runs
+            ]
+
+        return {
+            page_number: text
+            for future in futures
+            for page_number, text in future.result().items()
+        }
+
+
+def file_path(pdf_content: bytes | BinaryIO | Path, directory: Path) -> Path:
+    """
+    This function returns the path of a .pdf file on disk, writing its
+    content to directory if it isn't a file there already.
+
+    :param pdf_content:     The .pdf file's content, a binary file object
+                            holding it, or the path to it.
+    :type pdf_content:      bytes | BinaryIO | Path
+    :param directory:       Where to write the content.
+    :type directory:        Path
+    :return:                The path to the file.
+    """
+    if isinstance(pdf_content, Path):
+        return pdf_content
+
+    name = getattr(pdf_content, 'name', None)
+    if isinstance(name, str) and Path(name).is_file():
+        return Path(name)
+
+    if not isinstance(pdf_content, bytes):
+        pdf_content = open_content(pdf_content).read()
+    pdf_path = directory / 'document.pdf'
+    pdf_path.write_bytes(pdf_content)
+
+    return pdf_path
+
+
+def page_runs(page_numbers: list, max_length: int) -> list:
+    """
+    This function groups page numbers into runs of consecutive pages, of at
+    most max_length pages each.
+
+    :param page_numbers:    Zero-indexed page numbers.
+    :type page_numbers:     list
+    :param max_length:      The longest run.
+    :type max_length:       int
+    :return:                A list of ranges, in page order.
+    """
+    runs = []
+    for page_number in sorted(set(page_numbers)):
+        if runs and runs[-1].stop == page_number and \
+                len(runs[-1]) < max_length:
+            runs[-1] = range(runs[-1].start, page_number + 1)
+        else:
+            runs.append(range(page_number, page_number + 1))
+
+    return runs
+
+
+def ocr_run(pdf_path: Path,
+            pages: range,
+            tesseract_language: str,
+            output_folder: str,
+            timeout: float = OCR_PAGE_TIMEOUT) -> dict:
+    """
+    This function rasterizes consecutive pages of a .pdf file with a single
+    poppler call and returns their OCR. Pages that failed are left out.
+
+    :param pdf_path:            The path to the .pdf file.
+    :type pdf_path:             Path
+    :param pages:               The zero-indexed pages to OCR.
+    :type pages:                range
+    :param tesseract_language:  Tesseract's language code.
+    :type tesseract_language:   str
+    :param output_folder:       Where to write the page images.
+    :type output_folder:        str
+    :param timeout:             Seconds allowed for each step of a page.
+    :type timeout:              float
+    :return:                    Mapping of page numbers to their OCR.
+    """
+    try:
+        images = convert_from_path(pdf_path,
+                                   dpi=OCR_DPI,
+                                   first_page=pages.start + 1,
+                                   last_page=pages.stop,
+                                   grayscale=True,
+                                   timeout=timeout * len(pages),
+                                   output_folder=output_folder,
+                                   output_file=f"page{pages.start}",
+                                   paths_only=True)
+    except Exception as e:
+        msg = f"Could not rasterize pages {pages.start + 1} to {pages.stop} " \
+              f"because of {e}."
+        logging.warning(msg)
+        return {}
+
+    results = {}
+    for page_number, image in zip(pages, images):
+        text = ocr_image(image, page_number, tesseract_language, timeout)
+        if text is not None:
+            results[page_number] = text
+
+    return results
+
+
+def ocr_image(image: str,
+              page_number: int,
+              tesseract_language: str,
+              timeout: float = OCR_PAGE_TIMEOUT) -> str | None:
+    """
+    This function returns the OCR of a page's image, or None if it failed or
+    timed out.
+
+    :param image:               The path to the page's image.
+    :type image:                str
+    :param page_number:         The zero-indexed page number.
+    :type page_number:          int
+    :param tesseract_language:  Tesseract's language code.
+    :type tesseract_language:   str
+    :param timeout:             Seconds allowed to OCR the page.
+    :type timeout:              float
+    :return:                    The page's OCR.
+    """
+    try:
+        text = pytesseract.image_to_string(image,
+                                           lang=tesseract_language,
+                                           timeout=timeout)
+        # Tesseract ends each page with a form feed, which page_quality()
+        # would count as a bad glyph.
+        return text.rstrip('\x0c')
+    except Exception as e:
+        msg = f"Could not OCR page {page_number + 1} because of {e}."
+        logging.warning(msg)
+        return None
@@ -0,0 +1,331 @@
+"""
+pdf_cache.py
+
+Module for keeping downloaded .pdf files on disk between runs
+
+Files are stored under PDF_BASE_DIR, named after a hash of their URL, and
+revalidated with conditional GET requests so unchanged files are never
+transferred twice. The cache is bounded in size and evicts the least
+recently used files first.
+"""
+
+# Imports
+from hashlib import sha256
+import logging
+import os
+from pathlib import Path
+import sqlite3
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from time import time
+from decouple import config
+from requests import Session
+from requests.exceptions import RequestException
+from classes.pdf_files import (FileTooLargeException,
+                               MissingSessionException,
+                               PDF_BASE_DIR,
+                               URL_OK,
+                               URL_VALIDATIONS,
+                               write_response)
+
+
+# Constants
+PDF_CACHE_INDEX = 'index.sqlite3'
+# 0 means no limit
+PDF_CACHE_MAX_SIZE = config('PDF_CACHE_MAX_SIZE',
+                            default=10 * 1024 ** 3,
+                            cast=int)
+PDF_CACHE_REVALIDATE = config('PDF_CACHE_REVALIDATE', default=True, cast=bool)
+
+
+# Classes
+class PDFCache:
+    """
+    PDFCache class
+
+    This class downloads .pdf files into a persistent cache directory. Each
+    file's ETag and Last-Modified headers are kept in an SQLite index along
+    with its size and last access time.
+
+    When revalidate is True, cached files are checked with a conditional GET
+    and only downloaded again if they changed on the server. When it is
+    False, cached files are used as is without any request.
+
+    Fetched files are pinned, and can't be evicted, until they are released.
+    """
+    def __init__(self,
+                 cache_dir: Path = PDF_BASE_DIR,
+                 max_size: int = PDF_CACHE_MAX_SIZE,
+                 revalidate: bool = PDF_CACHE_REVALIDATE):
+        """
+        Class constructor
+
+        :param cache_dir:       The directory the files are stored in.
+        :type cache_dir:        Path
+        :param max_size:        The maximum size of the cache, in bytes.
+                                0 means no limit.
+        :type max_size:         int
+        :param revalidate:      Checks cached files with conditional GETs.
+        :type revalidate:       bool
+        """
+        if not isinstance(cache_dir, Path):
+            raise TypeError("cache_dir must be a valid Path.")
+
+        if max_size < 0:
+            raise ValueError("max_size can't be negative.")
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.revalidate = revalidate
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self.bytes_downloaded = 0
+        self.__pinned = {}
+        self.__lock = Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.__index = sqlite3.connect(self.cache_dir / PDF_CACHE_INDEX,
+                                       check_same_thread=False)
+        with self.__index:
+            self.__index.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, "
+                "url TEXT NOT NULL, "
+                "etag TEXT, "
+                "last_modified TEXT, "
+                "size INTEGER NOT NULL, "
+                "last_access REAL NOT NULL)"
+            )
+
+    def path(self, url: str) -> Path:
+        """
+        Returns the path a URL's file is cached at.
+
+        :param url:     The URL of the .pdf file.
+        :type url:      str
+        :return:        The path to the cached file.
+        """
+        key = sha256(url.encode('utf8')).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.pdf"
+
+    def fetch(self, url: str, session: Session) -> tuple[bool, Path | None]:
+        """
+        Returns the path to a URL's cached file, downloading the file if it
+        isn't cached or if it changed on the server. The request validates
+        the URL and its outcome is recorded in URL_VALIDATIONS.
+
+        The file is pinned until release() is called with its path.
+
+        :param url:         The URL of the .pdf file.
+        :type url:          str
+        :param session:     A Requests Session.
+        :type session:      requests.Session
+        :return:            (Success flag, Path to the file or None)
+        """
+        if not isinstance(url, str):
+            raise TypeError("URL must be a valid string.")
+
+        if not isinstance(session, Session):
+            raise MissingSessionException(session)
+
+        file_path = self.path(url)
+        key = file_path.stem
+        with self.__lock:
+            self.__pinned[key] = self.__pinned.get(key, 0) + 1
+
+        success, cached_path = self.__fetch(url, session, file_path)
+        if not success:
+            self.release(file_path)
+
+        return success, cached_path
+
+    def release(self, file_path: Path):
+        """
+        Unpins a fetched file so it can be evicted again, and evicts files if
+        pinned ones kept the cache over its size.
+
+        :param file_path:   The path returned by fetch().
+        :type file_path:    Path
+        """
+        key = file_path.stem
+        with self.__lock:
+            if self.__pinned.get(key, 0) > 1:
+                self.__pinned[key] -= 1
+            else:
+                self.__pinned.pop(key, None)
+        self.__evict()
+
+    def report(self) -> dict:
+        """
+        Returns the cache's hit and miss counters along with its size.
+        """
+        with self.__lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'evictions': self.evictions,
+                'bytes_downloaded': self.bytes_downloaded,
+                'size': self.__index.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()[0]
+            }
+
+    def close(self):
+        """
+        Closes the cache's index.
+        """
+        with self.__lock:
+            self.__index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __fetch(self, url: str, session: Session, file_path: Path) \
+            -> tuple[bool, Path | None]:
+        """
+        Revalidates or downloads a URL's file into the cache.
+        """
+        key = file_path.stem
+        entry = self.__get_entry(key)
+        if entry is not None and not file_path.exists():
+            entry = None
+
+        if entry is not None and not self.revalidate:
+            # The file was downloaded successfully when it was cached
+            URL_VALIDATIONS.set(url, URL_OK)
+            self.__touch(key)
+            with self.__lock:
+                self.hits += 1
+            return True, file_path
+
+        headers = {}
+        if entry is not None:
+            etag, last_modified = entry
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        try:
+            with session.get(url, stream=True, headers=headers) as response:
+                if response.status_code == 304 and entry is not None:
+                    URL_VALIDATIONS.set(url, URL_OK)
+                    self.__touch(key)
+                    with self.__lock:
+                        self.hits += 1
+                        self.revalidations += 1
+                    return True, file_path
+
+                if not response.ok:
+                    URL_VALIDATIONS.set_http_status(url, response.status_code)
+                response.raise_for_status()
+                URL_VALIDATIONS.set(url, URL_OK)
+                size = self.__store(response, file_path)
+
+            self.__set_entry(key,
+                             url,
+                             response.headers.get('ETag'),
+                             response.headers.get('Last-Modified'),
+                             size)
+            with self.__lock:
+                self.misses += 1
+                self.bytes_downloaded += size
+            self.__evict()
+            return True, file_path
+        except (RequestException, Exception) as e:
+            msg = f"Could not download file at {url} because of {e}."
+            logging.warning(msg)
+            if isinstance(e, FileTooLargeException):
+                URL_VALIDATIONS.set(url, e.message)
+            elif URL_VALIDATIONS.get(url) in (None, URL_OK):
+                URL_VALIDATIONS.set(url, msg, transient=True)
+            return False, None
+
+    def __store(self, response, file_path: Path) -> int:
+        """
+        Streams a response's body to a temporary file, then moves it in place
+        so a failed download never leaves a partial file in the cache.
+        """
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(dir=file_path.parent,
+                                suffix='.part',
+                                delete=False) as temp_file:
+            try:
+                size = write_response(response, temp_file)
+            except Exception:
+                temp_file.close()
+                os.unlink(temp_file.name)
+                raise
+        os.replace(temp_file.name, file_path)
+        return size
+
+    def __get_entry(self, key: str) -> tuple | None:
+        """
+        Returns a cached file's (ETag, Last-Modified), if it is cached.
+        """
+        with self.__lock:
+            return self.__index.execute(
+                "SELECT etag, last_modified FROM entries WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+    def __set_entry(self, key: str, url: str, etag, last_modified, size: int):
+        """
+        Records a freshly downloaded file in the index.
+        """
+        with self.__lock, self.__index:
+            self.__index.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, etag, last_modified, size, time())
+            )
+
+    def __touch(self, key: str):
+        """
+        Updates a cached file's last access time.
+        """
+        with self.__lock, self.__index:
+            self.__index.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                (time(), key)
+            )
+
+    def __evict(self):
+        """
+        Deletes the least recently used files until the cache fits in
+        max_size. Pinned files are never evicted.
+        """
+        if not self.max_size:
+            return
+
+        with self.__lock, self.__index:
+            total = self.__index.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()[0]
+            if total <= self.max_size:
+                return
+
+            rows = self.__index.execute(
+                "SELECT key, size FROM entries ORDER BY last_access"
+            )
+            evicted = []
+            for key, size in rows:
+                if total <= self.max_size:
+                    break
+                if key in self.__pinned:
+                    continue
+                (self.cache_dir / key[:2] / f"{key}.pdf").unlink(missing_ok=True)
+                evicted.append((key,))
+                total -= size
+
+            self.__index.executemany("DELETE FROM entries WHERE key = ?",
+                                     evicted)
+            self.evictions += len(evicted)
+
+    def __repr__(self) -> str:
+        return f"<PDFCache {self.cache_dir}>"
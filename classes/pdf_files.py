@@ -11,24 +11,216 @@ from io import BytesIO
 import logging
 from pathlib import Path
 import re
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LTTextContainer, LTFigure, LTImage
-from requests import Session
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+from time import monotonic
+from typing import BinaryIO
+from decouple import config
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
-import spacy
+from urllib3.util.retry import Retry
+from classes.extraction import (EXTRACTION_MAX_PAGES,
+                                EXTRACTION_PAGES_PER_TASK,
+                                EXTRACTION_PROFILE,
+                                EXTRACTION_PROFILES,
+                                EXTRACTION_TIMEOUT,
+                                ExtractedDocument,
+                                count_pages,
+                                extract_document,
+                                extract_page_range,
+                                split_pages)
+from classes.nlp_models import get_model, TOKENIZER_ONLY
+from classes.ocr import ocr_available, ocr_pages
 
 
 # Constants
 BAD_OCR_PATTERN = r'\(cid\:[0-9]+\)|\x0c'
+BAD_OCR_REGEX = re.compile(BAD_OCR_PATTERN)
+EXTRA_SPACES_REGEX = re.compile(r' {2,}')
+# (cid:N) glyphs, form feeds and whitespace runs, told apart by their group.
+# Form feeds are bad characters, so they are kept out of the whitespace.
+PAGE_QUALITY_REGEX = re.compile(r'(\(cid:[0-9]+\))|(\x0c)|([^\S\x0c]+)')
+# Bump whenever the analysis' results change, so journaled documents are
+# analyzed again.
+ANALYSIS_VERSION = '4'
 BASE_DIR = Path(__file__).resolve().parent.parent
 PDF_BASE_DIR = BASE_DIR / 'original_pdf'
 OCR_BASE_DIR = BASE_DIR / 'ocr_text'
 PDF_INVALID_URL = 'Invalid URL provided'
 PDF_INVALID_FILE_NAME = 'invalid_file.pdf'
+URL_OK = 'OK'
+URL_NOT_PDF = 'Not a .pdf file'
+URL_TOO_LARGE = 'File larger than {} bytes'
 SUPPORTED_LANGUAGES = ['fr', 'en', 'es']
+TOKEN_CHUNK_SIZE = 100000
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# 0 means no limit
+DOWNLOAD_MAX_SIZE = config('DOWNLOAD_MAX_SIZE', default=0, cast=int)
+# Downloads bigger than this are spilled to a temporary file. 0 never spills.
+DOWNLOAD_SPILL_SIZE = config('DOWNLOAD_SPILL_SIZE',
+                             default=64 * 1024 * 1024,
+                             cast=int)
+BINARY_FILE_TYPES = (BytesIO, SpooledTemporaryFile)
+HTTP_POOL_SIZE = config('HTTP_POOL_SIZE', default=16, cast=int)
+HTTP_RETRIES = config('HTTP_RETRIES', default=3, cast=int)
+HTTP_BACKOFF_FACTOR = config('HTTP_BACKOFF_FACTOR', default=0.5, cast=float)
+HTTP_CONNECT_TIMEOUT = config('HTTP_CONNECT_TIMEOUT', default=10, cast=float)
+HTTP_READ_TIMEOUT = config('HTTP_READ_TIMEOUT', default=60, cast=float)
+HTTP_RETRY_STATUSES = [429, 500, 502, 503, 504]
+# Failed validations are kept for good only when the file is gone. Other
+# failures (timeouts, 429, 5xx...) are validated again after this many
+# seconds.
+URL_GONE_STATUSES = [404, 410]
+URL_RETRY_AFTER = config('URL_RETRY_AFTER', default=600, cast=float)
+OCR_QUALITY_THRESHOLD = config('OCR_QUALITY_THRESHOLD', default=0.99, cast=float)
+# Pages laid out with each profile when looking for the cheapest one
+PROFILE_PROBE_PAGES = config('PROFILE_PROBE_PAGES', default=3, cast=int)
+# Running text is about one sixth whitespace: far less means a profile glued
+# words together.
+PROFILE_MIN_WHITESPACE_RATIO = 0.05
+# Pages with less text than this are taken for scans and OCRed
+OCR_MIN_PAGE_CHARACTERS = config('OCR_MIN_PAGE_CHARACTERS', default=20, cast=int)
 
 
 # Classes
+class URLValidations:
+    """
+    URLValidations class
+
+    This class records the outcome of every URL validation, whether it comes
+    from a HEAD request or from the GET downloading the file. URLs are only
+    validated once, and the recorded outcome tells why a file was skipped.
+
+    Transient failures, such as timeouts or server errors, are forgotten
+    after retry_after seconds, so the URL is validated again.
+    """
+    def __init__(self, retry_after: float = URL_RETRY_AFTER):
+        """
+        Class constructor
+
+        :param retry_after:     Seconds a transient failure is kept.
+        :type retry_after:      float
+        """
+        self.retry_after = retry_after
+        self.__statuses = {}
+        self.__expiries = {}
+        self.__lock = Lock()
+
+    def get(self, url: str) -> str | None:
+        """
+        Returns a URL's validation status, or None if it wasn't validated.
+
+        :param url:     The validated URL.
+        :type url:      str
+        :return:        URL_OK or the reason the URL is invalid.
+        """
+        with self.__lock:
+            self.__expire(url)
+            return self.__statuses.get(url)
+
+    def set(self, url: str, status: str, transient: bool = False):
+        """
+        Records a URL's validation status.
+
+        :param url:         The validated URL.
+        :type url:          str
+        :param status:      URL_OK or the reason the URL is invalid.
+        :type status:       str
+        :param transient:   The failure may not happen again.
+        :type transient:    bool
+        """
+        with self.__lock:
+            self.__statuses[url] = status
+            if transient:
+                self.__expiries[url] = monotonic() + self.retry_after
+            else:
+                self.__expiries.pop(url, None)
+
+    def set_http_status(self, url: str, status_code: int):
+        """
+        Records the status of a failed request. Only files that are gone are
+        invalid for good.
+
+        :param url:         The validated URL.
+        :type url:          str
+        :param status_code: The response's HTTP status code.
+        :type status_code:  int
+        """
+        self.set(url,
+                 f"HTTP {status_code}",
+                 transient=status_code not in URL_GONE_STATUSES)
+
+    def clear(self):
+        """
+        Forgets every validation.
+        """
+        with self.__lock:
+            self.__statuses.clear()
+            self.__expiries.clear()
+
+    @property
+    def statuses(self) -> dict:
+        """
+        Returns a copy of every URL's validation status.
+        """
+        with self.__lock:
+            for url in list(self.__expiries):
+                self.__expire(url)
+            return dict(self.__statuses)
+
+    def __expire(self, url: str):
+        """
+        Forgets a transient failure once it is too old. The lock must be
+        held.
+        """
+        expiry = self.__expiries.get(url)
+        if expiry is not None and monotonic() >= expiry:
+            del self.__statuses[url]
+            del self.__expiries[url]
+
+    def __contains__(self, url: str) -> bool:
+        with self.__lock:
+            self.__expire(url)
+            return url in self.__statuses
+
+    def __len__(self) -> int:
+        return len(self.__statuses)
+
+
+# Module-level validations shared by the whole process
+URL_VALIDATIONS = URLValidations()
+
+
+class RepositorySession(Session):
+    """
+    RepositorySession class
+
+    A requests.Session that applies a default timeout to every request, since
+    requests waits forever by default.
+    """
+    def __init__(self, timeout: tuple[float, float] | float | None = None):
+        """
+        Class constructor
+
+        :param timeout:     The default (connect, read) timeout, in seconds.
+        :type timeout:      tuple[float, float] | float | None
+        """
+        super(RepositorySession, self).__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, *args, **kwargs):
+        """
+        Sends a request with the session's timeout unless one is given.
+        """
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super(RepositorySession, self).request(method,
+                                                      url,
+                                                      *args,
+                                                      **kwargs)
+
+
 class MissingSessionException(TypeError):
     """
     This Exception is raised whenever someone tries to pass an object other
@@ -49,6 +241,23 @@ class MissingSessionException(TypeError):
         super(MissingSessionException, self).__init__(self.message)
 
 
+class FileTooLargeException(ValueError):
+    """
+    This Exception is raised whenever a downloaded file is bigger than the
+    download size limit.
+    """
+
+    def __init__(self, max_size: int):
+        """
+        Exception constructor
+
+        :param max_size:        The download size limit, in bytes.
+        :type max_size:         int
+        """
+        self.message = URL_TOO_LARGE.format(max_size)
+        super(FileTooLargeException, self).__init__(self.message)
+
+
 class PDFFile:
     """
     This class is used to handle a .pdf file's container and content.
@@ -64,8 +273,12 @@ class PDFFile:
         self.language = None
         self.ocr = None
         self.ocr_quality = 0.0
+        self.page_quality = []
         self.pages = 0
         self.tokens = 0
+        self.url_status = None
+        self.extraction_error = None
+        self.abstract = None
 
     @property
     def url(self) -> str:
@@ -130,24 +343,36 @@ class PDFFile:
         self.__txt_file_path = path_to_file
 
     @classmethod
-    def create_from_url(cls, url: str, session: Session):
+    def create_from_url(cls, url: str, session: Session, validate: bool = True):
         """
         The method makes sure the URL sent is a valid URL and sets the URL,
         file_name and txt_file_name object properties if it is. If the URL or
         the file it points to are invalid, the method sends dummy values to
         the class constructor.
 
+        Without validation, no request is sent and only the URL's format is
+        checked: the URL is then expected to be validated by the download.
+
         :param url:         The URL address of the .pdf file.
         :type url:          str
         :param session:     A Requests session.
         :type session:      requests.Session
+        :param validate:    Sends a HEAD request to validate the URL.
+        :type validate:     bool
         """
         if not isinstance(session, Session):
             raise MissingSessionException(session)
 
         init_dir = OCR_BASE_DIR
+        url_status = URL_VALIDATIONS.get(url)
 
-        if not (is_valid_url(url, session) and url.lower().endswith('.pdf')):
+        if not url.lower().endswith('.pdf'):
+            url_status = URL_NOT_PDF
+        elif validate:
+            is_valid_url(url, session)
+            url_status = URL_VALIDATIONS.get(url)
+
+        if url_status not in (None, URL_OK):
             init_url = PDF_INVALID_URL
             init_file_name = PDF_INVALID_FILE_NAME
         else:
@@ -157,15 +382,63 @@ class PDFFile:
             init_dir = init_dir / url_parts[-2]
 
         txt_file = init_file_name.lower().replace('.pdf', '.txt')
-        return cls(init_url, init_file_name, init_dir / txt_file)
+        pdf_file = cls(init_url, init_file_name, init_dir / txt_file)
+        pdf_file.url_status = url_status
+        return pdf_file
 
 
 # Utility functions
+def create_session(pool_size: int = HTTP_POOL_SIZE,
+                   retries: int = HTTP_RETRIES,
+                   backoff_factor: float = HTTP_BACKOFF_FACTOR,
+                   connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                   read_timeout: float = HTTP_READ_TIMEOUT) -> RepositorySession:
+    """
+    This function creates a session tuned for downloading many files from the
+    repository: its connection pool keeps pool_size connections alive,
+    idempotent requests are retried with an exponential backoff on connection
+    errors and transient server errors, and every request has a timeout.
+
+    :param pool_size:       The number of connections kept alive per host.
+    :type pool_size:        int
+    :param retries:         The number of retries of a failed request.
+    :type retries:          int
+    :param backoff_factor:  The backoff factor between two retries.
+    :type backoff_factor:   float
+    :param connect_timeout: Seconds allowed to connect to the server.
+    :type connect_timeout:  float
+    :param read_timeout:    Seconds allowed between two bytes received.
+    :type read_timeout:     float
+    :return:                The configured session.
+    """
+    if pool_size < 1:
+        raise ValueError("pool_size must be a positive integer.")
+
+    retry = Retry(total=retries,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=HTTP_RETRY_STATUSES,
+                  allowed_methods=frozenset(['HEAD', 'GET']),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size,
+                          pool_maxsize=pool_size,
+                          max_retries=retry)
+
+    session = RepositorySession(timeout=(connect_timeout, read_timeout))
+    session.headers['Connection'] = 'keep-alive'
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
 def is_valid_url(url: str, session: Session) -> bool:
     """
     This function sends a HEAD request to a given URL and if it receives
     an 'ok' signal, it returns True.
 
+    The outcome is recorded in URL_VALIDATIONS and URLs that were already
+    validated, by a HEAD or by a download, aren't requested again.
+
     :param url:         The URL that needs validation.
     :type url:          str
     :param session:     A Requests Session.
@@ -178,106 +451,282 @@ def is_valid_url(url: str, session: Session) -> bool:
     if not isinstance(session, Session):
         raise MissingSessionException(session)
 
-    valid = False
+    if url in URL_VALIDATIONS:
+        return URL_VALIDATIONS.get(url) == URL_OK
+
+    status = None
 
     try:
         with session.head(url) as response:
             if response.ok:
-                valid = True
+                status = URL_OK
+                URL_VALIDATIONS.set(url, status)
+            else:
+                status = f"HTTP {response.status_code}"
+                URL_VALIDATIONS.set_http_status(url, response.status_code)
     except (RequestException, Exception) as e:
-        msg = f"Could not validate URL : {e}"
-        logging.warning(msg)
+        status = f"Could not validate URL : {e}"
+        logging.warning(status)
+        URL_VALIDATIONS.set(url, status, transient=True)
     finally:
-        return valid
+        return status == URL_OK
 
 
-def download_file(url: str, session: Session) -> tuple[bool, BytesIO]:
+def download_file(url: str,
+                  session: Session,
+                  validate: bool = True,
+                  max_size: int = DOWNLOAD_MAX_SIZE,
+                  spill_size: int = DOWNLOAD_SPILL_SIZE,
+                  destination: BinaryIO | None = None) \
+        -> tuple[bool, BinaryIO]:
     """
     This function downloads a .pdf file from a website, saves it in memory and
     returns a success flag and the binary object as a tuple.
 
+    Without a separate validation, the GET request itself validates the URL
+    and its outcome is recorded in URL_VALIDATIONS.
+
+    Chunks are written straight into the returned buffer, which is rewound
+    before it's returned. Files bigger than spill_size are written to a
+    temporary file instead of memory, and files bigger than max_size are
+    rejected, before the download when the server sends their size. Their
+    URL status then gives the size limit.
+
+    With a destination, such as a file on disk worker processes can open,
+    chunks are written there instead and the caller keeps it open or closed.
+
     :param url:         The URL to get the .pdf file.
     :type url:          str
     :param session:     A Requests Session.
     :type session:      requests.Session
-    :return:            (Success flag, BytesIO object)
+    :param validate:    Validates the URL with is_valid_url() first.
+    :type validate:     bool
+    :param max_size:    The maximum size of the file, in bytes (0: no limit).
+    :type max_size:     int
+    :param spill_size:  The size past which the file is spilled to disk
+                        (0: never).
+    :type spill_size:   int
+    :param destination: The binary file object to write the file into.
+    :type destination:  BinaryIO | None
+    :return:            (Success flag, Binary object)
     """
     if not isinstance(session, Session):
         raise MissingSessionException(session)
-    if not is_valid_url(url, session):
+    if validate and not is_valid_url(url, session):
         raise ValueError(f"Invalid URL : {url}")
 
     success = False
-    binary_object = BytesIO()
+    binary_object = BytesIO() if destination is None else destination
 
     try:
         with session.get(url, stream=True) as response:
+            if not response.ok:
+                URL_VALIDATIONS.set_http_status(url, response.status_code)
             response.raise_for_status()
-            bytes_object = b''
-            for chunk in response.iter_content(chunk_size=1024):
-                bytes_object += chunk
+            URL_VALIDATIONS.set(url, URL_OK)
+
+            if spill_size and destination is None:
+                binary_object = SpooledTemporaryFile(max_size=spill_size)
+            write_response(response, binary_object, max_size)
+        binary_object.seek(0)
         success = True
-        binary_object = BytesIO(bytes_object)
     except (RequestException, Exception) as e:
         msg = f"Could not download file at {url} because of {e}."
         logging.warning(msg)
+        if isinstance(e, FileTooLargeException):
+            URL_VALIDATIONS.set(url, e.message)
+        elif URL_VALIDATIONS.get(url) in (None, URL_OK):
+            URL_VALIDATIONS.set(url, msg, transient=True)
+        if destination is None:
+            binary_object.close()
+            binary_object = BytesIO()
     finally:
         return success, binary_object
 
 
-def get_page_count(binary_object: BytesIO) -> int:
+def write_response(response: Response,
+                   binary_object,
+                   max_size: int = DOWNLOAD_MAX_SIZE) -> int:
+    """
+    This function streams a response's body into a binary file object and
+    returns the number of bytes written. Bodies bigger than max_size raise a
+    FileTooLargeException, before anything is written when the server sends
+    their size.
+
+    :param response:        A response requested with stream=True.
+    :type response:         requests.Response
+    :param binary_object:   The file object the body is written into.
+    :type binary_object:    BinaryIO
+    :param max_size:        The maximum size of the body (0: no limit).
+    :type max_size:         int
+    :return:                The body's size, in bytes.
     """
-    This function extracts the pages from a binary representation of a .pdf
-    file, counts the number of pages and returns the count.
+    content_length = int(response.headers.get('Content-Length', 0))
+    if max_size and content_length > max_size:
+        raise FileTooLargeException(max_size)
+
+    size = 0
+    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if max_size and size > max_size:
+            raise FileTooLargeException(max_size)
+        binary_object.write(chunk)
+
+    return size
+
+
+def get_page_count(binary_object: BytesIO | SpooledTemporaryFile) -> int:
+    """
+    This function counts a .pdf file's pages from its page tree, without any
+    layout analysis, and returns the count.
 
     :param binary_object:   The binary object representing the .pdf file.
-    :type binary_object:    BytesIO
+    :type binary_object:    BytesIO | SpooledTemporaryFile
     :return:                The file's page count.
     """
-    if not isinstance(binary_object, BytesIO):
+    if not isinstance(binary_object, BINARY_FILE_TYPES):
         msg = f"Expecting BytesIO object. Got {type(binary_object)} instead."
         raise TypeError(msg)
 
-    document = extract_pages(binary_object)
-    counter = 0
-    for _ in document:
-        counter += 1
-
-    return counter
+    return count_pages(binary_object)
 
 
-def extract_content(binary_object: BytesIO) -> tuple[list, list]:
+def extract_content(binary_object: BytesIO | SpooledTemporaryFile,
+                    max_pages: int = 0,
+                    timeout: float | None = None,
+                    profile: str = 'full') -> tuple[list, list]:
     """
     This function extract all text and image contents from a .pdf file and
-    returns a tuple of lists.
+    returns a tuple of lists. Images are described by dictionaries holding
+    their page, name, bounding box and size.
+
+    Extraction stops at the first page past max_pages, or once timeout
+    seconds have gone by, so pathological files can't hang a run. Use
+    extract_document() to also get the page count and per-page statistics
+    from the same pass.
     :param binary_object:   The binary object representing the .pdf file.
-    :type binary_object:    BytesIO
+    :type binary_object:    BytesIO | SpooledTemporaryFile
+    :param max_pages:       Pages past this cap are not extracted (0: no cap).
+    :type max_pages:        int
+    :param timeout:         Seconds allowed for the extraction.
+    :type timeout:          float | None
+    :param profile:         The layout analysis profile, from
+                            EXTRACTION_PROFILES.
+    :type profile:          str
     :return:                ([Text content], [Images])
     """
-    if not isinstance(binary_object, BytesIO):
+    if not isinstance(binary_object, BINARY_FILE_TYPES):
         msg = f"Expecting BytesIO object. Got {type(binary_object)} instead."
         raise TypeError(msg)
 
-    page_text = []
-    page_images = []
-
-    try:
-        pages = extract_pages(binary_object)
-        for page in pages:
-            text = ''
-            for element in page:
-                if isinstance(element, LTTextContainer):
-                    text += element.get_text()
-                if isinstance(element, LTFigure):
-                    for figure in element:
-                        if isinstance(figure, LTImage):
-                            page_images.append(figure)
-            page_text.append(text)
-    except Exception as e:
-        msg = "pdfminer could not extract content because of {e}"
+    document = extract_document(binary_object, max_pages, timeout, profile)
+    if document.timed_out:
+        msg = f"Extraction stopped after {timeout}s."
         logging.warning(msg)
-    finally:
-        return page_text, page_images
+
+    return document.page_text, document.page_images
+
+
+def choose_profile(pdf_content: bytes | BytesIO | SpooledTemporaryFile,
+                   probe_pages: int = PROFILE_PROBE_PAGES,
+                   threshold: float = OCR_QUALITY_THRESHOLD) -> str:
+    """
+    This function lays out a .pdf file's first pages with each profile, from
+    the cheapest, and returns the first profile whose text passes the OCR
+    quality threshold without gluing words together. Files failing every
+    cheaper profile, like scanned ones, get the 'full' profile.
+
+    :param pdf_content:     The .pdf file's content.
+    :type pdf_content:      bytes | BytesIO | SpooledTemporaryFile
+    :param probe_pages:     The number of pages laid out with each profile.
+    :type probe_pages:      int
+    :param threshold:       The minimum OCR quality.
+    :type threshold:        float
+    :return:                The profile to extract the file with.
+    """
+    for profile in EXTRACTION_PROFILES[:-1]:
+        result = extract_page_range(pdf_content,
+                                    range(probe_pages),
+                                    probe_pages,
+                                    profile=profile,
+                                    images=False)
+        if result['error']:
+            continue
+        quality = page_quality('\n'.join(result['page_text']))
+        if quality['characters'] and \
+                1 - quality['bad_glyph_ratio'] >= threshold and \
+                quality['whitespace_ratio'] >= PROFILE_MIN_WHITESPACE_RATIO:
+            return profile
+
+    return EXTRACTION_PROFILES[-1]
+
+
+def page_quality(text: str, page_number: int = 0) -> dict:
+    """
+    This function measures the quality of a page's text in a single pass
+    and returns it as a dictionary:
+
+    - characters: the length of the text;
+    - bad_glyph_ratio: the share of its characters matching BAD_OCR_PATTERN,
+      so 1 - bad_glyph_ratio is the page's OCR quality;
+    - cid_density: the share of its glyphs pdfminer could only render as
+      (cid:N), each of them counting as a single glyph;
+    - whitespace_ratio: the share of its characters that are whitespace.
+
+    Ratios are 0.0 on empty pages.
+
+    :param text:            The page's text.
+    :type text:             str
+    :param page_number:     The page's zero-indexed number.
+    :type page_number:      int
+    :return:                {'page', 'characters', 'bad_glyph_ratio',
+                            'cid_density', 'whitespace_ratio'}
+    """
+    characters = len(text)
+    bad_characters = 0
+    cid_glyphs = 0
+    whitespace = 0
+    for cid, form_feed, spaces in PAGE_QUALITY_REGEX.findall(text):
+        if spaces:
+            whitespace += len(spaces)
+        elif cid:
+            bad_characters += len(cid)
+            cid_glyphs += 1
+        else:
+            bad_characters += len(form_feed)
+
+    glyphs = characters - bad_characters + cid_glyphs
+    return {
+        'page': page_number,
+        'characters': characters,
+        'bad_glyph_ratio': bad_characters / characters if characters else 0.0,
+        'cid_density': cid_glyphs / glyphs if glyphs else 0.0,
+        'whitespace_ratio': whitespace / characters if characters else 0.0
+    }
+
+
+def find_bad_pages(qualities: list,
+                   threshold: float = OCR_QUALITY_THRESHOLD) -> list:
+    """
+    This function returns the pages whose text is too short, or too full of
+    BAD_OCR_PATTERN characters, to be trusted.
+
+    :param qualities:   The quality of each page, from page_quality().
+    :type qualities:    list
+    :param threshold:   The minimum OCR quality of a page.
+    :type threshold:    float
+    :return:            The zero-indexed numbers of the bad pages.
+    """
+    bad_pages = []
+    for quality in qualities:
+        readable_characters = quality['characters'] * (
+            1 - quality['bad_glyph_ratio'] - quality['whitespace_ratio']
+        )
+        if readable_characters < OCR_MIN_PAGE_CHARACTERS or \
+                1 - quality['bad_glyph_ratio'] < threshold:
+            bad_pages.append(quality['page'])
+
+    return bad_pages
 
 
 def sanitize_text(raw_text: str | list) -> tuple[str, float]:
@@ -285,7 +734,7 @@ def sanitize_text(raw_text: str | list) -> tuple[str, float]:
     This function strips text fetched from a .pdf file's OCR of its bad
     characters and extra white spaces and returns a tuple containing the
     sanitized text and an OCR quality metric based solely on the presence
-    of bad characters.
+    of bad characters. Empty text has a quality of 0.0.
 
     :param raw_text:    The text fetched from the .pdf file's OCR
     :type raw_text:     str | list
@@ -300,22 +749,69 @@ def sanitize_text(raw_text: str | list) -> tuple[str, float]:
     else:
         text = raw_text
 
-    no_extra_spaces_text = re.subn(r'( )+', ' ', text)[0]
-    sanitized_text = re.subn(BAD_OCR_PATTERN, '', no_extra_spaces_text)[0]
+    no_extra_spaces_text = EXTRA_SPACES_REGEX.sub(' ', text)
+    sanitized_text = BAD_OCR_REGEX.sub('', no_extra_spaces_text)
+    if not no_extra_spaces_text:
+        return sanitized_text, 0.0
     ocr_quality = len(sanitized_text) / len(no_extra_spaces_text)
 
     return sanitized_text, ocr_quality
 
 
-def get_token_count(text: str, language: str) -> int:
+def chunk_text(text: str, chunk_size: int = TOKEN_CHUNK_SIZE):
+    """
+    This function splits a text into chunks of at most chunk_size characters.
+    Chunks are only cut right after a space surrounded by non-whitespace
+    characters, which spaCy's tokenizer consumes as a token separator, so
+    tokenizing every chunk yields the same tokens as tokenizing the whole
+    text. A chunk without any such space is cut at chunk_size.
+
+    :param text:            The text that will be split.
+    :type text:             str
+    :param chunk_size:      The maximum length of a chunk.
+    :type chunk_size:       int
+    :return:                A generator of text chunks.
+    """
+    if not isinstance(text, str):
+        raise TypeError("text must be a string.")
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer.")
+
+    start = 0
+    text_length = len(text)
+    while text_length - start > chunk_size:
+        end = start + chunk_size
+        cut = text.rfind(' ', start + 1, end)
+        while cut > start and (text[cut - 1].isspace() or
+                               text[cut + 1].isspace()):
+            cut = text.rfind(' ', start + 1, cut)
+        end = cut + 1 if cut > start else end
+        yield text[start:end]
+        start = end
+
+    if start < text_length:
+        yield text[start:]
+
+
+def get_token_count(text: str,
+                    language: str,
+                    tokenizer_only: bool = False) -> int:
     """
     This function parses text using spacy and returns the number of tokens it
-    contains.
+    contains. The model is fetched from the process-wide model registry so it
+    is only loaded once per language.
+
+    In tokenizer-only mode, the text is streamed in chunks through the
+    language's tokenizer alone instead of running the whole pipeline, and it
+    is no longer truncated to 1M characters.
 
     :param text:            The text that will be parsed.
     :type text:             str
     :param language:        The text's language, abbreviated.
     :type language:         str
+    :param tokenizer_only:  Counts tokens with the tokenizer only.
+    :type tokenizer_only:   bool
     :return:                The number of tokens.
     """
     if not isinstance(text, str) or not isinstance(language, str):
@@ -324,23 +820,187 @@ def get_token_count(text: str, language: str) -> int:
     if language not in SUPPORTED_LANGUAGES:
         raise ValueError("language is not supported for parsing.")
 
+    if tokenizer_only:
+        tokenizer = get_model(language, TOKENIZER_ONLY).tokenizer
+        return sum(len(doc) for doc in tokenizer.pipe(chunk_text(text)))
+
     if len(text) > 1000000:
         msg = f"Text too long to parse and will be truncated to 1M characters."
         logging.warning(msg)
         text = text[:1000000]
 
-    model = '_core_news_sm'
-    if language == 'en':
-        model = 'en_core_web_sm'
-    else:
-        model = language + model
-
-    nlp_model = spacy.load(model)
+    nlp_model = get_model(language)
     doc = nlp_model(text)
 
     return len(doc)
 
 
+def analyze_content(pdf_content: bytes | BytesIO | SpooledTemporaryFile | Path,
+                    language: str) -> tuple[int, str, float, int, list, str | None]:
+    """
+    This function runs the CPU-bound part of a .pdf file's analysis: text
+    extraction, sanitization and token count. Its arguments and return value
+    can be pickled so it can run in a worker process.
+
+    Text is extracted with the EXTRACTION_PROFILE layout analysis profile,
+    chosen by choose_profile() for each file when it is 'auto', then handed
+    to finish_analysis(). AnalysisPipeline runs the same steps, but extracts
+    large files' page ranges in parallel with plan_analysis() and
+    extract_part().
+
+    :param pdf_content:     The .pdf file's content, or the path to it.
+    :type pdf_content:      bytes | BytesIO | SpooledTemporaryFile | Path
+    :param language:        The document's language, abbreviated.
+    :type language:         str
+    :return:                (Page count, OCR, OCR quality, Token count,
+                            Quality of each page, Why the extraction is
+                            incomplete or None)
+    """
+    if isinstance(pdf_content, Path):
+        # pdfminer and poppler read the file as they go, so it isn't loaded
+        # in memory
+        with open(pdf_content, 'rb') as pdf_file:
+            return analyze_content(pdf_file, language)
+    if isinstance(pdf_content, bytes):
+        pdf_content = BytesIO(pdf_content)
+
+    profile = EXTRACTION_PROFILE
+    if profile == 'auto':
+        profile = choose_profile(pdf_content)
+    # Images aren't part of the analysis, so figures aren't searched
+    document = extract_document(pdf_content,
+                                EXTRACTION_MAX_PAGES,
+                                EXTRACTION_TIMEOUT,
+                                profile,
+                                images=False)
+
+    return finish_analysis(pdf_content, document, language)
+
+
+def plan_analysis(pdf_content: bytes | BinaryIO | Path,
+                  pages_per_task: int = EXTRACTION_PAGES_PER_TASK) -> tuple[int, str, list]:
+    """
+    This function runs the first step of a .pdf file's analysis in a worker
+    process: it chooses the file's layout analysis profile, as
+    analyze_content() does, and splits its pages into ranges that
+    extract_part() can extract in parallel.
+
+    :param pdf_content:     The .pdf file's content, a binary file object
+                            holding it, or the path to it.
+    :type pdf_content:      bytes | BinaryIO | Path
+    :param pages_per_task:  The size of the page ranges. 0 disables
+                            splitting.
+    :type pages_per_task:   int
+    :return:                (Page count, Profile, List of page ranges)
+    """
+    if isinstance(pdf_content, Path):
+        with open(pdf_content, 'rb') as pdf_file:
+            return plan_analysis(pdf_file, pages_per_task)
+    if isinstance(pdf_content, bytes):
+        pdf_content = BytesIO(pdf_content)
+
+    profile = EXTRACTION_PROFILE
+    if profile == 'auto':
+        profile = choose_profile(pdf_content)
+    page_count, page_ranges = split_pages(pdf_content,
+                                          EXTRACTION_MAX_PAGES,
+                                          pages_per_task)
+
+    return page_count, profile, page_ranges
+
+
+def extract_part(pdf_content: bytes | BinaryIO | Path,
+                 page_range: range | None,
+                 profile: str) -> dict:
+    """
+    This function extracts one of the page ranges plan_analysis() returned,
+    in a worker process. The parts are merged back with merge_parts().
+
+    :param pdf_content:     The .pdf file's content, a binary file object
+                            holding it, or the path to it.
+    :type pdf_content:      bytes | BinaryIO | Path
+    :param page_range:      Zero-indexed pages to extract. None for all.
+    :type page_range:       range | None
+    :param profile:         The layout analysis profile.
+    :type profile:          str
+    :return:                The extract_page_range() dictionary.
+    """
+    if isinstance(pdf_content, Path):
+        with open(pdf_content, 'rb') as pdf_file:
+            return extract_part(pdf_file, page_range, profile)
+
+    # Images aren't part of the analysis, so figures aren't searched
+    return extract_page_range(pdf_content,
+                              page_range,
+                              EXTRACTION_MAX_PAGES,
+                              EXTRACTION_TIMEOUT,
+                              profile,
+                              images=False)
+
+
+def finish_analysis(pdf_content: bytes | BytesIO | SpooledTemporaryFile | Path,
+                    document: ExtractedDocument,
+                    language: str) -> tuple[int, str, float, int, list, str | None]:
+    """
+    This function runs the last steps of a .pdf file's analysis on its
+    extracted document. When Tesseract is available, the pages
+    find_bad_pages() rejects are OCRed again and replaced in the text, and
+    their quality is measured again. The text is then sanitized and its
+    tokens counted.
+
+    The page count comes from the page tree, so it doesn't tell whether every
+    page was extracted: extractions that timed out, failed or stopped at
+    EXTRACTION_MAX_PAGES are reported with their error.
+
+    :param pdf_content:     The .pdf file's content, or the path to it.
+    :type pdf_content:      bytes | BytesIO | SpooledTemporaryFile | Path
+    :param document:        The file's extracted document.
+    :type document:         ExtractedDocument
+    :param language:        The document's language, abbreviated.
+    :type language:         str
+    :return:                (Page count, OCR, OCR quality, Token count,
+                            Quality of each page, Why the extraction is
+                            incomplete or None)
+    """
+    pages = document.page_count
+    error = None
+    if document.error:
+        error = document.error
+    elif document.timed_out:
+        error = f"Extraction stopped after {EXTRACTION_TIMEOUT}s."
+    elif document.truncated:
+        error = f"Only {len(document.page_text)} of {pages} pages extracted."
+    if error:
+        logging.warning(error)
+    if language not in SUPPORTED_LANGUAGES:
+        language = 'fr'
+    page_text = document.page_text
+    quality = [page_quality(text, page_number)
+               for page_number, text in enumerate(page_text)]
+    if ocr_available():
+        for page_number, text in ocr_pages(pdf_content,
+                                           find_bad_pages(quality),
+                                           language).items():
+            page_text[page_number] = text
+            quality[page_number] = page_quality(text, page_number)
+    ocr, ocr_quality = sanitize_text(page_text)
+    tokens = get_token_count(ocr, language, tokenizer_only=True)
+
+    return pages, ocr, ocr_quality, tokens, quality, error
+
+
+def save_ocr(pdf_file: PDFFile):
+    """
+    This function saves a .pdf file's OCR in its text file.
+
+    :param pdf_file:        The analyzed .pdf file.
+    :type pdf_file:         PDFFile
+    """
+    pdf_file.txt_file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(pdf_file.txt_file_path, 'w', encoding='utf8') as f:
+        f.write(pdf_file.ocr)
+
+
 def analyze(pdf_file: PDFFile, session: Session) -> PDFFile:
     """
     Things that need to be done here:
@@ -352,6 +1012,7 @@ def analyze(pdf_file: PDFFile, session: Session) -> PDFFile:
       a) Strip unnecessary white spaces; DONE!
       b) Strip BAD_OCR_PATTERN from text; DONE!
       c) Calculate OCR quality. DONE!
+      d) OCR bad pages again with Tesseract. DONE!
     4. Count the number of word tokens in the text. DONE!
     5. Erase the buffer from memory. DONE!
     6. Save OCR to disk. DONE!
@@ -369,21 +1030,16 @@ def analyze(pdf_file: PDFFile, session: Session) -> PDFFile:
         logging.info(msg)
         success, pdf_file.buffered_file = download_file(pdf_file.url, session)
         if success:
-            # new analysis starts here
-            page_text, page_images = extract_content(pdf_file.buffered_file)
-            pdf_file.pages = len(page_text)
-            # Here, insert pytesseract
-            pdf_file.ocr, pdf_file.ocr_quality = sanitize_text(page_text)
-            language = pdf_file.language
-            if language not in SUPPORTED_LANGUAGES:
-                language = 'fr'
-            pdf_file.tokens = get_token_count(pdf_file.ocr, language)
+            pdf_file.pages, pdf_file.ocr, pdf_file.ocr_quality, \
+                pdf_file.tokens, pdf_file.page_quality, \
+                pdf_file.extraction_error = \
+                analyze_content(pdf_file.buffered_file, pdf_file.language)
             pdf_file.buffered_file.close()
             pdf_file.buffered_file = None
-            with open(pdf_file.txt_file_path, 'w', encoding='utf8') as f:
-                f.write(pdf_file.ocr)
+            save_ocr(pdf_file)
     except (TypeError, AttributeError, Exception) as e:
         msg = f"Could not analyze {pdf_file.file_name} because of {e}."
         logging.warning(msg)
+        pdf_file.extraction_error = str(e)
     finally:
         return pdf_file
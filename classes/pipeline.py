@@ -0,0 +1,360 @@
+"""
+pipeline.py
+
+Module for analyzing many .pdf files concurrently
+"""
+
+# Imports
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import logging
+import os
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from decouple import config
+from requests import Session
+from classes.abstracts import ABSTRACT_BASE_DIR, analyze_abstract, save_abstract
+from classes.extraction import (EXTRACTION_GRACE_PERIOD,
+                                EXTRACTION_PAGES_PER_TASK,
+                                EXTRACTION_TIMEOUT,
+                                WorkerPool,
+                                merge_parts)
+from classes.ocr import share_cores
+from classes.pdf_cache import PDFCache
+from classes.pdf_files import (PDFFile,
+                               MissingSessionException,
+                               PDF_INVALID_URL,
+                               URL_VALIDATIONS,
+                               download_file,
+                               extract_part,
+                               finish_analysis,
+                               plan_analysis,
+                               save_ocr)
+
+
+# Constants
+# Seconds allowed to each of a document's tasks before its worker is killed.
+# Extraction stops by itself after EXTRACTION_TIMEOUT, between two pages, so
+# this only catches pages, or token counts, that never end.
+ANALYSIS_TIMEOUT = config('ANALYSIS_TIMEOUT',
+                          default=2 * EXTRACTION_TIMEOUT + EXTRACTION_GRACE_PERIOD,
+                          cast=float)
+
+
+# Classes
+class AnalysisPipeline:
+    """
+    AnalysisPipeline class
+
+    This class runs the analyze() steps over many .pdf files at once. The
+    network-bound step (the download, which also validates the URL) runs in
+    a thread pool while the CPU-bound steps run as tasks in a WorkerPool:
+
+    1. plan_analysis() chooses a document's layout analysis profile and
+       splits its pages into ranges of pages_per_task pages;
+    2. extract_part() extracts each range, so a large document is extracted
+       by several workers at once;
+    3. finish_analysis() merges the ranges back, OCRs bad pages again,
+       sanitizes the text and counts its tokens.
+
+    Downloads stop being scheduled whenever enough downloaded files are
+    waiting for a worker, so memory stays bounded and the run goes as fast as
+    the slowest of the network or the cores allow.
+
+    A worker process that dies (out of memory, segfault...) or a task still
+    running after timeout seconds only fails the task it was running: the
+    worker is replaced and the other tasks carry on. A document whose plan or
+    last step fails is reported as failed, and one whose page range fails is
+    finished with that range's error.
+
+    In abstract-only mode, workers only lay out the first pages of each file
+    to extract its abstract, which is saved under ABSTRACT_BASE_DIR instead
+    of the whole OCR.
+    """
+    def __init__(self,
+                 session: Session,
+                 max_downloads: int = 8,
+                 max_workers: int | None = None,
+                 cache: PDFCache | None = None,
+                 abstract_only: bool = False,
+                 timeout: float = ANALYSIS_TIMEOUT,
+                 pages_per_task: int = EXTRACTION_PAGES_PER_TASK):
+        """
+        Class constructor
+
+        :param session:         A Requests session shared by all downloads.
+        :type session:          requests.Session
+        :param max_downloads:   The maximum number of downloads in flight.
+        :type max_downloads:    int
+        :param max_workers:     The number of worker processes. Defaults to
+                                the number of cores.
+        :type max_workers:      int | None
+        :param cache:           Keeps downloaded files on disk between runs.
+        :type cache:            PDFCache | None
+        :param abstract_only:   Only extracts and saves the abstracts.
+        :type abstract_only:    bool
+        :param timeout:         Seconds allowed to each task of a document.
+        :type timeout:          float
+        :param pages_per_task:  The size of the page ranges documents are
+                                extracted in. 0 extracts each document in a
+                                single task.
+        :type pages_per_task:   int
+        """
+        if not isinstance(session, Session):
+            raise MissingSessionException(session)
+
+        if max_downloads < 1:
+            raise ValueError("max_downloads must be a positive integer.")
+
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("max_workers must be a positive integer.")
+
+        if cache is not None and not isinstance(cache, PDFCache):
+            raise TypeError("cache must be a valid PDFCache.")
+
+        if timeout <= 0:
+            raise ValueError("timeout must be positive.")
+
+        if pages_per_task < 0:
+            raise ValueError("pages_per_task can't be negative.")
+
+        self.session = session
+        self.max_downloads = max_downloads
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache = cache
+        self.abstract_only = abstract_only
+        self.timeout = timeout
+        self.pages_per_task = pages_per_task
+        self.__workers = None
+
+    def fetch(self,
+              url: str,
+              language: str) -> tuple[PDFFile, Path | None]:
+        """
+        Downloads the .pdf file a URL points to. The download validates the
+        URL, so each file costs a single request. Workers are handed the
+        path to the file on disk: the cached file, or without a cache a
+        temporary file deleted once the document is finished.
+
+        :param url:         The URL of the .pdf file.
+        :type url:          str
+        :param language:    The document's language, abbreviated.
+        :type language:     str
+        :return:            (PDFFile object, Path to the file or None)
+        """
+        pdf_file = PDFFile.create_from_url(url, self.session, validate=False)
+        pdf_file.language = language
+        pdf_file.buffered_file = None
+        content = None
+
+        if pdf_file.url == PDF_INVALID_URL:
+            return pdf_file, content
+
+        try:
+            msg = f"Analyzing {pdf_file.file_name}..."
+            logging.info(msg)
+            if self.cache is not None:
+                success, content = self.cache.fetch(pdf_file.url, self.session)
+                return pdf_file, content
+            with NamedTemporaryFile(prefix='analysis-',
+                                    suffix='.pdf',
+                                    delete=False) as temporary_file:
+                content = Path(temporary_file.name)
+                success, _ = download_file(pdf_file.url,
+                                           self.session,
+                                           validate=False,
+                                           destination=temporary_file)
+            if not success:
+                content.unlink()
+                content = None
+        except Exception as e:
+            msg = f"Could not analyze {pdf_file.file_name} because of {e}."
+            logging.warning(msg)
+            if content is not None:
+                content.unlink(missing_ok=True)
+                content = None
+        finally:
+            pdf_file.url_status = URL_VALIDATIONS.get(url)
+
+        return pdf_file, content
+
+    def run(self, documents: dict):
+        """
+        Analyzes every document and yields them as they are finished.
+
+        Documents come back in completion order, each with the key it was
+        given under, so callers can store the results deterministically.
+
+        :param documents:   Mapping of keys to (URL, language) tuples.
+        :type documents:    dict
+        :return:            A generator of (key, PDFFile) tuples.
+        """
+        pending = iter(documents.items())
+        downloading = {}
+        analyzing = {}
+        tasks = {}
+        max_waiting = 2 * self.max_workers
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_downloads) as downloader:
+                while True:
+                    while (len(downloading) < self.max_downloads and
+                           len(downloading) + len(analyzing) < max_waiting):
+                        item = next(pending, None)
+                        if item is None:
+                            break
+                        key, (url, language) = item
+                        future = downloader.submit(self.fetch, url, language)
+                        downloading[future] = key
+
+                    if not downloading and not tasks:
+                        break
+
+                    done, _ = wait(list(downloading) + list(tasks),
+                                   return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        if future in downloading:
+                            key = downloading.pop(future)
+                            pdf_file, content = future.result()
+                            if content is None:
+                                yield key, pdf_file
+                                continue
+                            analyzing[key] = {'pdf_file': pdf_file,
+                                              'content': content}
+                            if self.abstract_only:
+                                self.__submit(tasks, key, 'finish', None,
+                                              analyze_abstract,
+                                              content,
+                                              pdf_file.language)
+                            else:
+                                self.__submit(tasks, key, 'plan', None,
+                                              plan_analysis,
+                                              content,
+                                              self.pages_per_task)
+                        else:
+                            key, step, part = tasks.pop(future)
+                            if self.__advance(analyzing, tasks, key, step,
+                                              part, future):
+                                document = analyzing.pop(key)
+                                self.__release(document['content'])
+                                yield key, document['pdf_file']
+        finally:
+            self.__shutdown()
+            for document in analyzing.values():
+                self.__release(document['content'])
+
+    def __submit(self,
+                 tasks: dict,
+                 key: str,
+                 step: str,
+                 part: int | None,
+                 function,
+                 *args):
+        """
+        Sends one of a document's tasks to the worker pool, starting the pool
+        if needed. Each worker OCRs with its share of the cores, since all of
+        them may OCR at the same time.
+        """
+        if self.__workers is None:
+            self.__workers = WorkerPool(self.max_workers,
+                                        self.timeout,
+                                        initializer=share_cores,
+                                        initargs=(self.max_workers,))
+
+        tasks[self.__workers.submit(function, *args)] = (key, step, part)
+
+    def __advance(self,
+                  analyzing: dict,
+                  tasks: dict,
+                  key: str,
+                  step: str,
+                  part: int | None,
+                  future) -> bool:
+        """
+        Handles a finished task and submits the document's next tasks.
+        Returns True once the document is finished.
+        """
+        document = analyzing[key]
+        pdf_file = document['pdf_file']
+        content = document['content']
+        try:
+            result = future.result()
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                msg = f"Analysis of {pdf_file.file_name} killed after " \
+                      f"{self.timeout}s."
+            else:
+                msg = f"Could not analyze {pdf_file.file_name} because of {e}."
+            logging.warning(msg)
+            if step != 'extract':
+                pdf_file.extraction_error = msg
+                return True
+            result = {'error': msg}
+
+        if step == 'plan':
+            document['page_count'], profile, page_ranges = result
+            document['parts'] = {}
+            document['part_count'] = len(page_ranges)
+            for number, page_range in enumerate(page_ranges):
+                self.__submit(tasks, key, 'extract', number,
+                              extract_part, content, page_range, profile)
+            return False
+
+        if step == 'extract':
+            document['parts'][part] = result
+            if len(document['parts']) < document['part_count']:
+                return False
+            extracted = merge_parts({'page_count': document['page_count'],
+                                     'parts': document['parts']})
+            self.__submit(tasks, key, 'finish', None,
+                          finish_analysis, content, extracted,
+                          pdf_file.language)
+            return False
+
+        self.__finish(pdf_file, result)
+        return True
+
+    def __release(self, content: Path):
+        """
+        Releases a document's cached file, or deletes its temporary file.
+        """
+        if self.cache is not None:
+            self.cache.release(content)
+        else:
+            content.unlink(missing_ok=True)
+
+    def __shutdown(self):
+        """
+        Shuts the worker processes down.
+        """
+        if self.__workers is not None:
+            self.__workers.close()
+            self.__workers = None
+
+    def __finish(self, pdf_file: PDFFile, result: tuple) -> PDFFile:
+        """
+        Stores a document's results in the PDFFile and saves its OCR, or its
+        abstract, to disk.
+        """
+        try:
+            if self.abstract_only:
+                pdf_file.pages, pdf_file.abstract, pdf_file.ocr_quality, \
+                    pdf_file.tokens = result
+                # Same subdirectory as the OCR files: names repeat across them
+                txt_file_path = pdf_file.txt_file_path
+                pdf_file.txt_file_path = ABSTRACT_BASE_DIR / \
+                    txt_file_path.parent.name / txt_file_path.name
+                if pdf_file.abstract is not None:
+                    pdf_file.ocr = pdf_file.abstract.text
+                save_abstract(pdf_file)
+            else:
+                pdf_file.pages, pdf_file.ocr, pdf_file.ocr_quality, \
+                    pdf_file.tokens, pdf_file.page_quality, \
+                    pdf_file.extraction_error = result
+                save_ocr(pdf_file)
+        except Exception as e:
+            msg = f"Could not analyze {pdf_file.file_name} because of {e}."
+            logging.warning(msg)
+            pdf_file.extraction_error = str(e)
+
+        return pdf_file
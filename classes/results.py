@@ -0,0 +1,169 @@
+"""
+results.py
+
+Module for saving dissertation lists in a columnar results store
+
+Results are written as Parquet or Feather files partitioned by publication
+year, one directory per year. Each save adds new part files instead of
+rewriting the store, so results can be appended as they are produced, and
+loading only reads the years asked for. Excel reports are derived from the
+store.
+"""
+
+# Imports
+from pathlib import Path
+from time import time_ns
+from uuid import uuid4
+from decouple import config
+import pandas as pd
+from classes.dissertations import DissertationList
+
+
+# Constants
+RESULTS_DIR = config('RESULTS_DIR',
+                     default=Path(__file__).resolve().parent.parent / 'results',
+                     cast=Path)
+RESULTS_FORMAT = config('RESULTS_FORMAT', default='parquet')
+RESULTS_FORMATS = ['parquet', 'feather']
+RESULTS_INDEX = 'id_dissertation'
+YEAR_PARTITION = 'year='
+
+
+# Classes
+class ResultsStore:
+    """
+    ResultsStore class
+
+    This class appends DissertationList data to a directory of Parquet or
+    Feather files, partitioned by publication year. A dissertation saved
+    many times is loaded in its latest version.
+    """
+    def __init__(self, path: Path = RESULTS_DIR, file_format: str = RESULTS_FORMAT):
+        """
+        Class constructor
+
+        :param path:            The store's directory.
+        :type path:             Path
+        :param file_format:     'parquet' or 'feather'.
+        :type file_format:      str
+        """
+        if not isinstance(path, Path):
+            raise TypeError("path must be a valid Path.")
+
+        if file_format not in RESULTS_FORMATS:
+            raise ValueError(f"file_format must be one of {RESULTS_FORMATS}.")
+
+        self.path = path
+        self.file_format = file_format
+
+    @property
+    def years(self) -> list:
+        """
+        Returns the publication years found in the store.
+        """
+        if not self.path.exists():
+            return []
+
+        return sorted(
+            int(directory.name[len(YEAR_PARTITION):])
+            for directory in self.path.glob(f"{YEAR_PARTITION}*")
+            if directory.is_dir()
+        )
+
+    def append(self, dissertations: DissertationList | pd.DataFrame) -> int:
+        """
+        Adds dissertations to the store, one new part file per publication
+        year.
+
+        :param dissertations:   The dissertations to save.
+        :type dissertations:    DissertationList | pd.DataFrame
+        :return:                The number of rows saved.
+        """
+        data = dissertations
+        if isinstance(dissertations, DissertationList):
+            data = dissertations.data
+        if not isinstance(data, pd.DataFrame):
+            raise TypeError("dissertations must be a DissertationList or a DataFrame.")
+
+        if data.empty:
+            return 0
+
+        # Feather files can't hold an index, so it is saved as a column
+        data = data.rename_axis(RESULTS_INDEX).reset_index()
+        part_name = f"part-{time_ns()}-{uuid4().hex[:8]}.{self.file_format}"
+        for year, rows in data.groupby(data['publication_date'].dt.year):
+            directory = self.path / f"{YEAR_PARTITION}{int(year)}"
+            directory.mkdir(parents=True, exist_ok=True)
+            rows = rows.reset_index(drop=True)
+            if self.file_format == 'parquet':
+                rows.to_parquet(directory / part_name, index=False)
+            else:
+                rows.to_feather(directory / part_name)
+
+        return len(data)
+
+    def load(self, years: list | None = None) -> DissertationList:
+        """
+        Loads the dissertations saved in the store.
+
+        :param years:           The publication years to load. None loads
+                                them all.
+        :type years:            list | None
+        :return:                The saved dissertations.
+        """
+        frames = [
+            self.__read(part_file) for part_file in self.__part_files(years)
+        ]
+        if not frames:
+            return DissertationList()
+
+        data = pd.concat(frames, ignore_index=True)
+        # Part file names start with their creation time, so the last
+        # duplicate is the latest version of a dissertation.
+        data = data.drop_duplicates(subset=RESULTS_INDEX, keep='last')
+        data = data.set_index(RESULTS_INDEX).rename_axis(None)
+        return DissertationList.create_from_dataframe(data)
+
+    def export_excel(self, file_path: Path | str, years: list | None = None) -> int:
+        """
+        Writes the saved dissertations in an Excel report.
+
+        :param file_path:       The Excel file's path.
+        :type file_path:        Path | str
+        :param years:           The publication years to export. None exports
+                                them all.
+        :type years:            list | None
+        :return:                The number of rows exported.
+        """
+        dissertations = self.load(years)
+        dissertations.data.to_excel(file_path)
+        return len(dissertations)
+
+    def __part_files(self, years: list | None) -> list:
+        """
+        Returns the part files of some years, in creation order.
+        """
+        years = self.years if years is None else years
+        part_files = []
+        for year in years:
+            directory = self.path / f"{YEAR_PARTITION}{year}"
+            part_files.extend(directory.glob(f"part-*.{self.file_format}"))
+
+        return sorted(part_files, key=lambda part_file: part_file.name)
+
+    def __read(self, part_file: Path) -> pd.DataFrame:
+        """
+        Reads a single part file, with its categorical columns as objects.
+        """
+        if self.file_format == 'parquet':
+            data = pd.read_parquet(part_file)
+        else:
+            data = pd.read_feather(part_file)
+
+        # Each file has its own categories: they are merged back by
+        # apply_schema() once the files are concatenated.
+        categories = data.select_dtypes('category').columns
+        return data.astype({label: object for label in categories})
+
+    def __repr__(self) -> str:
+        return f"<ResultsStore {self.path} ({self.file_format})>"
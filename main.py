@@ -7,21 +7,31 @@ Application's main script
 # Imports
 from datetime import date, datetime
 import logging
-from decouple import config
+from decouple import config, Csv
 from progress.bar import Bar
-from requests import Session
-from sickle import Sickle
-import spacy
-from spacy.language import Language
-from spacy_language_detection import LanguageDetector
-from classes.dissertations import (Dissertation,
-                                   DissertationList,
-                                   DISSERTATION_NO_URL_MSG)
-from classes.pdf_files import (PDFFile,
-                               analyze)
+from classes.dissertations import (DissertationList,
+                                   DISSERTATION_NO_URL_MSG,
+                                   RecordFilter)
+from classes.harvesting import (HarvestException,
+                                 ParallelHarvester,
+                                 RecordStore)
+from classes.journal import AnalysisJournal, JOURNAL_METRICS
+from classes.nlp_models import (get_model,
+                                LANGUAGE_DETECTOR)
+from classes.pdf_cache import PDFCache
+from classes.pdf_files import ANALYSIS_VERSION, create_session, HTTP_POOL_SIZE
+from classes.pipeline import AnalysisPipeline
+from classes.results import ResultsStore
 
 # Constants
 REPOSITORY_URL = config('REPOSITORY_URL')
+LANGUAGE_BATCH_SIZE = config('LANGUAGE_BATCH_SIZE', default=256, cast=int)
+LANGUAGE_PROCESSES = config('LANGUAGE_PROCESSES', default=1, cast=int)
+ANALYSIS_DOWNLOADS = config('ANALYSIS_DOWNLOADS', default=8, cast=int)
+# 0 means one worker process per core
+ANALYSIS_WORKERS = config('ANALYSIS_WORKERS', default=0, cast=int)
+# 'full' saves the whole OCR of each file, 'abstract' only its abstract
+ANALYSIS_MODE = config('ANALYSIS_MODE', default='full')
 
 
 # Functions
@@ -38,62 +48,84 @@ def main():
        b) add the detected language to the DataFrame: DONE!
     6. Inspect OCR for all documents and add its quality to the DataFrame
     7. Extract OCR from documents:
-       a) for those with good OCR, use pdfminer.six
-       b) for those with bad OCR, use pytesseract
+       a) for those with good OCR, use pdfminer.six: DONE!
+       b) for those with bad OCR, use pytesseract: DONE!
     8. Save OCR results in .txt files
     """
     main_start = datetime.now()
     set_logging()
     print(f"Hello, World! Starting script at {main_start}...")
 
-    dissertations = get_all_dissertations()
-    print(f"Retrieved {len(dissertations)} in total...")
-
-    start_date = date(1992, 1, 1)
-    end_date = date(1992, 12, 31)
-    dissertations.data = dissertations.data[
-        (dissertations.data['publication_date'] >= start_date) &
-        (dissertations.data['publication_date'] <= end_date)
-    ]
+    record_filter = RecordFilter(start_date=date(1992, 1, 1),
+                                 end_date=date(1992, 12, 31),
+                                 require_url=True)
+    dissertations = get_all_dissertations(record_filter)
     print(f"{len(dissertations)} kept...")
 
     dissertations = detect_dissertation_language(dissertations)
     dissertations = analyze_pdf_files(dissertations)
 
-    print("Saving data in Excel...")
-    dissertations.data.to_excel('data_1992.xlsx')
+    print("Saving results...")
+    results = ResultsStore()
+    results.append(dissertations)
+    print("Exporting results to Excel...")
+    results.export_excel('data_1992.xlsx', years=[1992])
     main_end = datetime.now()
     print(f"Script ended at {main_end}. Thank you! Goodnight!")
 
 
-def get_all_dissertations() -> DissertationList:
+def get_all_dissertations(record_filter: RecordFilter | None = None) -> DissertationList:
     """
-    This functions requests all dissertations from the repository and returns
-    the list.
-    :return:    The list of all dissertations.
+    This functions harvests new, changed and deleted dissertations from the
+    repository into the local record store and returns the list of all
+    stored dissertations. OAI_SET may list several sets, separated by commas,
+    and every set is harvested in concurrent date windows.
+
+    The store keeps every record so later runs can use other filters. The
+    filter is applied to the stored records before any Dissertation object
+    or DataFrame row is created.
+    :param record_filter:   Keeps only the matching records. None keeps all.
+    :type record_filter:    RecordFilter | None
+    :return:                The list of all dissertations kept.
     """
     print("Connecting to the repository...")
-    sickle = Sickle(REPOSITORY_URL)
-
-    print("Fetching all dissertations from repository...")
-    records = sickle.ListRecords(metadataPrefix='oai_dc', set=config('OAI_SET'))
-
-    dissertations = DissertationList()
-    print("Creating dissertation list (could be long)...")
-    for record in records:
-        dissertation = Dissertation.create_from_record(record)
-        dissertations.append(dissertation)
-    print("Dissertation list created...")
+    with RecordStore() as store:
+        harvester = ParallelHarvester(REPOSITORY_URL,
+                                      config('OAI_SET', cast=Csv()),
+                                      store)
+
+        print("Fetching new and changed dissertations from repository...")
+        try:
+            harvested = harvester.harvest()
+        except HarvestException as e:
+            # The windows that failed are resumed by the next run
+            print(f"{e.message} They will be resumed on the next run...")
+            harvested = e.harvested
+        print(f"{harvested} records harvested...")
+
+        print("Creating dissertation list (could be long)...")
+        dissertations = store.to_dissertation_list(record_filter)
+    print(f"Dissertation list created ({dissertations.memory_usage()} bytes)...")
 
     return dissertations
 
 
-def detect_dissertation_language(dissertations: DissertationList) -> DissertationList:
+def detect_dissertation_language(dissertations: DissertationList,
+                                 batch_size: int = LANGUAGE_BATCH_SIZE,
+                                 n_process: int = LANGUAGE_PROCESSES) -> DissertationList:
     """
     This functions detects the dissertations' language based on their title and
     fills the dissertation list's data with appropriate stats.
+
+    Titles are streamed in batches through nlp.pipe(), optionally across
+    several worker processes, and the results are written back as whole
+    columns.
     :param dissertations:   A dissertation list.
     :type dissertations:    DissertationList
+    :param batch_size:      The number of titles sent to the model at once.
+    :type batch_size:       int
+    :param n_process:       The number of worker processes (-1 for all cores).
+    :type n_process:        int
     :return:                The updated DissertationList.
     """
     if not isinstance(dissertations, DissertationList):
@@ -102,40 +134,57 @@ def detect_dissertation_language(dissertations: DissertationList) -> Dissertatio
     if 'title' not in dissertations.data.columns:
         raise KeyError("Title column is missing in the dataframe.")
 
-    def get_lang_detector(nlp, name):
-        return LanguageDetector(seed=42)
-
     print("Adding language columns to dissertation list...")
     dissertations.add_column('language')
     dissertations.add_column('language_score')
 
     print("Starting language detector...")
-    nlp_model = spacy.load('fr_core_news_sm')
-    Language.factory('language_detector', func=get_lang_detector)
-    nlp_model.add_pipe('language_detector', last=True)
+    nlp_model = get_model('fr', LANGUAGE_DETECTOR)
 
     bar = Bar('Detecting language: ', max=len(dissertations))
 
-    for index, data in dissertations:
-        doc = nlp_model(data['title'])
-        language = doc._.language
-        dissertations.data.at[index, 'language'] = language['language']
-        dissertations.data.at[index, 'language_score'] = language['score']
+    languages = []
+    scores = []
+    titles = dissertations.data['title'].tolist()
+    for doc in nlp_model.pipe(titles, batch_size=batch_size, n_process=n_process):
+        languages.append(doc._.language['language'])
+        scores.append(doc._.language['score'])
         bar.next()
 
+    dissertations.update_columns(dissertations.data.index, {
+        'language': languages,
+        'language_score': scores
+    })
+
     print("Language detected in all dissertations...")
 
     return dissertations
 
 
-# [2022-06-14] Rendre async ?
-def analyze_pdf_files(dissertations: DissertationList) -> DissertationList:
+def analyze_pdf_files(dissertations: DissertationList,
+                      max_downloads: int = ANALYSIS_DOWNLOADS,
+                      max_workers: int = ANALYSIS_WORKERS,
+                      abstract_only: bool = ANALYSIS_MODE == 'abstract') -> DissertationList:
     """
-    This function runs the classes.pdf_files module's analyze() function in all
-    pdf files listed in the dissertations list and returns a metrics-annotated
+    This function runs the classes.pdf_files module's analysis in all pdf files
+    listed in the dissertations list and returns a metrics-annotated
     dissertation list.
+
+    Files are downloaded concurrently and analyzed in a pool of worker
+    processes by an AnalysisPipeline. Each finished file is recorded in the
+    analysis journal, so a new run only analyzes the files that weren't
+    completed, whose URL changed or that an older analysis version handled.
+
+    In abstract-only mode, only the first pages of each file are laid out to
+    extract and save its abstract, along with the pages it spans.
     :param dissertations:   The dissertations list that will be analyzed.
     :type dissertations:    DissertationList
+    :param max_downloads:   The maximum number of downloads in flight.
+    :type max_downloads:    int
+    :param max_workers:     The number of worker processes (0 for all cores).
+    :type max_workers:      int
+    :param abstract_only:   Only extracts and saves the abstracts.
+    :type abstract_only:    bool
     :return:                The annotated dissertation list.
     """
     if not isinstance(dissertations, DissertationList):
@@ -146,6 +195,9 @@ def analyze_pdf_files(dissertations: DissertationList) -> DissertationList:
     dissertations.add_column('token_count')
     dissertations.add_column('ocr_quality')
     dissertations.add_column('txt_file_name')
+    dissertations.add_column('url_status')
+    dissertations.add_column('abstract_pages')
+    dissertations.add_column('extraction_error')
 
     print("Excluding invalid URLs from dissertations list...")
     d_copy = dissertations
@@ -153,20 +205,44 @@ def analyze_pdf_files(dissertations: DissertationList) -> DissertationList:
         d_copy.data['url'] != DISSERTATION_NO_URL_MSG
     ]
 
-    session = Session()
+    session = create_session(pool_size=max(HTTP_POOL_SIZE, max_downloads))
+    cache = PDFCache()
+    pipeline = AnalysisPipeline(session,
+                                max_downloads,
+                                max_workers or None,
+                                cache,
+                                abstract_only)
+    documents = {
+        row.Index: (row.url, row.language)
+        for row in d_copy.records(['url', 'language'])
+    }
+
+    version = f"{ANALYSIS_VERSION}-abstract" if abstract_only else ANALYSIS_VERSION
+    journal = AnalysisJournal(version=version)
+    metrics = journal.completed({key: url for key, (url, _) in documents.items()})
+    pending = {
+        key: document for key, document in documents.items()
+        if key not in metrics
+    }
+    print(f"{len(metrics)} .pdf files already analyzed...")
 
     print("Starting .pdf files' OCR analysis...")
-    bar = Bar("Analyzing .pdfs", max=len(d_copy))
-    for index, dissertation in d_copy:
-        pdf_file = PDFFile.create_from_url(dissertation['url'], session)
-        pdf_file.language = dissertation['language']
-        # [2022-06-14] p = await analyze() ?
-        pdf_file = analyze(pdf_file, session)
-        dissertations.data.at[index, 'pages'] = pdf_file.pages
-        dissertations.data.at[index, 'token_count'] = pdf_file.tokens
-        dissertations.data.at[index, 'ocr_quality'] = pdf_file.ocr_quality
-        dissertations.data.at[index, 'txt_file_name'] = pdf_file.txt_file_path.name
+    bar = Bar("Analyzing .pdfs", max=len(pending))
+    for index, pdf_file in pipeline.run(pending):
+        metrics[index] = journal.record(index, pdf_file)
         bar.next()
+    journal.close()
+
+    index = list(documents)
+    dissertations.update_columns(index, {
+        label: [metrics[key][label] for key in index]
+        for label in JOURNAL_METRICS
+    })
+
+    report = cache.report()
+    cache.close()
+    print(f".pdf file cache: {report['hits']} hits, {report['misses']} misses, "
+          f"{report['evictions']} evictions, {report['size']} bytes on disk...")
 
     print(".pdf file OCR analysis finished...")
     return dissertations
@@ -0,0 +1,231 @@
+"""
+conftest.py
+
+Shared fixtures for the test suite
+"""
+
+# Imports
+from functools import partial
+from http.server import (BaseHTTPRequestHandler,
+                         SimpleHTTPRequestHandler,
+                         ThreadingHTTPServer)
+import os
+import sys
+from pathlib import Path
+from threading import Thread
+from time import sleep
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+import pytest
+import spacy
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DISSERTATIONS_SERVER', 'http://localhost')
+
+from classes import nlp_models
+
+
+# Fixtures
+@pytest.fixture
+def blank_models(monkeypatch):
+    """
+    Replaces the packaged spaCy models with blank ones of the same language,
+    which share their tokenizer rules, so tests don't need the models
+    installed.
+    """
+    monkeypatch.setattr(nlp_models.spacy,
+                        'load',
+                        lambda name, exclude=(): spacy.blank(name[:2]))
+    nlp_models.MODEL_REGISTRY.clear()
+    yield nlp_models.MODEL_REGISTRY
+    nlp_models.MODEL_REGISTRY.clear()
+
+
+@pytest.fixture
+def file_server(tmp_path):
+    """
+    Serves a temporary directory over HTTP and yields (directory, base URL).
+    """
+    directory = tmp_path / 'www'
+    directory.mkdir()
+    handler = partial(QuietHandler, directory=str(directory))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield directory, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def oai_server():
+    """
+    Serves a stub OAI-PMH repository and yields its settings, which tests can
+    change: records are (identifier, datestamp) tuples served page_size at a
+    time, latency delays every response, failures maps page numbers to HTTP
+    statuses returned until they are removed, and slow maps page numbers to
+    delays applied once. Every request's arguments are appended to requests.
+    """
+    stub = SimpleNamespace(
+        records=[(f"oai:stub:{n:04d}", f"2020-01-{1 + n % 28:02d}")
+                 for n in range(20)],
+        page_size=3,
+        latency=0,
+        failures={},
+        slow={},
+        requests=[]
+    )
+    server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                 partial(OAIHandler, stub))
+    Thread(target=server.serve_forever, daemon=True).start()
+    stub.url = f"http://127.0.0.1:{server.server_port}/oai"
+    yield stub
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_pdf():
+    """
+    Returns build_pdf(), which makes small .pdf files tests can extract.
+    """
+    return build_pdf
+
+
+# Classes
+class QuietHandler(SimpleHTTPRequestHandler):
+    """
+    SimpleHTTPRequestHandler that doesn't log every request.
+    """
+    def log_message(self, *args):
+        pass
+
+
+class OAIHandler(BaseHTTPRequestHandler):
+    """
+    Answers Identify and paged ListRecords requests from an oai_server stub.
+    Resumption tokens hold the page number and the request's arguments.
+    """
+    def __init__(self, stub, *args, **kwargs):
+        self.stub = stub
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        arguments = {key: values[0] for key, values
+                     in parse_qs(urlparse(self.path).query).items()}
+        self.stub.requests.append(arguments)
+        sleep(self.stub.latency)
+
+        if arguments.get('verb') == 'Identify':
+            self.send_xml(
+                '<Identify><repositoryName>Stub</repositoryName>'
+                '<earliestDatestamp>2020-01-01</earliestDatestamp>'
+                '<granularity>YYYY-MM-DD</granularity></Identify>'
+            )
+            return
+
+        if 'resumptionToken' in arguments:
+            page, from_date, until_date = \
+                arguments['resumptionToken'].split('|')
+            page = int(page)
+        else:
+            page = 0
+            from_date = arguments.get('from', '')
+            until_date = arguments.get('until', '')
+
+        if page in self.stub.failures:
+            self.send_response(self.stub.failures[page])
+            self.end_headers()
+            return
+        if page in self.stub.slow:
+            sleep(self.stub.slow.pop(page))
+
+        records = [
+            (identifier, datestamp)
+            for identifier, datestamp in self.stub.records
+            if from_date <= datestamp and
+            (not until_date or datestamp <= until_date)
+        ]
+        if not records:
+            self.send_xml('<error code="noRecordsMatch"/>')
+            return
+
+        size = self.stub.page_size
+        body = ''.join(
+            f'<record><header><identifier>{identifier}</identifier>'
+            f'<datestamp>{datestamp}</datestamp></header><metadata>'
+            f'<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/" '
+            f'xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:title>{identifier}</dc:title></oai_dc:dc></metadata></record>'
+            for identifier, datestamp in records[page * size:(page + 1) * size]
+        )
+        token = ''
+        if (page + 1) * size < len(records):
+            token = f"{page + 1}|{from_date}|{until_date}"
+        self.send_xml(f'<ListRecords>{body}'
+                      f'<resumptionToken>{token}</resumptionToken>'
+                      f'</ListRecords>')
+
+    def send_xml(self, body: str):
+        content = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">'
+            '<responseDate>2020-02-01T00:00:00Z</responseDate>'
+            f'<request>{self.stub.url}</request>{body}</OAI-PMH>'
+        ).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/xml')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        except ConnectionError:
+            # The client timed out before the response was sent
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+# Functions
+def build_pdf(pages: list) -> bytes:
+    """
+    This function builds a .pdf file with one page per item of pages. Each
+    item is a list of lines, or a string of lines separated by newlines,
+    written in Helvetica from the top of the page.
+    """
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None,
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+               '/Encoding /WinAnsiEncoding >>']
+    kids = []
+    for lines in pages:
+        if isinstance(lines, str):
+            lines = lines.split('\n')
+        text = ' T* '.join(
+            '(' + line.replace('\\', '\\\\').replace('(', '\\(')
+            .replace(')', '\\)') + ') Tj'
+            for line in lines
+        )
+        stream = f"BT /F1 12 Tf 14 TL 72 770 Td {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\n"
+                       f"endstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R "
+                       f"/MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> "
+                       f"/Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] " \
+                 f"/Count {len(kids)} >>"
+
+    content = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(content))
+        content += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        content += f"{offset:010d} 00000 n \n".encode()
+    content += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n" \
+               f"startxref\n{xref}\n%%EOF\n".encode()
+
+    return content
@@ -0,0 +1,79 @@
+"""
+test_abstracts.py
+
+Tests for locating, extracting and saving dissertations' abstracts
+"""
+
+# Imports
+import pytest
+from classes.abstracts import Abstract, find_abstract, save_abstract
+from classes.pdf_files import PDFFile
+
+
+# Constants
+COVER = "Université de Montréal\nUne thèse de doctorat"
+CONTENTS = "Table des matières\nIntroduction 1"
+ABSTRACT = "Résumé\nCette thèse étudie les résumés.\nElle les cherche."
+CONTINUED = "Les résumés courent parfois\nsur deux pages."
+
+
+# Tests
+def test_abstract_on_a_single_page(make_pdf):
+    pdf = make_pdf([COVER, f"{ABSTRACT}\n{CONTENTS}", "Chapitre 1"])
+
+    abstract = find_abstract(pdf)
+
+    assert (abstract.first_page, abstract.last_page) == (1, 1)
+    assert abstract.page_span == '2'
+    assert abstract.text.startswith('Résumé')
+    assert abstract.text.endswith('Elle les cherche.')
+    assert 'Table des matières' not in abstract.text
+
+
+def test_heading_at_the_top_of_a_page_ends_the_abstract_before_it(make_pdf):
+    pdf = make_pdf([COVER, ABSTRACT, CONTENTS, "Chapitre 1"])
+
+    abstract = find_abstract(pdf)
+
+    assert (abstract.first_page, abstract.last_page) == (1, 1)
+    assert abstract.page_span == '2'
+
+
+def test_abstract_over_many_pages(make_pdf):
+    pdf = make_pdf([COVER, ABSTRACT, f"{CONTINUED}\n{CONTENTS}"])
+
+    abstract = find_abstract(pdf)
+
+    assert abstract.page_span == '2-3'
+    assert 'Elle les cherche.' in abstract.text
+    assert abstract.text.endswith('sur deux pages.')
+
+
+def test_abstract_without_end_stops_at_max_span(make_pdf):
+    pdf = make_pdf([ABSTRACT] + [CONTINUED] * 6)
+
+    abstract = find_abstract(pdf, max_span=3)
+
+    assert abstract.page_span == '1-3'
+    assert abstract.text.count('sur deux pages.') == 2
+
+
+def test_document_without_abstract(make_pdf):
+    assert find_abstract(make_pdf([COVER, CONTENTS])) is None
+
+
+def test_abstract_span_is_ordered():
+    with pytest.raises(ValueError):
+        Abstract('Résumé', 3, 2)
+
+
+def test_save_abstract(tmp_path):
+    path = tmp_path / 'abstracts' / 'theses' / 'doc.txt'
+    pdf_file = PDFFile('http://localhost/theses/doc.pdf', 'doc.pdf', path)
+
+    save_abstract(pdf_file)
+    assert not path.exists()
+
+    pdf_file.abstract = Abstract(ABSTRACT, 1, 2)
+    save_abstract(pdf_file)
+    assert path.read_text(encoding='utf8') == ABSTRACT
@@ -0,0 +1,96 @@
+"""
+test_analysis.py
+
+Tests for the completeness of a document's analysis
+"""
+
+# Imports
+from pathlib import Path
+import pytest
+from classes import pdf_files
+from classes.extraction import ExtractedDocument
+from classes.journal import AnalysisJournal
+from classes.pdf_files import URL_OK, PDFFile, analyze_content
+
+
+# Fixtures
+@pytest.fixture
+def extracted(blank_models, monkeypatch):
+    """
+    Makes analyze_content() extract the ExtractedDocument the test sets.
+    """
+    monkeypatch.setattr(pdf_files, 'EXTRACTION_PROFILE', 'full')
+    monkeypatch.setattr(pdf_files, 'ocr_available', lambda: False)
+    document = ExtractedDocument(page_text=['Une page de texte.'] * 18,
+                                 page_count=200)
+    monkeypatch.setattr(pdf_files, 'extract_document',
+                        lambda *args, **kwargs: document)
+    return document
+
+
+# Tests
+def test_complete_extraction_has_no_error(extracted):
+    extracted.page_count = 18
+
+    pages, ocr, _, tokens, _, error = analyze_content(b'%PDF', 'fr')
+
+    assert pages == 18
+    assert ocr.count('Une page de texte.') == 18
+    assert tokens > 0
+    assert error is None
+
+
+@pytest.mark.parametrize('attribute, value, expected', [
+    ('timed_out', True, 'Extraction stopped after'),
+    ('truncated', True, 'Only 18 of 200 pages extracted.'),
+    ('error', 'PDFSyntaxError', 'PDFSyntaxError')
+])
+def test_incomplete_extraction_reports_its_error(extracted,
+                                                 attribute,
+                                                 value,
+                                                 expected):
+    setattr(extracted, attribute, value)
+
+    pages, _, _, _, _, error = analyze_content(b'%PDF', 'fr')
+
+    # The page count still comes from the page tree
+    assert pages == 200
+    assert error.startswith(expected)
+
+
+def test_files_on_disk_are_not_loaded_in_memory(blank_models,
+                                                make_pdf,
+                                                tmp_path,
+                                                monkeypatch):
+    monkeypatch.setattr(pdf_files, 'EXTRACTION_PROFILE', 'full')
+    monkeypatch.setattr(pdf_files, 'ocr_available', lambda: False)
+    pdf_path = tmp_path / 'doc.pdf'
+    pdf_path.write_bytes(make_pdf(['Une page de texte.'] * 3))
+
+    def read_bytes(path):
+        raise AssertionError(f"{path} was read in memory.")
+    monkeypatch.setattr(Path, 'read_bytes', read_bytes)
+
+    pages, ocr, _, _, _, error = analyze_content(pdf_path, 'fr')
+
+    assert pages == 3
+    assert ocr.count('Une page de texte.') == 3
+    assert error is None
+
+
+def test_journal_doesnt_complete_incomplete_extractions(tmp_path):
+    url = 'http://localhost/theses/doc.pdf'
+    documents = {'id0': url, 'id1': url}
+    with AnalysisJournal(tmp_path / 'journal.sqlite3') as analysis_journal:
+        for key, error in [('id0', None),
+                           ('id1', 'Extraction stopped after 0.5s.')]:
+            pdf_file = PDFFile(url, 'doc.pdf', tmp_path / 'doc.txt')
+            pdf_file.url_status = URL_OK
+            pdf_file.pages = 200
+            pdf_file.extraction_error = error
+            analysis_journal.record(key, pdf_file)
+
+        completed = analysis_journal.completed(documents)
+
+    assert list(completed) == ['id0']
+    assert completed['id0']['extraction_error'] is None
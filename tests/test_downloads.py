@@ -0,0 +1,109 @@
+"""
+test_downloads.py
+
+Tests for the URL statuses recorded by downloads
+"""
+
+# Imports
+from functools import partial
+from classes import journal, pdf_cache
+from classes.journal import AnalysisJournal
+from classes.pdf_cache import PDFCache
+from classes.pdf_files import (PDFFile,
+                               URL_OK,
+                               URL_TOO_LARGE,
+                               URL_VALIDATIONS,
+                               create_session,
+                               download_file,
+                               is_valid_url)
+
+
+# Tests
+def test_transient_failures_are_validated_again(oai_server, monkeypatch):
+    monkeypatch.setattr(URL_VALIDATIONS, 'retry_after', 0)
+    oai_server.failures = {0: 503}
+    session = create_session(retries=0)
+
+    success, _ = download_file(oai_server.url, session, validate=False)
+    assert not success
+    # Already expired: the next run requests the URL again
+    assert oai_server.url not in URL_VALIDATIONS
+
+    oai_server.failures.clear()
+    success, _ = download_file(oai_server.url, session, validate=False)
+    assert success
+    assert URL_VALIDATIONS.get(oai_server.url) == URL_OK
+
+
+def test_missing_files_stay_invalid(file_server, monkeypatch):
+    monkeypatch.setattr(URL_VALIDATIONS, 'retry_after', 0)
+    _, url = file_server
+    session = create_session(retries=0)
+
+    assert not is_valid_url(f"{url}/missing.pdf", session)
+    assert URL_VALIDATIONS.get(f"{url}/missing.pdf") == 'HTTP 404'
+    assert f"{url}/missing.pdf" in URL_VALIDATIONS
+
+
+def test_download_over_size_limit_records_its_status(file_server):
+    directory, url = file_server
+    (directory / 'big.pdf').write_bytes(b'%PDF' + b'0' * 100)
+    (directory / 'small.pdf').write_bytes(b'%PDF')
+
+    success, _ = download_file(f"{url}/big.pdf", create_session(),
+                               validate=False, max_size=10)
+    assert not success
+    assert URL_VALIDATIONS.get(f"{url}/big.pdf") == URL_TOO_LARGE.format(10)
+
+    success, _ = download_file(f"{url}/small.pdf", create_session(),
+                               validate=False, max_size=10)
+    assert success
+    assert URL_VALIDATIONS.get(f"{url}/small.pdf") == URL_OK
+
+
+def test_cached_download_over_size_limit_records_its_status(file_server,
+                                                            tmp_path,
+                                                            monkeypatch):
+    monkeypatch.setattr(pdf_cache, 'write_response',
+                        partial(pdf_cache.write_response, max_size=10))
+    directory, url = file_server
+    (directory / 'big.pdf').write_bytes(b'%PDF' + b'0' * 100)
+
+    with PDFCache(tmp_path / 'cache') as cache:
+        success, _ = cache.fetch(f"{url}/big.pdf?cache", create_session())
+
+    assert not success
+    assert URL_VALIDATIONS.get(f"{url}/big.pdf?cache") == URL_TOO_LARGE.format(10)
+
+
+def test_journal_skips_files_over_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, 'DOWNLOAD_MAX_SIZE', 10)
+    url = 'http://localhost/theses/big.pdf'
+    pdf_file = PDFFile(url, 'big.pdf', tmp_path / 'big.txt')
+    pdf_file.url_status = URL_TOO_LARGE.format(10)
+
+    with AnalysisJournal(tmp_path / 'journal.sqlite3') as analysis_journal:
+        analysis_journal.record('id0', pdf_file)
+        assert 'id0' in analysis_journal.completed({'id0': url})
+
+        # A new size limit gives the file another chance
+        monkeypatch.setattr(journal, 'DOWNLOAD_MAX_SIZE', 100)
+        assert 'id0' not in analysis_journal.completed({'id0': url})
+
+
+def test_cache_hit_without_revalidation_is_ok(file_server, tmp_path):
+    directory, url = file_server
+    (directory / 'doc.pdf').write_bytes(b'%PDF')
+    file_url = f"{url}/doc.pdf?no-revalidation"
+
+    with PDFCache(tmp_path / 'cache') as cache:
+        assert cache.fetch(file_url, create_session())[0]
+    URL_VALIDATIONS.clear()
+
+    with PDFCache(tmp_path / 'cache', revalidate=False) as cache:
+        success, file_path = cache.fetch(file_url, create_session())
+        assert cache.hits == 1
+
+    assert success
+    assert file_path.read_bytes() == b'%PDF'
+    assert URL_VALIDATIONS.get(file_url) == URL_OK
@@ -0,0 +1,247 @@
+"""
+test_harvesting.py
+
+Tests for harvesting a stub OAI-PMH repository into a RecordStore
+"""
+
+# Imports
+from datetime import date
+from lxml import etree
+import pytest
+from requests.exceptions import RequestException
+from sickle.models import Record
+from classes import harvesting
+from classes.dissertations import record_to_dict
+from classes.harvesting import (HarvestException,
+                                Harvester,
+                                ParallelHarvester,
+                                RecordStore)
+from classes.oai_parser import OAI_NAMESPACE, RECORD_TAG, parse_list_records
+
+
+# Constants
+# One year per window from 2020 to 2023. Only 2021 has more than a page.
+WINDOW_RECORDS = [
+    ('oai:stub:a', '2020-03-01'),
+    ('oai:stub:b', '2020-09-01'),
+    ('oai:stub:c', '2021-01-15'),
+    ('oai:stub:d', '2021-03-15'),
+    ('oai:stub:e', '2021-05-15'),
+    ('oai:stub:f', '2021-07-15'),
+    ('oai:stub:g', '2021-09-15'),
+    ('oai:stub:h', '2022-02-01'),
+    ('oai:stub:i', '2022-06-01'),
+    ('oai:stub:j', '2022-10-01'),
+    ('oai:stub:k', '2023-04-01')
+]
+# A complete record, one with repeated fields, one missing most of them, an
+# empty field, and a deleted record.
+LIST_RECORDS_PAGE = f"""<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="{OAI_NAMESPACE[1:-1]}">
+<responseDate>2020-02-01T00:00:00Z</responseDate>
+<request verb="ListRecords">http://localhost/oai</request>
+<ListRecords>
+<record><header><identifier>oai:stub:1866/00000000-0000-0000-0000-000000000001</identifier>
+<datestamp>2020-01-01</datestamp></header><metadata>
+<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+ xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:title>Une thèse</dc:title><dc:creator>Auteur, Prénom</dc:creator>
+<dc:publisher>Université de Montréal</dc:publisher>
+<dc:contributor>Directeur, Prénom</dc:contributor>
+<dc:date>2019-12-01</dc:date><dc:identifier>http://hdl.handle.net/1866/1</dc:identifier>
+<dc:language>fra</dc:language>
+</oai_dc:dc></metadata></record>
+<record><header><identifier>oai:stub:1866/00000000-0000-0000-0000-000000000002</identifier>
+<datestamp>2020-01-02</datestamp><setSpec>theses</setSpec></header><metadata>
+<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+ xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:title>A thesis</dc:title><dc:title>Une thèse</dc:title>
+<dc:creator>Un, Auteur</dc:creator><dc:creator>Deux, Auteur</dc:creator>
+<dc:contributor>Un</dc:contributor><dc:contributor>Deux</dc:contributor>
+<dc:date>2019</dc:date><dc:date>2019-06-01</dc:date>
+<dc:identifier>http://hdl.handle.net/1866/2</dc:identifier>
+<dc:identifier>http://localhost/1866/2/these.pdf</dc:identifier>
+</oai_dc:dc></metadata></record>
+<record><header><identifier>oai:stub:1866/00000000-0000-0000-0000-000000000003</identifier>
+<datestamp>2020-01-03</datestamp></header><metadata>
+<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+ xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:title>Sans auteur</dc:title><dc:date></dc:date>
+</oai_dc:dc></metadata></record>
+<record><header status="deleted">
+<identifier>oai:stub:1866/00000000-0000-0000-0000-000000000004</identifier>
+<datestamp>2020-01-04</datestamp></header></record>
+<resumptionToken cursor="0">1|2020-01-01|</resumptionToken>
+</ListRecords></OAI-PMH>""".encode()
+
+
+# Fixtures
+@pytest.fixture
+def store(tmp_path):
+    with RecordStore(tmp_path / 'records.sqlite3') as store:
+        yield store
+
+
+@pytest.fixture
+def today(monkeypatch):
+    """
+    Sets the day harvesting.date.today() returns, as an ISO date string.
+    """
+    class FixedDate(date):
+        day_string = '2023-12-31'
+
+        @classmethod
+        def today(cls):
+            return cls.fromisoformat(cls.day_string)
+
+    monkeypatch.setattr(harvesting, 'date', FixedDate)
+    return FixedDate
+
+
+# Functions
+def list_requests(oai_server) -> list:
+    """
+    This function returns the ListRecords requests the stub received.
+    """
+    return [request for request in oai_server.requests
+            if request.get('verb') == 'ListRecords']
+
+
+# Tests
+def test_parser_matches_sickle_records():
+    records, token = parse_list_records(LIST_RECORDS_PAGE)
+
+    tree = etree.fromstring(LIST_RECORDS_PAGE)
+    sickle_records = [Record(element) for element in tree.iter(RECORD_TAG)]
+    assert records == [(record_to_dict(record), record.header.datestamp)
+                       for record in sickle_records]
+    assert token == '1|2020-01-01|'
+    # The fields the page covers
+    assert records[1][0]['metadata']['creator'] == ['Un, Auteur',
+                                                    'Deux, Auteur']
+    assert records[2][0]['metadata']['creator'] == []
+    assert records[3][0]['header']['deleted']
+
+
+def test_harvest_follows_resumption_tokens(oai_server, store):
+    harvester = Harvester(oai_server.url, 'theses', store, retries=0)
+
+    assert harvester.harvest() == 20
+    assert len(store) == 20
+    assert len(list_requests(oai_server)) == 7
+    assert harvester.checkpoint is None
+    assert harvester.last_datestamp == '2020-01-20'
+
+
+def test_failed_harvest_resumes_from_checkpoint(oai_server, store):
+    oai_server.failures = {4: 500}
+    harvester = Harvester(oai_server.url, 'theses', store, retries=0)
+
+    with pytest.raises(RequestException):
+        harvester.harvest()
+    assert harvester.checkpoint['pages'] == 4
+    assert len(store) == 12
+
+    oai_server.failures.clear()
+    oai_server.requests.clear()
+    assert harvester.harvest() == 20
+    assert len(store) == 20
+    # Only the pages after the checkpoint were requested again
+    assert len(list_requests(oai_server)) == 3
+    assert list_requests(oai_server)[0]['resumptionToken'].startswith('4|')
+
+
+def test_timed_out_request_is_retried_from_checkpoint(oai_server, store):
+    oai_server.slow = {2: 2}
+    harvester = Harvester(oai_server.url,
+                          'theses',
+                          store,
+                          retries=1,
+                          timeout=(1, 0.5))
+
+    assert harvester.harvest() == 20
+    assert len(store) == 20
+    tokens = [request.get('resumptionToken', '0|')[:2]
+              for request in list_requests(oai_server)]
+    assert tokens == ['0|', '1|', '2|', '2|', '3|', '4|', '5|', '6|']
+
+
+def test_incremental_harvest_starts_from_last_datestamp(oai_server, store):
+    harvester = Harvester(oai_server.url, 'theses', store, retries=0)
+    harvester.harvest()
+    oai_server.requests.clear()
+
+    harvester.harvest()
+
+    assert list_requests(oai_server)[0]['from'] == '2020-01-20'
+
+
+def test_windows_are_harvested_concurrently(oai_server, store, today):
+    oai_server.records = WINDOW_RECORDS
+    oai_server.latency = 0.05
+    harvester = ParallelHarvester(oai_server.url, ['theses'], store, retries=0)
+
+    assert harvester.harvest() == 11
+    assert len(store) == 11
+    windows = {(request['from'], request['until'])
+               for request in list_requests(oai_server) if 'from' in request}
+    assert windows == {('2020-01-01', '2020-12-31'),
+                       ('2021-01-01', '2021-12-31'),
+                       ('2022-01-01', '2022-12-31'),
+                       ('2023-01-01', '2023-12-31')}
+    assert store.get_state('theses:last_datestamp') == '2023-04-01'
+    assert store.get_state('theses:windows') is None
+
+
+def test_failed_window_is_reported_and_resumed(oai_server, store, today):
+    oai_server.records = WINDOW_RECORDS
+    oai_server.latency = 0.05
+    oai_server.failures = {1: 500}
+    harvester = ParallelHarvester(oai_server.url, ['theses'], store, retries=0)
+
+    with pytest.raises(HarvestException) as error:
+        harvester.harvest()
+    assert list(error.value.failures) == [
+        ('theses', '2021-01-01', '2021-12-31')
+    ]
+    assert error.value.harvested == 6
+    assert store.get_state('theses:last_datestamp') is None
+
+    # Resumed on another day: the same windows are kept, and only the
+    # failed one is harvested again, from its checkpoint. Its count includes
+    # the page saved before the failure.
+    today.day_string = '2024-02-10'
+    oai_server.failures.clear()
+    oai_server.requests.clear()
+    assert harvester.harvest() == 5
+    assert [request.get('resumptionToken', '')[:2]
+            for request in list_requests(oai_server)] == ['1|']
+    assert len(store) == 11
+    assert store.get_state('theses:last_datestamp') == '2023-04-01'
+    assert store.get_state('theses:windows') is None
+    assert store.get_state('theses:2021-01-01:2021-12-31:checkpoint') is None
+
+
+def test_unplanned_set_is_reported(oai_server, store, today, monkeypatch):
+    oai_server.records = WINDOW_RECORDS
+    earliest_datestamp = Harvester.earliest_datestamp
+
+    def identify(harvester):
+        if harvester.oai_set == 'broken':
+            raise RequestException("Identify failed")
+        return earliest_datestamp(harvester)
+    monkeypatch.setattr(Harvester, 'earliest_datestamp', identify)
+    harvester = ParallelHarvester(oai_server.url,
+                                  ['broken', 'theses'],
+                                  store,
+                                  retries=0)
+
+    with pytest.raises(HarvestException) as error:
+        harvester.harvest()
+
+    assert list(error.value.failures) == [('broken', None, None)]
+    assert 'broken (windows not planned)' in error.value.message
+    # The other set was harvested
+    assert error.value.harvested == 11
+    assert store.get_state('theses:last_datestamp') == '2023-04-01'
+    assert store.get_state('broken:windows') is None
@@ -0,0 +1,121 @@
+"""
+test_ocr.py
+
+Tests for OCRing pages with Tesseract, with pdf2image and pytesseract mocked
+"""
+
+# Imports
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+from classes import ocr
+from classes.ocr import OCR_PROCESSES_VARIABLE, default_threads, share_cores
+from classes.pdf_files import page_quality
+
+
+# Fixtures
+@pytest.fixture
+def tesseract(monkeypatch):
+    """
+    Mocks pdf2image and pytesseract: page n is rasterized as 'image n', which
+    Tesseract reads as 'Texte de la page n.' followed by a form feed. Page 3
+    can't be rasterized, nor can the pages rasterized along with it. Yields
+    the max_workers of each thread pool started, the (file content, first
+    page, last page) of each rasterization and the files rasterized.
+    """
+    calls = SimpleNamespace(pools=[], conversions=[], paths=set())
+
+    def convert_from_path(pdf_path, first_page, last_page, **kwargs):
+        assert Path(pdf_path).is_file()
+        assert kwargs['paths_only']
+        calls.paths.add(Path(pdf_path))
+        calls.conversions.append((Path(pdf_path).read_bytes(),
+                                  first_page,
+                                  last_page))
+        if first_page <= 4 <= last_page:
+            raise RuntimeError("poppler failed")
+        return [f"image {page - 1}" for page in range(first_page, last_page + 1)]
+
+    def image_to_string(image, **kwargs):
+        return f"Texte de la page {image.split()[-1]}.\n\x0c"
+
+    def thread_pool(max_workers):
+        calls.pools.append(max_workers)
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+    monkeypatch.setattr(ocr, 'OCR_ENABLED', True)
+    monkeypatch.setattr(ocr, 'convert_from_path', convert_from_path)
+    monkeypatch.setattr(ocr, 'pytesseract',
+                        SimpleNamespace(image_to_string=image_to_string))
+    monkeypatch.setattr(ocr, 'ThreadPoolExecutor', thread_pool)
+    monkeypatch.setattr(ocr.os, 'cpu_count', lambda: 8)
+    # Recorded so the value share_cores() sets is removed after the test
+    monkeypatch.setenv(OCR_PROCESSES_VARIABLE, '1')
+    yield calls
+
+
+# Tests
+def test_ocr_pages_strips_form_feeds(tesseract):
+    pages = ocr.ocr_pages(b'%PDF', [0, 1, 3], 'fr')
+
+    # Page 3 failed and is left out
+    assert pages == {0: 'Texte de la page 0.\n', 1: 'Texte de la page 1.\n'}
+    assert all(page_quality(text)['bad_glyph_ratio'] == 0
+               for text in pages.values())
+
+
+def test_consecutive_pages_are_rasterized_together(tesseract):
+    pages = ocr.ocr_pages(b'%PDF', [9, 0, 1, 2, 7, 8, 5], 'fr', max_threads=1)
+
+    assert sorted(pages) == [0, 1, 2, 5, 7, 8, 9]
+    # The content was written once, and each run converted in one call
+    assert sorted(tesseract.conversions) == [(b'%PDF', 1, 3),
+                                             (b'%PDF', 6, 6),
+                                             (b'%PDF', 8, 10)]
+
+
+def test_runs_are_split_among_threads(tesseract):
+    assert ocr.page_runs(list(range(10)), 3) == [range(0, 3),
+                                                 range(3, 6),
+                                                 range(6, 9),
+                                                 range(9, 10)]
+
+    ocr.ocr_pages(b'%PDF', list(range(10)), 'fr', max_threads=2)
+
+    assert sorted(conversion[1:] for conversion in tesseract.conversions) == \
+        [(1, 5), (6, 10)]
+
+
+def test_files_on_disk_are_not_copied(tesseract, tmp_path):
+    pdf_path = tmp_path / 'doc.pdf'
+    pdf_path.write_bytes(b'%PDF on disk')
+
+    pages = ocr.ocr_pages(pdf_path, [0, 1], 'fr')
+    with open(pdf_path, 'rb') as pdf_file:
+        ocr.ocr_pages(pdf_file, [0, 1], 'fr')
+
+    assert list(pages) == [0, 1]
+    assert tesseract.paths == {pdf_path}
+
+
+def test_ocr_threads_are_shared_among_worker_processes(tesseract):
+    assert default_threads() == 8
+
+    share_cores(4)
+    assert default_threads() == 2
+    ocr.ocr_pages(b'%PDF', list(range(10)), 'fr')
+
+    share_cores(16)
+    assert default_threads() == 1
+    ocr.ocr_pages(b'%PDF', list(range(10)), 'fr')
+
+    assert tesseract.pools == [2, 1]
+
+
+def test_ocr_threads_setting_overrides_the_share(tesseract):
+    share_cores(8)
+
+    ocr.ocr_pages(b'%PDF', list(range(10)), 'fr', max_threads=3)
+
+    assert tesseract.pools == [3]
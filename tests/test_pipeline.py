@@ -0,0 +1,172 @@
+"""
+test_pipeline.py
+
+Tests for the concurrent analysis pipeline
+"""
+
+# Imports
+from functools import partial
+import os
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from time import monotonic, sleep
+import pytest
+from classes import pdf_files, pipeline
+from classes.abstracts import Abstract
+from classes.pdf_files import URL_OK, create_session, extract_part, plan_analysis
+from classes.pipeline import AnalysisPipeline
+
+
+# Functions
+def fake_plan(content: Path, pages_per_task: int) -> tuple:
+    """
+    Stands for plan_analysis(), killing its worker on b'crash' and never
+    ending on b'hang'.
+    """
+    if content.read_bytes() == b'crash':
+        os._exit(1)
+    while content.read_bytes() == b'hang':
+        sleep(1)
+    return plan_analysis(content, pages_per_task)
+
+
+def plan_on_disk(content: Path, pages_per_task: int) -> tuple:
+    """
+    Stands for plan_analysis(), failing unless it is handed a temporary
+    file's path.
+    """
+    if not (isinstance(content, Path) and content.is_file() and
+            content.name.startswith('analysis-')):
+        raise TypeError(f"{content!r} isn't a temporary file.")
+    return plan_analysis(content, pages_per_task)
+
+
+def slow_part(content: Path, page_range: range | None, profile: str) -> dict:
+    """
+    Stands for extract_part(), taking long enough for the other workers to
+    pick the next parts, and prefixing each page with its worker's pid.
+    """
+    sleep(0.3)
+    part = extract_part(content, page_range, profile)
+    part['page_text'] = [f"{os.getpid()}: {text}"
+                         for text in part['page_text']]
+    return part
+
+
+def fake_abstract(content: Path, language: str) -> tuple:
+    """
+    Stands for analyze_abstract(), finding the whole content on page 1.
+    """
+    return 1, Abstract(content.read_text(encoding='latin-1'), 0, 0), 1.0, 1
+
+
+# Fixtures
+@pytest.fixture
+def documents(file_server, make_pdf, blank_models, tmp_path, monkeypatch):
+    """
+    Serves a few .pdf files and returns them as AnalysisPipeline.run()
+    documents. The first one kills its worker and the second one never ends.
+    """
+    monkeypatch.setattr(pdf_files, 'OCR_BASE_DIR', tmp_path / 'ocr')
+    monkeypatch.setattr(pdf_files, 'EXTRACTION_PROFILE', 'full')
+    monkeypatch.setattr(pdf_files, 'ocr_available', lambda: False)
+    monkeypatch.setattr(pipeline, 'plan_analysis', fake_plan)
+    directory, url = file_server
+    (directory / 'theses').mkdir()
+    contents = [b'crash', b'hang'] + \
+        [make_pdf([f"document {n}"]) for n in range(2, 8)]
+    for n, content in enumerate(contents):
+        (directory / 'theses' / f"doc{n}.pdf").write_bytes(content)
+
+    return {
+        f"id{n}": (f"{url}/theses/doc{n}.pdf", 'fr')
+        for n in range(len(contents))
+    }
+
+
+# Tests
+def test_dead_worker_only_fails_its_documents(documents):
+    del documents['id1']
+    analysis = AnalysisPipeline(create_session(), max_downloads=1, max_workers=1)
+
+    results = dict(analysis.run(documents))
+
+    assert set(results) == set(documents)
+    assert results['id0'].pages == 0
+    assert results['id0'].url_status == URL_OK
+    assert results['id0'].extraction_error is not None
+    # The dead worker was replaced and the other documents analyzed
+    assert all(results[key].pages == 1 for key in results if key != 'id0')
+    assert results['id7'].ocr.strip() == 'document 7'
+
+
+def test_stuck_documents_are_killed(documents):
+    del documents['id0']
+    analysis = AnalysisPipeline(create_session(),
+                                max_downloads=2,
+                                max_workers=2,
+                                timeout=2)
+
+    start = monotonic()
+    results = dict(analysis.run(documents))
+
+    assert monotonic() - start < 30
+    assert set(results) == set(documents)
+    assert results['id1'].pages == 0
+    assert results['id1'].extraction_error.endswith('killed after 2s.')
+    assert all(results[key].pages == 1 for key in results if key != 'id1')
+    assert all(results[key].extraction_error is None
+               for key in results if key != 'id1')
+
+
+def test_abstracts_keep_the_ocr_subdirectories(documents, tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'analyze_abstract', fake_abstract)
+    monkeypatch.setattr(pipeline, 'ABSTRACT_BASE_DIR', tmp_path / 'abstracts')
+    documents = {'id2': documents['id2']}
+    analysis = AnalysisPipeline(create_session(), abstract_only=True)
+
+    results = dict(analysis.run(documents))
+
+    path = tmp_path / 'abstracts' / 'theses' / 'doc2.txt'
+    assert results['id2'].txt_file_path == path
+    assert path.read_text(encoding='utf8').startswith('%PDF')
+
+
+def test_downloads_are_handed_over_on_disk(documents, tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'NamedTemporaryFile',
+                        partial(NamedTemporaryFile, dir=tmp_path))
+    monkeypatch.setattr(pipeline, 'plan_analysis', plan_on_disk)
+    documents = {key: documents[key] for key in ['id2', 'id3']}
+    analysis = AnalysisPipeline(create_session(), max_workers=1)
+
+    results = dict(analysis.run(documents))
+
+    assert all(results[key].extraction_error is None for key in documents)
+    assert all(results[key].ocr.strip() == f"document {key[-1]}"
+               for key in documents)
+    # The temporary files are deleted once their documents are finished
+    assert not list(tmp_path.glob('*.pdf'))
+
+
+def test_large_documents_are_extracted_by_several_workers(documents,
+                                                          make_pdf,
+                                                          file_server,
+                                                          monkeypatch):
+    monkeypatch.setattr(pipeline, 'extract_part', slow_part)
+    directory, url = file_server
+    pages = [f"page {n}" for n in range(12)]
+    (directory / 'theses' / 'large.pdf').write_bytes(make_pdf(pages))
+    analysis = AnalysisPipeline(create_session(),
+                                max_workers=3,
+                                pages_per_task=2)
+
+    results = dict(analysis.run({'large': (f"{url}/theses/large.pdf", 'fr')}))
+
+    pdf_file = results['large']
+    assert pdf_file.pages == 12
+    assert pdf_file.extraction_error is None
+    lines = pdf_file.ocr.split()
+    pids = {word for word in lines if word.endswith(':')}
+    assert len(pids) > 1
+    # The parts are merged back in page order
+    assert [int(word) for word in lines if word.isdigit()] == list(range(12))
@@ -0,0 +1,65 @@
+"""
+test_token_count.py
+
+Tests for the tokenizer-only, chunked token count
+"""
+
+# Imports
+import pytest
+from classes.nlp_models import get_model, TOKENIZER_ONLY
+from classes.pdf_files import chunk_text, get_token_count
+
+
+# Constants
+SAMPLE_TEXT = (
+    "Cette thèse porte sur l'analyse des structures en béton armé, "
+    "c.-à-d. les poutres, les dalles et les colonnes (voir fig. 3.2). "
+    "Les résultats — obtenus entre 1992 et 1994 — montrent qu'un gain "
+    "de 12,5 % est possible.\n\n  Mots-clés : béton, \"ductilité\", M.Sc.\t"
+)
+
+
+# Tests
+@pytest.mark.parametrize('chunk_size', [1, 7, 50, 100, 1000])
+def test_chunks_rebuild_the_text(chunk_size):
+    chunks = list(chunk_text(SAMPLE_TEXT * 3, chunk_size))
+
+    assert ''.join(chunks) == SAMPLE_TEXT * 3
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+
+
+# Chunks always hold a token-separating space at these sizes, so none of
+# them is cut in the middle of a token.
+@pytest.mark.parametrize('chunk_size', [50, 100, 1000])
+def test_chunked_count_matches_whole_text(blank_models, chunk_size):
+    tokenizer = get_model('fr', TOKENIZER_ONLY).tokenizer
+    text = SAMPLE_TEXT * 20
+
+    chunked = sum(len(tokenizer(chunk))
+                  for chunk in chunk_text(text, chunk_size))
+
+    assert chunked == len(tokenizer(text))
+
+
+@pytest.mark.parametrize('language', ['fr', 'en', 'es'])
+def test_tokenizer_only_matches_full_pipeline(blank_models, language):
+    # Longer than TOKEN_CHUNK_SIZE, so the text is split into many chunks
+    text = SAMPLE_TEXT * 1500
+
+    assert get_token_count(text, language, tokenizer_only=True) == \
+        get_token_count(text, language)
+
+
+def test_tokenizer_only_is_not_truncated(blank_models):
+    text = 'mot ' * 300000
+
+    assert get_token_count(text, 'fr', tokenizer_only=True) == 300000
+    assert get_token_count(text, 'fr') < 300000
+
+
+def test_tokenizer_only_matches_packaged_model():
+    pytest.importorskip('fr_core_news_sm')
+    text = SAMPLE_TEXT * 200
+
+    assert get_token_count(text, 'fr', tokenizer_only=True) == \
+        get_token_count(text, 'fr')